@@ -0,0 +1,158 @@
+"""Throughput of parallel S3 transfers under throttling.
+
+Drives ``--objects`` uploads and then downloads of ``--object-kb`` objects
+through :class:`storage.S3Storage`, with ``--workers`` transfer threads
+(:func:`retry.parallel_map`). The backend is a :class:`fake_s3.FaultyS3Client`
+that serves ``--capacity`` concurrent requests and answers every extra one
+with ``SlowDown``. Three strategies are compared:
+
+- ``no-retry`` – one attempt per request and no limiter. The fan-out
+  still hits the backend at full width, and every throttle is a failed
+  transfer.
+- ``backoff`` – jittered exponential backoff, with the fan-out fixed at
+  ``--workers``.
+- ``aimd`` – backoff plus the adaptive (AIMD) concurrency limiter the services
+  use.
+
+For each strategy the report gives completed transfers per second, failures,
+and the request/retry/throttle counters handlers return under ``io``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+BENCH_DIR = Path(__file__).resolve().parent
+COMMON_DIR = BENCH_DIR.parent / "services" / "common" / "src"
+for extra in (BENCH_DIR, COMMON_DIR):
+    if str(extra) not in sys.path:
+        sys.path.insert(0, str(extra))
+
+from fake_s3 import FaultyS3Client  # noqa: E402
+from instrumentation import instrumented  # noqa: E402
+from retry import AdaptiveLimiter, RetryPolicy, io_counters, parallel_map  # noqa: E402
+from storage import S3Storage  # noqa: E402
+
+STRATEGIES = ("no-retry", "backoff", "aimd")
+
+
+def _backend(strategy: str, client: FaultyS3Client, workers: int, base_delay: float) -> S3Storage:
+    if strategy == "no-retry":
+        policy = RetryPolicy(max_attempts=1)
+    else:
+        policy = RetryPolicy(max_attempts=10, base_delay=base_delay, max_delay=1.0)
+    if strategy == "aimd":
+        limiter = AdaptiveLimiter(initial=workers, maximum=workers)
+    else:
+        # Never adapts: decrease=1.0 keeps the cap at the thread count.
+        limiter = AdaptiveLimiter(initial=workers, maximum=workers, decrease=1.0)
+    return S3Storage(lambda: client, policy=policy, limiter=limiter)
+
+
+def run_strategy(
+    strategy: str,
+    *,
+    objects: int,
+    object_kb: int,
+    workers: int,
+    capacity: int,
+    latency_ms: float,
+    fault_rate: float,
+    base_delay: float = 0.01,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    client = FaultyS3Client(
+        capacity=capacity, latency=latency_ms / 1000.0, fault_rate=fault_rate, seed=seed
+    )
+    backend = _backend(strategy, client, workers, base_delay)
+    payload = os.urandom(object_kb * 1024)
+    keys = [f"bench/object-{index:05d}" for index in range(objects)]
+
+    def transfer(op: str, key: str) -> bool:
+        try:
+            if op == "put":
+                backend.write_bytes("bench", key, payload)
+            else:
+                backend.read_bytes("bench", key)
+        except Exception:
+            return False
+        return True
+
+    @instrumented("bench_contention")
+    def run(_event: Any, _context: Any) -> Dict[str, Any]:
+        phases: Dict[str, Any] = {}
+        for op in ("put", "get"):
+            started = time.perf_counter()
+            completed = sum(parallel_map(lambda key: transfer(op, key), keys, workers))
+            elapsed = time.perf_counter() - started
+            phases[op] = {
+                "completed": completed,
+                "failed": objects - completed,
+                "per_s": round(completed / elapsed, 1) if elapsed else 0.0,
+            }
+        return {"phases": phases, "io": io_counters()}
+
+    previous = os.environ.get("PIPELINE_METRICS")
+    os.environ["PIPELINE_METRICS"] = "0"
+    try:
+        measured = run(None, None)
+    finally:
+        if previous is None:
+            os.environ.pop("PIPELINE_METRICS", None)
+        else:
+            os.environ["PIPELINE_METRICS"] = previous
+    return {
+        "strategy": strategy,
+        **measured,
+        "peak_in_flight": backend.limiter.peak_in_flight,
+        "final_limit": round(backend.limiter.limit, 2),
+    }
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure S3 transfer throughput under throttling.")
+    parser.add_argument("--strategies", nargs="+", default=list(STRATEGIES), choices=STRATEGIES)
+    parser.add_argument("--objects", type=int, default=400)
+    parser.add_argument("--object-kb", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--capacity", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--fault-rate", type=float, default=0.01)
+    parser.add_argument("--json", action="store_true", help="Print the raw results as JSON.")
+    args = parser.parse_args(argv)
+
+    results: List[Dict[str, Any]] = [
+        run_strategy(
+            strategy,
+            objects=args.objects,
+            object_kb=args.object_kb,
+            workers=args.workers,
+            capacity=args.capacity,
+            latency_ms=args.latency_ms,
+            fault_rate=args.fault_rate,
+        )
+        for strategy in args.strategies
+    ]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    for result in results:
+        put, get = result["phases"]["put"], result["phases"]["get"]
+        io = result["io"]
+        print(
+            f"{result['strategy']:<9} put {put['per_s']:>8.1f}/s ({put['failed']} failed)  "
+            f"get {get['per_s']:>8.1f}/s ({get['failed']} failed)  "
+            f"requests {io['requests']:>5}  retries {io['retries']:>5}  "
+            f"throttles {io['throttles']:>5}  peak in flight {result['peak_in_flight']}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,153 @@
+"""Cold-init (import time) benchmark for every Lambda handler.
+
+Each service's ``handler`` module is imported in a fresh interpreter under
+``python -X importtime`` with the same module layout the Lambda ZIP has
+(service ``src`` plus ``services/common/src`` on the path). The cumulative
+import time reported for ``handler`` is what a cold start pays before the
+first invocation. The median over ``--repeat`` runs is compared against
+``import_baseline.json``, and the process exits non-zero on a regression,
+so it can gate CI.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+BENCH_DIR = Path(__file__).resolve().parent
+SERVICES_DIR = BENCH_DIR.parent / "services"
+DEFAULT_BASELINE = BENCH_DIR / "import_baseline.json"
+SERVICES = (
+    "data_ingest_service",
+    "feature_service",
+    "model_service",
+    "inference_service",
+    "monitoring_service",
+)
+# Small absolute allowance so sub-millisecond jitter never fails the gate.
+SLACK_MS = 3.0
+
+
+def _parse_importtime(stderr: str, module: str = "handler") -> Dict[str, float]:
+    """Return cumulative import time (ms) of ``module`` and of its heaviest imports."""
+    total_ms = 0.0
+    children: Dict[str, float] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            _, cumulative, name = line[len("import time:") :].split("|", 2)
+            cumulative_us = float(cumulative.strip())
+        except ValueError:
+            continue
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        name = name.strip()
+        if depth == 0 and name == module:
+            total_ms = cumulative_us / 1000.0
+        elif depth == 1:
+            children[name] = children.get(name, 0.0) + cumulative_us / 1000.0
+    return {"total_ms": total_ms, **{f"import:{k}": v for k, v in children.items()}}
+
+
+def measure_service(service: str, *, python: str = sys.executable) -> Dict[str, float]:
+    """Import one service's handler in a fresh interpreter and time it."""
+    src = SERVICES_DIR / service / "src"
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([str(src), str(SERVICES_DIR / "common" / "src")])
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    completed = subprocess.run(
+        [python, "-X", "importtime", "-c", "import handler"],
+        cwd=src,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"{service}: import failed\n{completed.stderr[-2000:]}")
+    return _parse_importtime(completed.stderr)
+
+
+def run_suite(services: Sequence[str], *, repeat: int = 5) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    for service in services:
+        samples = [measure_service(service) for _ in range(max(1, repeat))]
+        totals = [sample["total_ms"] for sample in samples]
+        heaviest = sorted(
+            ((name, value) for name, value in samples[-1].items() if name.startswith("import:")),
+            key=lambda item: item[1],
+            reverse=True,
+        )[:3]
+        results[service] = {
+            "cold_init_ms": round(statistics.median(totals), 3),
+            "min_ms": round(min(totals), 3),
+            **{name: round(value, 3) for name, value in heaviest},
+        }
+    return results
+
+
+def compare(
+    baseline: Dict[str, Dict[str, float]],
+    current: Dict[str, Dict[str, float]],
+    *,
+    threshold: float,
+) -> List[str]:
+    regressions: List[str] = []
+    for service, now in current.items():
+        before = baseline.get(service)
+        if not before:
+            continue
+        limit = before["cold_init_ms"] * (1 + threshold) + SLACK_MS
+        if now["cold_init_ms"] > limit:
+            regressions.append(
+                f"{service}: cold init {now['cold_init_ms']:.1f} ms > "
+                f"baseline {before['cold_init_ms']:.1f} ms (limit {limit:.1f} ms)"
+            )
+    return regressions
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure handler cold-init import time.")
+    parser.add_argument("--services", nargs="+", default=list(SERVICES), choices=list(SERVICES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.services, repeat=args.repeat)
+    for service, measured in results.items():
+        extras = ", ".join(
+            f"{name[len('import:'):]} {value:.1f}"
+            for name, value in measured.items()
+            if name.startswith("import:")
+        )
+        print(f"{service:<22} cold init {measured['cold_init_ms']:>8.2f} ms  ({extras})")
+
+    if args.update_baseline:
+        document = {
+            "environment": {"python": platform.python_version(), "machine": platform.machine()},
+            "results": results,
+        }
+        args.baseline.write_text(json.dumps(document, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --update-baseline first.")
+        return 0
+    baseline = json.loads(args.baseline.read_text()).get("results", {})
+    regressions = compare(baseline, results, threshold=args.threshold)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,528 @@
+"""Benchmark suite for the service hot paths and Lambda handlers.
+
+Every case is driven against :class:`fake_s3.FakeS3Client`, so the suite runs
+offline on a plain Linux box. Each ``(case, rows)`` pair runs in a forked
+child process. That keeps the peak RSS of one case from leaking into the next.
+For each pair the suite records:
+
+- ``rows_per_s`` – median throughput of ``--repeat`` timed samples. A sample
+  calls the case often enough to span ``MIN_SAMPLE_SECONDS``, so millisecond
+  cases are not dominated by timer and scheduler noise.
+- ``normalized_throughput`` – the median of each sample's throughput scaled
+  by a fixed calibration loop timed just before it. The regression gate
+  compares this, so a busier or slower machine does not read as a regression.
+- ``peak_rss_mb`` – high-water resident set size of the child process.
+- ``alloc_peak_mb`` / ``alloc_blocks`` – tracemalloc peak and live blocks of one
+  extra traced run (skipped above ``--alloc-max-rows`` because tracing is slow).
+
+Results can be written as a JSON baseline (``--update-baseline``) or compared
+against one. The process exits non-zero when a metric regresses beyond
+``--threshold``. Throughput of cases whose single call took under
+``SHORT_CASE_SECONDS`` in the baseline is held to the looser
+``--short-threshold``: even autoranged, they swing the most on a shared host.
+A case that fails the gate is measured again up to ``--confirm`` times and
+keeps its best result, so only a regression that reproduces is reported.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable, Dict, List, Sequence
+
+BENCH_DIR = Path(__file__).resolve().parent
+SERVICES_DIR = BENCH_DIR.parent / "services"
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+RSS_SLACK_MB = 16.0
+MIN_SAMPLE_SECONDS = 0.1
+SHORT_CASE_SECONDS = 0.1
+
+if str(BENCH_DIR) not in sys.path:
+    sys.path.insert(0, str(BENCH_DIR))
+
+from fake_s3 import FakeS3Client  # noqa: E402
+
+
+def _load_module(name: str, path: Path) -> ModuleType:
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@dataclass
+class Services:
+    ingest: ModuleType
+    feature: ModuleType
+    train: ModuleType
+    inference: ModuleType
+    monitoring: ModuleType
+
+    @classmethod
+    def load(cls) -> "Services":
+        for extra in (SERVICES_DIR / "common" / "src", SERVICES_DIR / "model_service" / "src"):
+            if str(extra) not in sys.path:
+                sys.path.append(str(extra))
+        return cls(
+            ingest=_load_module(
+                "bench_data_ingest_handler",
+                SERVICES_DIR / "data_ingest_service" / "src" / "handler.py",
+            ),
+            feature=_load_module(
+                "bench_feature_handler", SERVICES_DIR / "feature_service" / "src" / "handler.py"
+            ),
+            train=_load_module(
+                "bench_model_train", SERVICES_DIR / "model_service" / "src" / "train.py"
+            ),
+            inference=_load_module(
+                "bench_inference_handler",
+                SERVICES_DIR / "inference_service" / "src" / "handler.py",
+            ),
+            monitoring=_load_module(
+                "bench_monitoring_handler",
+                SERVICES_DIR / "monitoring_service" / "src" / "handler.py",
+            ),
+        )
+
+    def use_client(self, client: FakeS3Client) -> None:
+        for module in (self.ingest, self.feature, self.train, self.inference):
+            module.s3_client = lambda endpoint_url=None, _client=client: _client
+
+
+# --- cases -----------------------------------------------------------------
+# Each case receives the loaded services, a fresh fake S3 client and a row
+# count. It does its (untimed) setup and returns the zero-argument callable
+# that is timed.
+
+Case = Callable[[Services, FakeS3Client, int], Callable[[], Any]]
+
+
+def _rows(services: Services, rows: int) -> List[Dict[str, Any]]:
+    return services.ingest._generate_rows(batch_size=rows, symbol="BENCH")
+
+
+def _seed_csv(services: Services, client: FakeS3Client, rows: int) -> None:
+    blob = services.ingest._rows_to_csv(_rows(services, rows)).encode("utf-8")
+    services.feature._storage(None).write_bytes("bench", "data/input.csv", blob, "text/csv")
+
+
+def _case_generate_rows(services: Services, client: FakeS3Client, rows: int):
+    return lambda: services.ingest._generate_rows(batch_size=rows, symbol="BENCH")
+
+
+def _case_ingest_handler(services: Services, client: FakeS3Client, rows: int):
+    event = {"bucket": "bench", "key": "data/out.csv", "batch_size": rows}
+    return lambda: services.ingest.lambda_handler(event, None)
+
+
+def _case_read_csv(services: Services, client: FakeS3Client, rows: int):
+    _seed_csv(services, client, rows)
+    storage = services.feature._storage(None)
+    return lambda: services.feature._read_csv(storage, "bench", "data/input.csv")
+
+
+def _case_engineer_features(services: Services, client: FakeS3Client, rows: int):
+    data = _rows(services, rows)
+    return lambda: services.feature._engineer_features(data)
+
+
+def _case_feature_handler(services: Services, client: FakeS3Client, rows: int):
+    _seed_csv(services, client, rows)
+    event = {
+        "source_bucket": "bench",
+        "source_key": "data/input.csv",
+        "feature_bucket": "bench",
+        "feature_key": "features/out.jsonl",
+        "uuid": "bench",
+    }
+    return lambda: services.feature.lambda_handler(event, None)
+
+
+def _case_summarize_csv(services: Services, client: FakeS3Client, rows: int):
+    blob = services.ingest._rows_to_csv(_rows(services, rows)).encode("utf-8")
+    return lambda: services.train._summarize_csv(io.BytesIO(blob))
+
+
+def _case_run_training(services: Services, client: FakeS3Client, rows: int):
+    _seed_csv(services, client, rows)
+    return lambda: services.train.run_training(
+        bucket="bench",
+        key="data/input.csv",
+        endpoint_url=None,
+        artifact_bucket="bench",
+        artifact_key="models/out.json",
+    )
+
+
+def _features(services: Services, rows: int) -> List[Dict[str, Any]]:
+    return services.feature._engineer_features(_rows(services, rows))
+
+
+def _case_predict(services: Services, client: FakeS3Client, rows: int):
+    data = _features(services, rows)
+    return lambda: services.inference._predict(data, float(rows))
+
+
+def _case_inference_handler(services: Services, client: FakeS3Client, rows: int):
+    artifact = {"generated_at": "bench", "metrics": {"row_count": float(rows)}}
+    services.inference._storage(None).write_bytes(
+        "bench", "models/in.json", json.dumps(artifact).encode("utf-8"), "application/json"
+    )
+    event = {
+        "artifact_bucket": "bench",
+        "artifact_key": "models/in.json",
+        "inputs": _features(services, rows),
+    }
+    return lambda: services.inference.lambda_handler(event, None)
+
+
+def _predictions(services: Services, rows: int) -> List[Dict[str, Any]]:
+    return services.inference._predict(_features(services, rows), float(rows))
+
+
+def _case_monitoring_summarize(services: Services, client: FakeS3Client, rows: int):
+    predictions = _predictions(services, rows)
+    actuals = [row["prediction"] for row in predictions]
+    return lambda: services.monitoring._summarize(predictions, actuals, "bench")
+
+
+def _case_monitoring_handler(services: Services, client: FakeS3Client, rows: int):
+    predictions = _predictions(services, rows)
+    event = {"predictions": predictions, "actuals": [row["prediction"] for row in predictions]}
+
+    def run() -> Any:
+        with open(os.devnull, "w") as sink:
+            stdout, sys.stdout = sys.stdout, sink
+            try:
+                return services.monitoring.lambda_handler(event, None)
+            finally:
+                sys.stdout = stdout
+
+    return run
+
+
+CASES: Dict[str, Case] = {
+    "ingest._generate_rows": _case_generate_rows,
+    "ingest.lambda_handler": _case_ingest_handler,
+    "feature._read_csv": _case_read_csv,
+    "feature._engineer_features": _case_engineer_features,
+    "feature.lambda_handler": _case_feature_handler,
+    "model._summarize_csv": _case_summarize_csv,
+    "model.run_training": _case_run_training,
+    "inference._predict": _case_predict,
+    "inference.lambda_handler": _case_inference_handler,
+    "monitoring._summarize": _case_monitoring_summarize,
+    "monitoring.lambda_handler": _case_monitoring_handler,
+}
+
+
+# --- measurement -----------------------------------------------------------
+
+
+def _calibrate(repeat: int = 3) -> float:
+    """Time a fixed pure-Python workload to normalize for machine speed drift."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        total = 0
+        for idx in range(200_000):
+            total += idx * idx
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _autorange(func: Callable[[], Any], min_seconds: float = MIN_SAMPLE_SECONDS) -> int:
+    """Number of calls of ``func`` that take at least ``min_seconds`` (doubles as warm-up)."""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        if time.perf_counter() - started >= min_seconds:
+            return loops
+        loops *= 2
+
+
+def _measure(case: str, rows: int, repeat: int, alloc_max_rows: int) -> Dict[str, float]:
+    os.environ["PIPELINE_METRICS"] = "0"
+    # Cold reads by default; --cache-dir measures warm-cache hits instead.
+    os.environ.setdefault("PIPELINE_CACHE", "0")
+    services = Services.load()
+    client = FakeS3Client()
+    services.use_client(client)
+    func = CASES[case](services, client, rows)
+
+    loops = _autorange(func)
+    timings: List[float] = []
+    normalized: List[float] = []
+    for _ in range(max(1, repeat)):
+        calibration = _calibrate(1)
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        seconds = (time.perf_counter() - started) / loops
+        timings.append(seconds)
+        normalized.append(rows / seconds * calibration if seconds > 0 else 0.0)
+
+    seconds = statistics.median(timings)
+    rows_per_s = rows / seconds if seconds > 0 else 0.0
+    result = {
+        "rows": float(rows),
+        "seconds": round(seconds, 6),
+        "rows_per_s": round(rows_per_s, 1),
+        "normalized_throughput": round(statistics.median(normalized), 3),
+        # ru_maxrss is reported in KiB on Linux.
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+    }
+    if rows <= alloc_max_rows:
+        tracemalloc.start()
+        kept = func()
+        current, peak = tracemalloc.get_traced_memory()
+        blocks = len(tracemalloc.take_snapshot().traces)
+        tracemalloc.stop()
+        del kept
+        result["alloc_peak_mb"] = round(peak / (1024 * 1024), 3)
+        result["alloc_blocks"] = float(blocks)
+    return result
+
+
+def _child(conn, case: str, rows: int, repeat: int, alloc_max_rows: int) -> None:
+    try:
+        conn.send(("ok", _measure(case, rows, repeat, alloc_max_rows)))
+    except BaseException as exc:  # pragma: no cover - surfaced by the parent
+        conn.send(("error", f"{type(exc).__name__}: {exc}"))
+    finally:
+        conn.close()
+
+
+def run_case(case: str, rows: int, *, repeat: int = 5, alloc_max_rows: int = 100_000) -> Dict[str, float]:
+    """Measure one case in a forked child so peak RSS is isolated per case."""
+    ctx = multiprocessing.get_context("fork")
+    parent, child = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_child, args=(child, case, rows, repeat, alloc_max_rows))
+    process.start()
+    child.close()
+    status, payload = parent.recv()
+    process.join()
+    if status != "ok":
+        raise RuntimeError(f"{case}@{rows} failed: {payload}")
+    return payload
+
+
+def run_suite(
+    cases: Sequence[str],
+    sizes: Sequence[int],
+    *,
+    repeat: int = 5,
+    alloc_max_rows: int = 100_000,
+    log: Callable[[str], None] = lambda _msg: None,
+) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    for case in cases:
+        for rows in sizes:
+            measured = run_case(case, rows, repeat=repeat, alloc_max_rows=alloc_max_rows)
+            results[f"{case}@{rows}"] = measured
+            log(
+                f"{case:<28} {rows:>10,} rows  {measured['rows_per_s']:>14,.0f} rows/s  "
+                f"rss {measured['peak_rss_mb']:>8.1f} MB  "
+                f"alloc {measured.get('alloc_peak_mb', float('nan')):>8.2f} MB"
+            )
+    return results
+
+
+def compare(
+    baseline: Dict[str, Dict[str, float]],
+    current: Dict[str, Dict[str, float]],
+    *,
+    threshold: float,
+    short_threshold: float | None = None,
+) -> List[str]:
+    """Return human-readable regressions of ``current`` against ``baseline``."""
+    regressions: List[str] = []
+    for name, now in current.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        metric = "normalized_throughput" if before.get("normalized_throughput") else "rows_per_s"
+        allowed = threshold
+        short = before.get("seconds", SHORT_CASE_SECONDS) < SHORT_CASE_SECONDS
+        if short and short_threshold is not None:
+            allowed = max(threshold, short_threshold)
+        if before.get(metric) and now.get(metric, 0.0) < before[metric] * (1 - allowed):
+            regressions.append(
+                f"{name}: throughput {now['rows_per_s']:,.0f} rows/s "
+                f"({metric} {now.get(metric, 0.0):,.3f} < baseline {before[metric]:,.3f})"
+            )
+        if before.get("peak_rss_mb") and now["peak_rss_mb"] > (
+            before["peak_rss_mb"] * (1 + threshold) + RSS_SLACK_MB
+        ):
+            regressions.append(
+                f"{name}: peak RSS {now['peak_rss_mb']:.1f} > baseline {before['peak_rss_mb']:.1f} MB"
+            )
+        if before.get("alloc_peak_mb") and now.get("alloc_peak_mb", 0.0) > before[
+            "alloc_peak_mb"
+        ] * (1 + threshold):
+            regressions.append(
+                f"{name}: alloc peak {now['alloc_peak_mb']:.2f} > baseline {before['alloc_peak_mb']:.2f} MB"
+            )
+    return regressions
+
+
+def confirm_regressions(
+    baseline: Dict[str, Dict[str, float]],
+    current: Dict[str, Dict[str, float]],
+    *,
+    threshold: float,
+    short_threshold: float | None = None,
+    attempts: int = 2,
+    measure: Callable[[str, int], Dict[str, float]] | None = None,
+    log: Callable[[str], None] = lambda _msg: None,
+) -> Dict[str, Dict[str, float]]:
+    """Re-measure cases that fail :func:`compare`, keeping each case's fastest result.
+
+    A noisy neighbour slows one measurement; a real regression slows all of them.
+    """
+    measure = measure or (lambda case, rows: run_case(case, rows))
+    confirmed = dict(current)
+    for _ in range(max(0, attempts)):
+        failing = [
+            name
+            for name, now in confirmed.items()
+            if compare(
+                baseline, {name: now}, threshold=threshold, short_threshold=short_threshold
+            )
+        ]
+        if not failing:
+            break
+        for name in failing:
+            case, rows = name.rsplit("@", 1)
+            log(f"Re-measuring {name}")
+            again = measure(case, int(rows))
+            metric = "normalized_throughput"
+            if again.get(metric, 0.0) > confirmed[name].get(metric, 0.0):
+                confirmed[name] = again
+    return confirmed
+
+
+def _environment() -> Dict[str, str]:
+    return {
+        "storage": os.getenv("PIPELINE_STORAGE_URL") or "fake-s3",
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "cpu_count": str(os.cpu_count()),
+    }
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark service hot paths and handlers.")
+    parser.add_argument("--cases", nargs="+", default=list(CASES), choices=list(CASES))
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=int,
+        default=list(DEFAULT_SIZES),
+        help="Row counts to run, e.g. 1000 10000 100000 1000000 10000000.",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--alloc-max-rows", type=int, default=100_000)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument(
+        "--short-threshold",
+        type=float,
+        default=0.4,
+        help=f"Throughput threshold for cases under {SHORT_CASE_SECONDS:g} s per call.",
+    )
+    parser.add_argument(
+        "--confirm",
+        type=int,
+        default=2,
+        help="Times a failing case is re-measured before it counts as a regression.",
+    )
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", type=Path, default=None, help="Write results JSON here.")
+    parser.add_argument(
+        "--storage-url",
+        default=None,
+        help="PIPELINE_STORAGE_URL for the handlers (default: the in-process fake S3 client).",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Enable the source-object disk cache in this directory (default: disabled).",
+    )
+    args = parser.parse_args(argv)
+    if args.storage_url:
+        os.environ["PIPELINE_STORAGE_URL"] = args.storage_url
+    if args.cache_dir:
+        os.environ["PIPELINE_CACHE"] = "1"
+        os.environ["PIPELINE_CACHE_DIR"] = args.cache_dir
+
+    results = run_suite(
+        args.cases,
+        args.sizes,
+        repeat=args.repeat,
+        alloc_max_rows=args.alloc_max_rows,
+        log=print,
+    )
+    document = {"environment": _environment(), "results": results}
+    if args.output:
+        args.output.write_text(json.dumps(document, indent=2, sort_keys=True) + "\n")
+
+    if args.update_baseline:
+        existing: Dict[str, Any] = {}
+        if args.baseline.exists():
+            existing = json.loads(args.baseline.read_text()).get("results", {})
+        existing.update(results)
+        args.baseline.write_text(
+            json.dumps({"environment": _environment(), "results": existing}, indent=2, sort_keys=True)
+            + "\n"
+        )
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --update-baseline first.")
+        return 0
+    baseline = json.loads(args.baseline.read_text()).get("results", {})
+    results = confirm_regressions(
+        baseline,
+        results,
+        threshold=args.threshold,
+        short_threshold=args.short_threshold,
+        attempts=args.confirm,
+        measure=lambda case, rows: run_case(
+            case, rows, repeat=args.repeat, alloc_max_rows=args.alloc_max_rows
+        ),
+        log=print,
+    )
+    regressions = compare(
+        baseline, results, threshold=args.threshold, short_threshold=args.short_threshold
+    )
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if regressions:
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,208 @@
+"""In-process S3 stand-ins used by the benchmark suite.
+
+:class:`FakeS3Client` implements the handful of client calls the services
+make, so handlers can be driven end to end without LocalStack or network
+access. :class:`FaultyS3Client` adds per-request latency, a concurrency
+capacity and random faults. Throttling behaviour can then be measured
+offline (see ``bench_contention.py``).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import random
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Tuple
+
+
+class NoSuchKey(KeyError):
+    """Mimics botocore's ``ClientError`` for a missing key (``response`` shape included)."""
+
+    def __init__(self, bucket: str, key: str) -> None:
+        super().__init__(f"s3://{bucket}/{key}")
+        self.response = {"Error": {"Code": "NoSuchKey", "Message": "The specified key does not exist."}}
+
+
+class SlowDown(Exception):
+    """Mimics the ``ClientError`` S3 raises when a prefix is over its request rate."""
+
+    def __init__(self, operation: str) -> None:
+        super().__init__(f"SlowDown during {operation}")
+        self.response = {
+            "Error": {"Code": "SlowDown", "Message": "Please reduce your request rate."},
+            "ResponseMetadata": {"HTTPStatusCode": 503},
+        }
+
+
+class NotModified(Exception):
+    """Mimics the ``ClientError`` for a conditional GET whose ETag still matches."""
+
+    def __init__(self, bucket: str, key: str) -> None:
+        super().__init__(f"s3://{bucket}/{key} not modified")
+        self.response = {
+            "Error": {"Code": "304", "Message": "Not Modified"},
+            "ResponseMetadata": {"HTTPStatusCode": 304},
+        }
+
+
+class PreconditionFailed(Exception):
+    """Mimics the ``ClientError`` for a conditional PUT whose ETag no longer matches."""
+
+    def __init__(self, bucket: str, key: str) -> None:
+        super().__init__(f"s3://{bucket}/{key} precondition failed")
+        self.response = {
+            "Error": {"Code": "PreconditionFailed", "Message": "At least one precondition failed"},
+            "ResponseMetadata": {"HTTPStatusCode": 412},
+        }
+
+
+class FakeS3Client:
+    """Thread-safe dict-backed replacement for a boto3 S3 client."""
+
+    def __init__(self) -> None:
+        self._objects: Dict[Tuple[str, str], bytes] = {}
+        self._lock = threading.Lock()
+        self.calls: Dict[str, int] = {}
+        self._uploads: Dict[str, Dict[int, bytes]] = {}
+
+    def _record(self, name: str) -> None:
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def put_object(
+        self,
+        *,
+        Bucket: str,
+        Key: str,
+        Body: Any,
+        IfMatch: str | None = None,
+        IfNoneMatch: str | None = None,
+        **_: Any,
+    ) -> Dict[str, Any]:
+        self._record("put_object")
+        data = Body if isinstance(Body, (bytes, bytearray)) else Body.read()
+        data = bytes(data)
+        with self._lock:
+            current = self._objects.get((Bucket, Key))
+            if IfNoneMatch == "*" and current is not None:
+                raise PreconditionFailed(Bucket, Key)
+            if IfMatch is not None and (
+                current is None or IfMatch != f'"{hashlib.md5(current).hexdigest()}"'
+            ):
+                raise PreconditionFailed(Bucket, Key)
+            self._objects[(Bucket, Key)] = data
+        return {"ETag": f'"{hashlib.md5(data).hexdigest()}"'}
+
+    def _get(self, bucket: str, key: str) -> bytes:
+        with self._lock:
+            try:
+                return self._objects[(bucket, key)]
+            except KeyError:
+                raise NoSuchKey(bucket, key) from None
+
+    def get_object(
+        self, *, Bucket: str, Key: str, IfNoneMatch: str | None = None, **_: Any
+    ) -> Dict[str, Any]:
+        self._record("get_object")
+        data = self._get(Bucket, Key)
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        if IfNoneMatch is not None and IfNoneMatch == etag:
+            raise NotModified(Bucket, Key)
+        return {"Body": io.BytesIO(data), "ContentLength": len(data), "ETag": etag}
+
+    def head_object(self, *, Bucket: str, Key: str, **_: Any) -> Dict[str, Any]:
+        self._record("head_object")
+        data = self._get(Bucket, Key)
+        return {"ContentLength": len(data), "ETag": f'"{hashlib.md5(data).hexdigest()}"'}
+
+    def create_multipart_upload(self, *, Bucket: str, Key: str, **_: Any) -> Dict[str, Any]:
+        self._record("create_multipart_upload")
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self._uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(
+        self, *, Bucket: str, Key: str, UploadId: str, PartNumber: int, Body: Any, **_: Any
+    ) -> Dict[str, Any]:
+        self._record("upload_part")
+        data = bytes(Body if isinstance(Body, (bytes, bytearray)) else Body.read())
+        with self._lock:
+            self._uploads[UploadId][PartNumber] = data
+        return {"ETag": f'"{hashlib.md5(data).hexdigest()}"'}
+
+    def complete_multipart_upload(
+        self, *, Bucket: str, Key: str, UploadId: str, MultipartUpload: Dict[str, List[Any]], **_: Any
+    ) -> Dict[str, Any]:
+        self._record("complete_multipart_upload")
+        with self._lock:
+            parts = self._uploads.pop(UploadId)
+            numbers = [part["PartNumber"] for part in MultipartUpload["Parts"]]
+            data = b"".join(parts[number] for number in numbers)
+            self._objects[(Bucket, Key)] = data
+        return {"ETag": f'"{hashlib.md5(data).hexdigest()}-{len(numbers)}"'}
+
+    def abort_multipart_upload(self, *, Bucket: str, Key: str, UploadId: str, **_: Any) -> Dict[str, Any]:
+        self._record("abort_multipart_upload")
+        with self._lock:
+            self._uploads.pop(UploadId, None)
+        return {}
+
+
+class FaultyS3Client(FakeS3Client):
+    """Fake S3 that throttles like a busy prefix.
+
+    Each call holds a slot for ``latency`` seconds. Calls beyond ``capacity``
+    concurrent slots are rejected with :class:`SlowDown` after
+    ``reject_latency`` seconds. Independently, ``fault_rate`` of accepted calls
+    fail the same way, seeded by ``seed``.
+    """
+
+    def __init__(
+        self,
+        *,
+        capacity: int = 8,
+        latency: float = 0.005,
+        reject_latency: float = 0.001,
+        fault_rate: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        super().__init__()
+        self.capacity = capacity
+        self.latency = latency
+        self.reject_latency = reject_latency
+        self.fault_rate = fault_rate
+        self._rng = random.Random(seed)
+        self._in_flight = 0
+        self.throttled = 0
+
+    def _contended(self, name: str, operation: Any, kwargs: Dict[str, Any]) -> Any:
+        with self._lock:
+            self._in_flight += 1
+            rejected = self._in_flight > self.capacity or self._rng.random() < self.fault_rate
+            if rejected:
+                self.throttled += 1
+        try:
+            if rejected:
+                time.sleep(self.reject_latency)
+                raise SlowDown(name)
+            time.sleep(self.latency)
+            return operation(**kwargs)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def put_object(self, **kwargs: Any) -> Dict[str, Any]:
+        return self._contended("put_object", super().put_object, kwargs)
+
+    def get_object(self, **kwargs: Any) -> Dict[str, Any]:
+        return self._contended("get_object", super().get_object, kwargs)
+
+    def head_object(self, **kwargs: Any) -> Dict[str, Any]:
+        return self._contended("head_object", super().head_object, kwargs)
+
+    def upload_part(self, **kwargs: Any) -> Dict[str, Any]:
+        return self._contended("upload_part", super().upload_part, kwargs)
@@ -0,0 +1,46 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parents[1]
+
+
+def _load_bench():
+    spec = importlib.util.spec_from_file_location(
+        "bench_contention", BENCH_DIR / "bench_contention.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+bench = _load_bench()
+
+
+def _run(strategy):
+    return bench.run_strategy(
+        strategy,
+        objects=60,
+        object_kb=1,
+        workers=12,
+        capacity=3,
+        latency_ms=2.0,
+        fault_rate=0.0,
+        base_delay=0.002,
+    )
+
+
+def test_retries_complete_every_transfer_and_aimd_throttles_less():
+    no_retry, backoff, aimd = (_run(strategy) for strategy in bench.STRATEGIES)
+
+    assert no_retry["phases"]["put"]["failed"] > 0
+    assert no_retry["io"]["retries"] == 0
+
+    for result in (backoff, aimd):
+        assert result["phases"]["put"]["failed"] == 0
+        assert result["phases"]["get"]["failed"] == 0
+        assert result["io"]["retries"] == result["io"]["throttles"] > 0
+    assert aimd["io"]["throttles"] < backoff["io"]["throttles"]
+    assert aimd["peak_in_flight"] <= backoff["peak_in_flight"]
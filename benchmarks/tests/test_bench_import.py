@@ -0,0 +1,65 @@
+import importlib.util
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+BENCH_DIR = Path(__file__).resolve().parents[1]
+
+
+def _load_bench():
+    spec = importlib.util.spec_from_file_location("bench_import", BENCH_DIR / "bench_import.py")
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+bench = _load_bench()
+
+
+def test_parse_importtime_reads_handler_cumulative():
+    stderr = "\n".join(
+        [
+            "import time: self [us] | cumulative | imported package",
+            "import time:       100 |        100 | site",
+            "import time:       300 |       1300 |   catalog",
+            "import time:       200 |        200 |     storage",
+            "import time:       500 |       2500 | handler",
+        ]
+    )
+    parsed = bench._parse_importtime(stderr)
+    assert parsed["total_ms"] == 2.5
+    assert parsed["import:catalog"] == 1.3
+    assert "import:storage" not in parsed
+
+
+@pytest.mark.parametrize("service", bench.SERVICES)
+def test_handlers_defer_boto3_until_first_use(service):
+    src = bench.SERVICES_DIR / service / "src"
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([str(src), str(bench.SERVICES_DIR / "common" / "src")])
+    completed = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, handler; "
+            "print(sorted(m for m in ('boto3', 'botocore') if m in sys.modules))",
+        ],
+        cwd=src,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert completed.stdout.strip() == "[]"
+
+
+def test_compare_flags_cold_init_regressions():
+    baseline = {"feature_service": {"cold_init_ms": 20.0}}
+    assert bench.compare(baseline, {"feature_service": {"cold_init_ms": 24.0}}, threshold=0.5) == []
+    regressions = bench.compare(baseline, {"feature_service": {"cold_init_ms": 40.0}}, threshold=0.5)
+    assert len(regressions) == 1
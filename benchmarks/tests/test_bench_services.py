@@ -0,0 +1,87 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parents[1]
+
+
+def _load_bench():
+    spec = importlib.util.spec_from_file_location("bench_services", BENCH_DIR / "bench_services.py")
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+bench = _load_bench()
+
+
+def test_every_case_runs_against_fake_s3():
+    results = bench.run_suite(list(bench.CASES), [50], repeat=1)
+    assert set(results) == {f"{case}@50" for case in bench.CASES}
+    for measured in results.values():
+        assert measured["rows_per_s"] > 0
+        assert measured["peak_rss_mb"] > 0
+        assert "alloc_peak_mb" in measured
+
+
+def test_compare_flags_only_regressions_beyond_threshold():
+    baseline = {
+        "case@1000": {"rows_per_s": 1000.0, "peak_rss_mb": 40.0, "alloc_peak_mb": 1.0},
+    }
+    within = {"case@1000": {"rows_per_s": 900.0, "peak_rss_mb": 45.0, "alloc_peak_mb": 1.1}}
+    assert bench.compare(baseline, within, threshold=0.25) == []
+
+    slower = {"case@1000": {"rows_per_s": 500.0, "peak_rss_mb": 40.0, "alloc_peak_mb": 2.0}}
+    regressions = bench.compare(baseline, slower, threshold=0.25)
+    assert len(regressions) == 2
+    assert any("throughput" in line for line in regressions)
+    assert any("alloc peak" in line for line in regressions)
+
+
+def test_autorange_spans_the_minimum_sample_time():
+    calls = []
+    loops = bench._autorange(lambda: calls.append(1), min_seconds=0.01)
+    assert loops >= 1 and loops & (loops - 1) == 0
+    # Every doubling round ran, so the warm-up covered at least the final loop count.
+    assert len(calls) == 2 * loops - 1
+
+
+def test_compare_allows_short_cases_a_wider_throughput_threshold():
+    baseline = {
+        "short@1000": {"rows_per_s": 1000.0, "seconds": 0.001, "peak_rss_mb": 40.0},
+        "long@1000": {"rows_per_s": 1000.0, "seconds": 1.0, "peak_rss_mb": 40.0},
+    }
+    current = {
+        "short@1000": {"rows_per_s": 700.0, "peak_rss_mb": 40.0},
+        "long@1000": {"rows_per_s": 700.0, "peak_rss_mb": 40.0},
+    }
+    regressions = bench.compare(baseline, current, threshold=0.25, short_threshold=0.4)
+    assert [line.split(":")[0] for line in regressions] == ["long@1000"]
+    assert len(bench.compare(baseline, current, threshold=0.25)) == 2
+
+
+def test_confirm_regressions_only_keeps_regressions_that_reproduce():
+    baseline = {
+        "noisy@1000": {"rows_per_s": 1000.0, "normalized_throughput": 10.0, "peak_rss_mb": 40.0},
+        "slow@1000": {"rows_per_s": 1000.0, "normalized_throughput": 10.0, "peak_rss_mb": 40.0},
+    }
+    first = {
+        name: {"rows_per_s": 500.0, "normalized_throughput": 5.0, "peak_rss_mb": 40.0}
+        for name in baseline
+    }
+    measured = []
+
+    def measure(case, rows):
+        measured.append((case, rows))
+        speed = 9.0 if case == "noisy" else 5.5
+        return {"rows_per_s": speed * 100, "normalized_throughput": speed, "peak_rss_mb": 40.0}
+
+    confirmed = bench.confirm_regressions(
+        baseline, first, threshold=0.25, attempts=2, measure=measure
+    )
+
+    assert measured == [("noisy", 1000), ("slow", 1000), ("slow", 1000)]
+    regressions = bench.compare(baseline, confirmed, threshold=0.25)
+    assert [line.split(":")[0] for line in regressions] == ["slow@1000"]
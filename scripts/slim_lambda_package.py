@@ -0,0 +1,109 @@
+"""Shrink a Lambda build directory and precompile it for faster cold starts.
+
+Run against a service ``build/`` directory (or a layer's ``python/`` folder)
+right before zipping::
+
+    python scripts/slim_lambda_package.py services/model_service/layer/python
+
+Steps:
+
+1. Drop botocore service models the pipeline never calls (everything under
+   ``botocore/data`` except the services passed via ``--keep-service``; the
+   top-level endpoint/partition JSON files stay). That removes most of
+   botocore's on-disk size and the directory scan at client creation.
+2. Remove packaging metadata, tests and existing ``__pycache__`` folders.
+3. Compile every module with ``--invalidation-mode unchecked-hash`` so the
+   read-only ``/var/task`` never triggers a recompile, regardless of the file
+   timestamps the ZIP preserves. Compile with the same minor Python version as
+   the Lambda runtime (``python3.11`` for ``infra/lambda.tf``), otherwise the
+   ``.pyc`` files are ignored.
+"""
+
+from __future__ import annotations
+
+import argparse
+import compileall
+import py_compile
+import shutil
+import sys
+from pathlib import Path
+from typing import Iterable, Sequence
+
+DEFAULT_KEEP_SERVICES = ("s3", "sts")
+PRUNE_DIR_NAMES = {"__pycache__", "tests", "test"}
+PRUNE_DIR_SUFFIXES = (".dist-info", ".egg-info")
+
+
+def _tree_size(path: Path) -> int:
+    return sum(item.stat().st_size for item in path.rglob("*") if item.is_file())
+
+
+def strip_botocore_data(root: Path, keep_services: Iterable[str]) -> list[Path]:
+    """Remove botocore service model directories not listed in ``keep_services``."""
+    data_dir = root / "botocore" / "data"
+    if not data_dir.is_dir():
+        return []
+    keep = set(keep_services)
+    removed: list[Path] = []
+    for entry in sorted(data_dir.iterdir()):
+        if entry.is_dir() and entry.name not in keep:
+            shutil.rmtree(entry)
+            removed.append(entry)
+    return removed
+
+
+def prune_metadata(root: Path) -> list[Path]:
+    """Remove dist-info/egg-info, test suites and stale bytecode caches."""
+    removed: list[Path] = []
+    for entry in sorted(root.rglob("*"), key=lambda item: len(item.parts), reverse=True):
+        if not entry.is_dir():
+            continue
+        if entry.name in PRUNE_DIR_NAMES or entry.name.endswith(PRUNE_DIR_SUFFIXES):
+            shutil.rmtree(entry, ignore_errors=True)
+            removed.append(entry)
+    return removed
+
+
+def precompile(root: Path) -> bool:
+    return bool(
+        compileall.compile_dir(
+            str(root),
+            quiet=1,
+            invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+        )
+    )
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("root", type=Path, help="Build directory that will be zipped.")
+    parser.add_argument(
+        "--keep-service",
+        action="append",
+        dest="keep_services",
+        default=None,
+        help="botocore service model to keep (repeatable, default: s3, sts).",
+    )
+    parser.add_argument("--no-compile", action="store_true", help="Skip bytecode compilation.")
+    args = parser.parse_args(argv)
+
+    root: Path = args.root
+    if not root.is_dir():
+        parser.error(f"{root} is not a directory")
+    before = _tree_size(root)
+    removed = strip_botocore_data(root, args.keep_services or DEFAULT_KEEP_SERVICES)
+    removed += prune_metadata(root)
+    if not args.no_compile and not precompile(root):
+        print("bytecode compilation failed", file=sys.stderr)
+        return 1
+    after = _tree_size(root)
+    print(
+        f"{root}: removed {len(removed)} directories, "
+        f"{before / 1e6:.1f} MB -> {after / 1e6:.1f} MB "
+        f"(python {sys.version_info.major}.{sys.version_info.minor} bytecode)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,240 @@
+"""Content-addressed disk cache for source objects, shared by warm invocations.
+
+Warm Lambda containers keep ``/tmp`` between invocations, and so do local
+runners, so a source dataset only needs to cross the network again when it
+has changed. :func:`open_cached` is a drop-in for ``storage.open_read``:
+
+- A ref file per ``bucket``/``key`` records the ETag of the cached copy and
+  the SHA-256 of its contents. The contents live once under ``objects/<sha256>``,
+  so identical objects behind different keys share a single file.
+- Every lookup is validated with a conditional GET (``If-None-Match: <etag>``).
+  A ``304 Not Modified`` is served from disk; a changed object is downloaded
+  again.
+- Cache hits are served as memory-mapped streams (:func:`storage.open_mapped`).
+  Parsers decode straight from the page cache.
+- Downloads stream into a temp file that is renamed into place, and refs are
+  replaced the same way. Readers therefore never see a partial file, even
+  with concurrent threads or processes.
+- The objects are bounded to ``PIPELINE_CACHE_MAX_MB``. When an insert goes
+  over the bound, the least recently used files are evicted (hits refresh a
+  file's mtime).
+
+Only the S3 backend is cached, because the filesystem and memory backends are
+already local. Hits, misses and bytes saved go to the invocation's counters
+and are returned by :func:`cache_counters`.
+
+Environment knobs:
+
+- ``PIPELINE_CACHE`` – set to ``0``/``false`` to bypass the cache.
+- ``PIPELINE_CACHE_DIR`` – cache root (default ``/tmp/pipeline-cache``).
+- ``PIPELINE_CACHE_MAX_MB`` – size bound for cached objects (default ``256``).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+from instrumentation import count, current, stage
+from storage import ObjectReader, StorageBackend, open_mapped
+
+_TRUTHY_OFF = {"0", "false", "no", "off"}
+_COPY_CHUNK = 1024 * 1024
+COUNTER_NAMES = ("cache_hits", "cache_misses", "cache_bytes_saved")
+
+_evict_lock = threading.Lock()
+
+
+class DiskCache:
+    """Object cache rooted at ``root`` and bounded to ``max_bytes`` of object data."""
+
+    def __init__(self, root: str | os.PathLike[str], max_bytes: int) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.objects_dir = self.root / "objects"
+        self.refs_dir = self.root / "refs"
+        self.tmp_dir = self.root / "tmp"
+        for directory in (self.objects_dir, self.refs_dir, self.tmp_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "DiskCache | None":
+        if os.getenv("PIPELINE_CACHE", "1").strip().lower() in _TRUTHY_OFF:
+            return None
+        root = os.getenv("PIPELINE_CACHE_DIR", "/tmp/pipeline-cache")
+        max_bytes = int(float(os.getenv("PIPELINE_CACHE_MAX_MB", "256")) * 1024 * 1024)
+        return cls(root, max_bytes)
+
+    def _ref_path(self, bucket: str, key: str) -> Path:
+        digest = hashlib.sha256(f"{bucket}\0{key}".encode("utf-8")).hexdigest()
+        return self.refs_dir / f"{digest}.json"
+
+    def lookup(self, bucket: str, key: str) -> Tuple[Dict[str, Any], Path] | None:
+        """Return the ref and object path for ``bucket``/``key`` if both are present."""
+        try:
+            ref = json.loads(self._ref_path(bucket, key).read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+        path = self.objects_dir / str(ref.get("sha256", ""))
+        if not ref.get("etag") or not path.is_file():
+            return None
+        return ref, path
+
+    def touch(self, path: Path) -> None:
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+    def accepts(self, obj: ObjectReader) -> bool:
+        return obj.etag is not None and (obj.size is None or obj.size <= self.max_bytes)
+
+    def store(self, bucket: str, key: str, obj: ObjectReader) -> Path | None:
+        """Stream ``obj`` into the cache and return its path.
+
+        Returns ``None``, leaving nothing behind, when the body turns out to
+        be larger than the whole cache.
+        """
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_name = _mkstemp(self.tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                while True:
+                    chunk = obj.stream.read(_COPY_CHUNK)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    handle.write(chunk)
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise _TooLarge
+            digest = hasher.hexdigest()
+            path = self.objects_dir / digest
+            os.replace(tmp_name, path)
+        except _TooLarge:
+            os.unlink(tmp_name)
+            return None
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
+        ref = {"bucket": bucket, "key": key, "etag": obj.etag, "sha256": digest, "size": size}
+        fd, tmp_ref = _mkstemp(self.tmp_dir)
+        with os.fdopen(fd, "w") as handle:
+            json.dump(ref, handle)
+        os.replace(tmp_ref, self._ref_path(bucket, key))
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep: Path | None = None) -> int:
+        """Drop least recently used objects until the cache fits; return bytes freed."""
+        with _evict_lock:
+            entries = []
+            total = 0
+            for path in self.objects_dir.iterdir():
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+                total += stat.st_size
+            freed = 0
+            for _, size, path in sorted(entries):
+                if total - freed <= self.max_bytes:
+                    break
+                if keep is not None and path == keep:
+                    continue
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    continue
+                freed += size
+        if freed:
+            count("cache_bytes_evicted", freed, "Bytes")
+        return freed
+
+
+class _TooLarge(Exception):
+    pass
+
+
+def _mkstemp(directory: Path) -> Tuple[int, str]:
+    import tempfile
+
+    return tempfile.mkstemp(dir=directory, prefix=".part-")
+
+
+_default_cache: DiskCache | None = None
+_default_config: Tuple[str, str, str] | None = None
+_default_lock = threading.Lock()
+
+
+def default_cache() -> DiskCache | None:
+    """The cache configured by the environment, reused across warm invocations."""
+    global _default_cache, _default_config
+    config = (
+        os.getenv("PIPELINE_CACHE", "1"),
+        os.getenv("PIPELINE_CACHE_DIR", ""),
+        os.getenv("PIPELINE_CACHE_MAX_MB", ""),
+    )
+    with _default_lock:
+        if _default_config != config:
+            _default_cache = DiskCache.from_env()
+            _default_config = config
+        return _default_cache
+
+
+def open_cached(
+    storage: StorageBackend, bucket: str, key: str, cache: DiskCache | None = None
+) -> ObjectReader:
+    """``storage.open_read`` through the disk cache (S3 backend only)."""
+    cache = cache if cache is not None else default_cache()
+    if cache is None or storage.name != "s3":
+        return storage.open_read(bucket, key)
+
+    cached = cache.lookup(bucket, key)
+    if cached is not None:
+        ref, path = cached
+        obj = storage.open_read_if_changed(bucket, key, ref["etag"])
+        if obj is None:
+            try:
+                with stage("cache_read"):
+                    reader = open_mapped(path, etag=ref["etag"])
+            except FileNotFoundError:
+                # Evicted between lookup and open: fetch it again unconditionally.
+                obj = storage.open_read(bucket, key)
+            else:
+                cache.touch(path)
+                count("cache_hits", 1)
+                count("cache_bytes_saved", reader.size or 0, "Bytes")
+                return reader
+    else:
+        obj = storage.open_read(bucket, key)
+
+    count("cache_misses", 1)
+    if not cache.accepts(obj):
+        return obj
+    with obj, stage("cache_write"):
+        path = cache.store(bucket, key, obj)
+    try:
+        if path is not None:
+            return open_mapped(path, etag=obj.etag)
+    except FileNotFoundError:
+        pass
+    # Over the bound mid-stream (no ContentLength) or evicted by another process.
+    return storage.open_read(bucket, key)
+
+
+def cache_counters() -> Dict[str, int]:
+    """Hit/miss/bytes-saved counts of the active invocation, for handler responses."""
+    invocation = current()
+    counters = invocation.counters if invocation is not None else {}
+    report: Dict[str, int] = {}
+    for name in COUNTER_NAMES:
+        value, _unit = counters.get(name, (0.0, "Count"))
+        report[name[len("cache_") :]] = int(value)
+    return report
@@ -0,0 +1,337 @@
+"""Object catalog (manifest index) used for partition pruning.
+
+The catalog is opt-in. Writers (data ingest and feature service) upsert one
+entry per object into a JSON manifest stored next to the data, at the key
+given by the event's ``catalog_key`` or ``PIPELINE_CATALOG_KEY``
+(conventionally ``catalog/manifest.json``). Readers resolve symbol/time-range predicates
+against that manifest to find exactly the objects they need. They never LIST a
+prefix and never open objects that cannot match.
+
+Concurrent writers (a fan-out of ingest or feature invocations) share the
+manifest safely. :func:`record_objects` is an optimistic compare-and-swap:
+GET the manifest and keep its ETag, upsert the entries, then PUT on the
+condition that the ETag has not changed (``If-Match``, or ``If-None-Match: *``
+for a new manifest). If another writer got there first, the PUT fails with
+``412`` and the update is redone on top of the fresh manifest after a
+jittered backoff. Entries are therefore never dropped.
+
+The cost is one manifest GET and one conditional PUT per writing invocation,
+plus one more of each per conflict (counted as ``catalog_conflicts``). Wide
+fan-outs can raise ``PIPELINE_CATALOG_MAX_ATTEMPTS`` (default ``10``) or, better,
+give each prefix or symbol its own ``catalog_key``. Handlers call
+:func:`try_record_objects`: by the time the manifest is updated the data is
+already written, so a failed update is logged and counted
+(``catalog_errors``) instead of failing the invocation.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Sequence
+
+from instrumentation import count, stage
+from retry import RetryPolicy
+from storage import ObjectNotFound, PreconditionFailed, StorageBackend
+
+CATALOG_KEY_ENV = "PIPELINE_CATALOG_KEY"
+CATALOG_ATTEMPTS_ENV = "PIPELINE_CATALOG_MAX_ATTEMPTS"
+MANIFEST_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CatalogEntry:
+    """Statistics about one stored object, enough to decide whether to read it."""
+
+    key: str
+    dataset: str
+    format: str
+    symbol: str | None
+    min_timestamp: str | None
+    max_timestamp: str | None
+    min_sequence: int | None
+    max_sequence: int | None
+    row_count: int
+    byte_size: int
+    etag: str | None = None
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "CatalogEntry":
+        names = {field.name for field in fields(cls)}
+        return cls(**{name: data.get(name) for name in names})
+
+
+def entry_for_rows(
+    *,
+    key: str,
+    dataset: str,
+    fmt: str,
+    rows: Sequence[Mapping[str, Any]],
+    byte_size: int,
+    etag: str | None,
+) -> CatalogEntry:
+    """Compute the min/max statistics of ``rows`` in one pass."""
+    symbols = set()
+    min_ts = max_ts = None
+    min_seq = max_seq = None
+    for row in rows:
+        symbols.add(row.get("symbol"))
+        timestamp = row.get("timestamp") or None
+        if timestamp is not None:
+            min_ts = timestamp if min_ts is None or timestamp < min_ts else min_ts
+            max_ts = timestamp if max_ts is None or timestamp > max_ts else max_ts
+        sequence = row.get("sequence")
+        if sequence is not None:
+            min_seq = sequence if min_seq is None or sequence < min_seq else min_seq
+            max_seq = sequence if max_seq is None or sequence > max_seq else max_seq
+    return CatalogEntry(
+        key=key,
+        dataset=dataset,
+        format=fmt,
+        # Mixed-symbol objects get no symbol so they are never pruned by mistake.
+        symbol=next(iter(symbols)) if len(symbols) == 1 else None,
+        min_timestamp=min_ts,
+        max_timestamp=max_ts,
+        min_sequence=min_seq,
+        max_sequence=max_seq,
+        row_count=len(rows),
+        byte_size=byte_size,
+        etag=etag,
+    )
+
+
+class InvalidPredicates(ValueError):
+    """The event's symbol/time predicates are malformed (a client error)."""
+
+
+def _parse_time(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+@dataclass
+class Predicates:
+    """Symbol and time-range filter resolved against the catalog."""
+
+    symbols: Sequence[str] | None = None
+    start_time: str | None = None
+    end_time: str | None = None
+
+    def __post_init__(self) -> None:
+        # Parsed once here, so a bad window fails before any object is read.
+        self._start = self._parse_bound("start_time", self.start_time)
+        self._end = self._parse_bound("end_time", self.end_time)
+        if self._start is not None and self._end is not None and self._start > self._end:
+            raise InvalidPredicates(
+                f"start_time {self.start_time!r} is after end_time {self.end_time!r}"
+            )
+
+    @staticmethod
+    def _parse_bound(name: str, value: Any) -> datetime | None:
+        if value is not None and not isinstance(value, str):
+            raise InvalidPredicates(f"{name} must be an ISO-8601 string, got {value!r}")
+        try:
+            return _parse_time(value)
+        except ValueError:
+            raise InvalidPredicates(
+                f"{name} must be an ISO-8601 timestamp, got {value!r}"
+            ) from None
+
+    @property
+    def active(self) -> bool:
+        return bool(self.symbols or self.start_time or self.end_time)
+
+    @classmethod
+    def from_event(cls, payload: Mapping[str, Any]) -> "Predicates":
+        symbols = payload.get("symbols")
+        if isinstance(symbols, str):
+            symbols = [part.strip() for part in symbols.split(",") if part.strip()]
+        return cls(
+            symbols=list(symbols) if symbols else None,
+            start_time=payload.get("start_time") or None,
+            end_time=payload.get("end_time") or None,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def row_filter(self) -> Callable[[str | None, str | None], bool] | None:
+        """Return a ``(symbol, timestamp) -> bool`` test for single rows.
+
+        :meth:`matches` only prunes whole objects. An object that straddles
+        the window, or mixes symbols, still holds rows outside it, so readers
+        apply this test to every parsed row. Returns ``None`` when there is
+        nothing to filter. Rows without a parseable timestamp never fall
+        inside a time window.
+        """
+        if not self.active:
+            return None
+        symbols = frozenset(self.symbols or ())
+        start, end = self._start, self._end
+
+        def keep(symbol: str | None, timestamp: str | None) -> bool:
+            if symbols and symbol not in symbols:
+                return False
+            if start is None and end is None:
+                return True
+            try:
+                moment = _parse_time(timestamp)
+            except ValueError:
+                return False
+            if moment is None:
+                return False
+            return (start is None or moment >= start) and (end is None or moment <= end)
+
+        return keep
+
+    def matches(self, entry: CatalogEntry) -> bool:
+        if self.symbols and entry.symbol is not None and entry.symbol not in self.symbols:
+            return False
+        start, end = self._start, self._end
+        if start is not None and entry.max_timestamp and _parse_time(entry.max_timestamp) < start:
+            return False
+        if end is not None and entry.min_timestamp and _parse_time(entry.min_timestamp) > end:
+            return False
+        return True
+
+
+class Catalog:
+    """In-memory view of one manifest object.
+
+    ``etag`` is the version the view was loaded from (``None`` when the
+    manifest did not exist); :meth:`save` only succeeds while it is current.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        key: str,
+        entries: Dict[str, CatalogEntry] | None = None,
+        etag: str | None = None,
+    ) -> None:
+        self.bucket = bucket
+        self.key = key
+        self.entries: Dict[str, CatalogEntry] = entries or {}
+        self.etag = etag
+
+    @classmethod
+    def load(cls, storage: StorageBackend, bucket: str, key: str) -> "Catalog":
+        with stage("catalog_get"):
+            try:
+                with storage.open_read(bucket, key) as obj:
+                    document = json.loads(obj.stream.read())
+                    etag = obj.etag
+            except ObjectNotFound:
+                return cls(bucket, key)
+        entries = {
+            name: CatalogEntry.from_dict(entry)
+            for name, entry in (document.get("entries") or {}).items()
+        }
+        return cls(bucket, key, entries, etag)
+
+    def upsert(self, entry: CatalogEntry) -> None:
+        self.entries[entry.key] = entry
+
+    def save(self, storage: StorageBackend) -> str | None:
+        """Write the manifest unless it changed since it was loaded.
+
+        Raises ``storage.PreconditionFailed`` when another writer saved first.
+        """
+        document = {
+            "version": MANIFEST_VERSION,
+            "updated_at": datetime.now(tz=timezone.utc).isoformat(),
+            "entries": {name: asdict(entry) for name, entry in sorted(self.entries.items())},
+        }
+        with stage("catalog_put"):
+            self.etag = storage.write_bytes_if_match(
+                self.bucket,
+                self.key,
+                json.dumps(document).encode("utf-8"),
+                self.etag,
+                "application/json",
+            )
+        return self.etag
+
+    def resolve(self, predicates: Predicates, *, dataset: str | None = None) -> List[CatalogEntry]:
+        """Return matching entries ordered by symbol, then time, then sequence."""
+        matched = [
+            entry
+            for entry in self.entries.values()
+            if (dataset is None or entry.dataset == dataset) and predicates.matches(entry)
+        ]
+        return sorted(
+            matched,
+            key=lambda entry: (
+                entry.symbol or "",
+                entry.min_timestamp or "",
+                entry.min_sequence if entry.min_sequence is not None else -1,
+                entry.key,
+            ),
+        )
+
+
+def catalog_key(payload: Mapping[str, Any]) -> str:
+    """Manifest key from the event or ``PIPELINE_CATALOG_KEY``; empty when unset."""
+    return payload.get("catalog_key") or os.getenv(CATALOG_KEY_ENV, "")
+
+
+def record_objects(
+    storage: StorageBackend,
+    bucket: str,
+    key: str,
+    entries: Iterable[CatalogEntry],
+    *,
+    policy: RetryPolicy | None = None,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Catalog:
+    """Upsert ``entries`` into the manifest at ``bucket``/``key`` and save it.
+
+    Conflicting concurrent saves are retried on the fresh manifest, up to
+    ``policy.max_attempts`` times.
+    """
+    entries = list(entries)
+    if policy is None:
+        attempts = int(os.getenv(CATALOG_ATTEMPTS_ENV, "10"))
+        policy = RetryPolicy(max_attempts=max(1, attempts), max_delay=2.0)
+    attempt = 1
+    while True:
+        catalog = Catalog.load(storage, bucket, key)
+        for entry in entries:
+            catalog.upsert(entry)
+        try:
+            catalog.save(storage)
+        except PreconditionFailed:
+            count("catalog_conflicts", 1)
+            if attempt >= policy.max_attempts:
+                raise
+            sleep(policy.backoff(attempt))
+            attempt += 1
+            continue
+        return catalog
+
+
+def try_record_objects(
+    storage: StorageBackend,
+    bucket: str,
+    key: str,
+    entries: Iterable[CatalogEntry],
+) -> bool:
+    """:func:`record_objects`, but a failed update is logged instead of raised.
+
+    Returns whether the manifest was saved.
+    """
+    try:
+        record_objects(storage, bucket, key, entries)
+    except Exception:
+        count("catalog_errors", 1)
+        logger.warning("Could not update catalog %s/%s", bucket, key, exc_info=True)
+        return False
+    return True
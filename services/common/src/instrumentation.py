@@ -0,0 +1,214 @@
+"""Per-invocation timing and counter instrumentation shared by every Lambda.
+
+Handlers are wrapped with :func:`instrumented`, which opens an invocation scope,
+collects stage timings recorded via :func:`stage` and counters recorded via
+:func:`count`, and flushes them once as a single CloudWatch Embedded Metric
+Format (EMF) line when the handler returns.
+
+Environment knobs:
+
+- ``PIPELINE_METRICS`` – set to ``0``/``false`` to silence the EMF line.
+- ``PIPELINE_METRICS_NAMESPACE`` – CloudWatch namespace (default ``MlPipeline``).
+- ``PIPELINE_PROFILE`` – ``cprofile`` or ``tracemalloc`` to capture a profile.
+- ``PIPELINE_PROFILE_DIR`` – where profile dumps are written (default ``/tmp``).
+- ``PIPELINE_PROFILE_S3_URI`` – optional ``s3://bucket/prefix`` to upload dumps to.
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Mapping, Tuple
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+_TRUTHY_OFF = {"0", "false", "no", "off"}
+
+_current: ContextVar["Invocation | None"] = ContextVar("pipeline_invocation", default=None)
+
+
+class Invocation:
+    """Buffers stage timings and counters for a single handler invocation."""
+
+    def __init__(self, service: str) -> None:
+        self.service = service
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+        self.counters: Dict[str, Tuple[float, str]] = {}
+        # Transfer threads (see retry.parallel_map) share the invocation.
+        self._lock = threading.Lock()
+
+    def add_timing(self, name: str, elapsed_ms: float) -> None:
+        with self._lock:
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed_ms
+
+    def add_count(self, name: str, value: float, unit: str = "Count") -> None:
+        with self._lock:
+            previous, _ = self.counters.get(name, (0.0, unit))
+            self.counters[name] = (previous + value, unit)
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._started) * 1000.0
+
+    def to_emf(self, namespace: str) -> Dict[str, Any]:
+        """Render the buffered values as one EMF document."""
+        metrics: List[Dict[str, str]] = []
+        values: Dict[str, float] = {}
+        for name, elapsed in self.timings.items():
+            metric = f"{name}_ms"
+            metrics.append({"Name": metric, "Unit": "Milliseconds"})
+            values[metric] = round(elapsed, 3)
+        for name, (value, unit) in self.counters.items():
+            metrics.append({"Name": name, "Unit": unit})
+            values[name] = value
+        metrics.append({"Name": "total_ms", "Unit": "Milliseconds"})
+        values["total_ms"] = round(self.elapsed_ms(), 3)
+        return {
+            "_aws": {
+                "Timestamp": int(self.started_at * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": namespace,
+                        "Dimensions": [["Service"]],
+                        "Metrics": metrics,
+                    }
+                ],
+            },
+            "Service": self.service,
+            **values,
+        }
+
+
+def current() -> Invocation | None:
+    """Return the active invocation, if a handler is currently instrumented."""
+    return _current.get()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block with a monotonic clock and add it to the active invocation."""
+    invocation = _current.get()
+    if invocation is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        invocation.add_timing(name, (time.perf_counter() - started) * 1000.0)
+
+
+def count(name: str, value: float, unit: str = "Count") -> None:
+    """Accumulate a counter (rows, bytes, ...) on the active invocation."""
+    invocation = _current.get()
+    if invocation is not None:
+        invocation.add_count(name, float(value), unit)
+
+
+def _metrics_enabled() -> bool:
+    return os.getenv("PIPELINE_METRICS", "1").strip().lower() not in _TRUTHY_OFF
+
+
+def _emit(invocation: Invocation) -> None:
+    if not _metrics_enabled():
+        return
+    namespace = os.getenv("PIPELINE_METRICS_NAMESPACE", "MlPipeline")
+    print(json.dumps(invocation.to_emf(namespace)))
+
+
+def _upload_profile(path: Path) -> None:
+    """Copy a profile dump to ``PIPELINE_PROFILE_S3_URI``; never fails the invocation."""
+    target = os.getenv("PIPELINE_PROFILE_S3_URI")
+    if not target or not target.startswith("s3://"):
+        return
+    bucket, _, prefix = target[len("s3://") :].partition("/")
+    key = f"{prefix.rstrip('/')}/{path.name}" if prefix else path.name
+
+    # storage imports this module, so it can only be imported lazily here.
+    from storage import s3_client, storage_from_env
+
+    endpoint_url = os.getenv("AWS_ENDPOINT_URL")
+    try:
+        storage = storage_from_env(lambda: s3_client(endpoint_url))
+        with open(path, "rb") as source, storage.open_write(bucket, key) as writer:
+            for chunk in iter(lambda: source.read(1024 * 1024), b""):
+                writer.write(chunk)
+    except Exception:
+        logger.warning("Could not upload profile %s to %s", path, target, exc_info=True)
+
+
+@contextmanager
+def _profiling(service: str) -> Iterator[None]:
+    """Optionally run the wrapped block under cProfile or tracemalloc."""
+    mode = os.getenv("PIPELINE_PROFILE", "").strip().lower()
+    if mode not in {"cprofile", "tracemalloc"}:
+        yield
+        return
+
+    from pathlib import Path
+
+    out_dir = Path(os.getenv("PIPELINE_PROFILE_DIR", "/tmp"))
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+    suffix = f"{os.getpid()}-{time.perf_counter_ns()}"
+
+    if mode == "cprofile":
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            path = out_dir / f"{service}-{stamp}-{suffix}.prof"
+            profiler.dump_stats(str(path))
+            _upload_profile(path)
+        return
+
+    import tracemalloc
+
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start()
+    try:
+        yield
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if not already_tracing:
+            tracemalloc.stop()
+        count("tracemalloc_peak_bytes", peak, "Bytes")
+        path = out_dir / f"{service}-{stamp}-{suffix}.tracemalloc"
+        snapshot.dump(str(path))
+        _upload_profile(path)
+
+
+def instrumented(service: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorate a ``lambda_handler`` so its stages are timed and flushed once."""
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(func)
+        def wrapper(event: Mapping[str, Any] | None, context: Any) -> Any:
+            invocation = Invocation(service)
+            token = _current.set(invocation)
+            try:
+                with _profiling(service):
+                    return func(event, context)
+            finally:
+                _current.reset(token)
+                _emit(invocation)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,263 @@
+"""Retry, backoff and adaptive concurrency for object storage requests.
+
+:class:`storage.S3Storage` sends every client call through
+:func:`call_with_retry`:
+
+- Throttling (``SlowDown``, 503, 429, ``Throttling*``), transient 5xx and
+  connection errors are retried with full-jitter exponential backoff, meaning
+  a sleep of ``uniform(0, min(max_delay, base_delay * 2**attempt))``.
+- All other errors, including missing keys and access denied, are raised
+  immediately.
+- An :class:`AdaptiveLimiter` caps the requests in flight in this process.
+  It follows AIMD: every success raises the cap by ``1/cap``, roughly one
+  slot per round of requests, and a throttle halves it. Throttles from
+  requests that started before the last cut are ignored, so one burst of
+  ``SlowDown`` responses only halves the cap once. Parallel
+  transfers therefore settle at the concurrency the backend sustains,
+  instead of hammering it with retries.
+
+botocore's own retries are disabled via :func:`client_config` so the two
+layers do not multiply.
+
+Environment knobs:
+
+- ``PIPELINE_RETRY_MAX_ATTEMPTS`` – attempts per request, including the first (default ``6``).
+- ``PIPELINE_RETRY_BASE_MS`` / ``PIPELINE_RETRY_MAX_MS`` – backoff base and cap (``50`` / ``5000``).
+- ``PIPELINE_S3_MAX_CONCURRENCY`` – upper bound for the limiter (default ``32``).
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, TypeVar
+
+from instrumentation import count, current
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+THROTTLE_CODES = {
+    "SlowDown",
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestThrottled",
+    "RequestLimitExceeded",
+    "TooManyRequests",
+    "TooManyRequestsException",
+    "ProvisionedThroughputExceededException",
+    "ServiceUnavailable",
+    "503",
+}
+TRANSIENT_CODES = {"InternalError", "RequestTimeout", "RequestTimeTooSkewed", "500", "502", "504"}
+# botocore transport errors, matched by name so botocore is never imported here.
+TRANSIENT_EXCEPTIONS = {
+    "EndpointConnectionError",
+    "ConnectTimeoutError",
+    "ReadTimeoutError",
+    "ConnectionClosedError",
+    "ResponseStreamingError",
+}
+COUNTER_NAMES = ("s3_requests", "s3_retries", "s3_throttles")
+
+
+def _error_details(exc: BaseException) -> tuple[str, int | None]:
+    response = getattr(exc, "response", None) or {}
+    code = str((response.get("Error") or {}).get("Code", ""))
+    status = (response.get("ResponseMetadata") or {}).get("HTTPStatusCode")
+    return code, int(status) if status is not None else None
+
+
+def is_throttle(exc: BaseException) -> bool:
+    code, status = _error_details(exc)
+    return code in THROTTLE_CODES or status in {429, 503}
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if is_throttle(exc):
+        return True
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    if any(cls.__name__ in TRANSIENT_EXCEPTIONS for cls in type(exc).__mro__):
+        return True
+    code, status = _error_details(exc)
+    return code in TRANSIENT_CODES or status in {500, 502, 504}
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 6
+    base_delay: float = 0.05
+    max_delay: float = 5.0
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            max_attempts=max(1, int(os.getenv("PIPELINE_RETRY_MAX_ATTEMPTS", "6"))),
+            base_delay=float(os.getenv("PIPELINE_RETRY_BASE_MS", "50")) / 1000.0,
+            max_delay=float(os.getenv("PIPELINE_RETRY_MAX_MS", "5000")) / 1000.0,
+        )
+
+    def backoff(self, attempt: int, rng: random.Random | None = None) -> float:
+        """Full-jitter delay before retry number ``attempt`` (1-based)."""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return (rng or random).uniform(0.0, ceiling)
+
+
+class AdaptiveLimiter:
+    """AIMD cap on concurrent requests, shared by every thread in the process."""
+
+    def __init__(
+        self,
+        initial: float = 8.0,
+        *,
+        minimum: float = 1.0,
+        maximum: float = 32.0,
+        decrease: float = 0.5,
+    ) -> None:
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.decrease = decrease
+        self._limit = min(max(initial, minimum), self.maximum)
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._last_decrease = float("-inf")
+        self.peak_in_flight = 0
+
+    @property
+    def limit(self) -> float:
+        return self._limit
+
+    def acquire(self) -> float:
+        """Block until a slot is free; return the monotonic time the request started."""
+        with self._cond:
+            while self._in_flight >= int(self._limit):
+                self._cond.wait()
+            self._in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self._in_flight)
+            return time.monotonic()
+
+    def release(self) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+
+    def on_success(self) -> None:
+        with self._cond:
+            previous = int(self._limit)
+            self._limit = min(self.maximum, self._limit + 1.0 / self._limit)
+            if int(self._limit) > previous:
+                self._cond.notify()
+
+    def on_throttle(self, started: float | None = None) -> None:
+        with self._cond:
+            if started is not None and started < self._last_decrease:
+                return
+            self._limit = max(self.minimum, self._limit * self.decrease)
+            self._last_decrease = time.monotonic()
+
+    def __enter__(self) -> "AdaptiveLimiter":
+        self.acquire()
+        return self
+
+    def __exit__(self, *_exc: Any) -> None:
+        self.release()
+
+
+_shared_limiter: AdaptiveLimiter | None = None
+_shared_lock = threading.Lock()
+
+
+def shared_limiter() -> AdaptiveLimiter:
+    """Process-wide limiter, so concurrent handlers and threads back off together."""
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            maximum = float(os.getenv("PIPELINE_S3_MAX_CONCURRENCY", "32"))
+            _shared_limiter = AdaptiveLimiter(initial=min(8.0, maximum), maximum=maximum)
+        return _shared_limiter
+
+
+def call_with_retry(
+    func: Callable[[], R],
+    *,
+    policy: RetryPolicy | None = None,
+    limiter: AdaptiveLimiter | None = None,
+    sleep: Callable[[float], None] = time.sleep,
+) -> R:
+    """Run ``func`` until it succeeds, fails permanently or runs out of attempts."""
+    policy = policy or RetryPolicy()
+    attempt = 1
+    while True:
+        count("s3_requests", 1)
+        started = limiter.acquire() if limiter is not None else None
+        try:
+            result = func()
+        except Exception as exc:
+            throttled = is_throttle(exc)
+            if limiter is not None:
+                limiter.release()
+                if throttled:
+                    limiter.on_throttle(started)
+            if throttled:
+                count("s3_throttles", 1)
+            if attempt >= policy.max_attempts or not is_retryable(exc):
+                raise
+            count("s3_retries", 1)
+            sleep(policy.backoff(attempt))
+            attempt += 1
+            continue
+        if limiter is not None:
+            limiter.release()
+            limiter.on_success()
+        return result
+
+
+def client_config() -> Any:
+    """botocore ``Config`` for clients wrapped by :func:`call_with_retry`."""
+    from botocore.config import Config
+
+    maximum = int(os.getenv("PIPELINE_S3_MAX_CONCURRENCY", "32"))
+    return Config(retries={"total_max_attempts": 1}, max_pool_connections=max(10, maximum))
+
+
+def parallel_map(func: Callable[[T], R], items: Iterable[T], max_workers: int) -> Iterator[R]:
+    """Ordered ``map`` over a thread pool for I/O-bound transfers.
+
+    At most ``2 * max_workers`` calls are in flight. Every call runs in a
+    copy of the caller's context, so stage timings and counters still reach
+    the active invocation. With ``max_workers <= 1`` it runs inline.
+    """
+    if max_workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    import contextvars
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending: deque = deque()
+        for item in items:
+            pending.append(pool.submit(contextvars.copy_context().run, func, item))
+            if len(pending) >= 2 * max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def io_counters() -> Dict[str, int]:
+    """Request/retry/throttle counts of the active invocation, for handler responses."""
+    invocation = current()
+    counters = invocation.counters if invocation is not None else {}
+    report: Dict[str, int] = {}
+    for name in COUNTER_NAMES:
+        value, _unit = counters.get(name, (0.0, "Count"))
+        report[name[len("s3_") :]] = int(value)
+    return report
+
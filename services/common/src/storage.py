@@ -0,0 +1,722 @@
+"""Pluggable object storage shared by every Lambda.
+
+Handlers address objects by ``bucket``/``key`` exactly as before. The backend
+behind them is picked by configuration alone via ``PIPELINE_STORAGE_URL``:
+
+- unset or ``s3`` – boto3 S3 client (honours ``AWS_ENDPOINT_URL`` / LocalStack).
+  Every request goes through :mod:`retry` (jittered backoff plus the
+  process-wide AIMD concurrency limiter).
+- ``file:///some/dir`` – local filesystem, objects live at ``<dir>/<bucket>/<key>``.
+  Reads are memory-mapped so parsers consume the page cache directly.
+- ``memory://`` – process-wide in-memory dict, handy for tests and the
+  in-process pipeline runner.
+
+Large outputs are streamed with :meth:`StorageBackend.open_write`, which
+becomes an S3 multipart upload once the first part fills and an atomic
+rename on the filesystem.
+"""
+
+from __future__ import annotations
+
+import abc
+import hashlib
+import io
+import mmap
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Tuple
+
+from instrumentation import count, stage
+from retry import AdaptiveLimiter, RetryPolicy, call_with_retry, client_config, shared_limiter
+
+STORAGE_URL_ENV = "PIPELINE_STORAGE_URL"
+# S3 rejects multipart parts under 5 MiB (except the last one).
+MULTIPART_PART_BYTES = 8 * 1024 * 1024
+
+
+class ObjectNotFound(KeyError):
+    """Raised by every backend when ``bucket``/``key`` does not exist."""
+
+
+class PreconditionFailed(Exception):
+    """Raised by :meth:`StorageBackend.write_bytes_if_match` when the object changed."""
+
+
+@dataclass
+class ObjectReader:
+    """An open object: a binary stream plus whatever metadata the backend knows."""
+
+    stream: BinaryIO
+    size: int | None = None
+    etag: str | None = None
+
+    def close(self) -> None:
+        self.stream.close()
+
+    def __enter__(self) -> "ObjectReader":
+        return self
+
+    def __exit__(self, *_exc: Any) -> None:
+        self.close()
+
+
+@dataclass
+class ObjectInfo:
+    """Metadata of a stored object, as returned by :meth:`StorageBackend.head`."""
+
+    size: int | None = None
+    etag: str | None = None
+
+
+class ObjectWriter(abc.ABC):
+    """Streaming writer returned by :meth:`StorageBackend.open_write`.
+
+    Bytes become visible under the key only when the writer is committed
+    (closed without an exception); an exception inside the ``with`` block
+    aborts the write and leaves any previous object untouched.
+    """
+
+    def __init__(self) -> None:
+        self.size = 0
+        self.etag: str | None = None
+        self.closed = False
+
+    def write(self, data: bytes) -> int:
+        if self.closed:
+            raise ValueError("write to a closed ObjectWriter")
+        self._write(data)
+        self.size += len(data)
+        return len(data)
+
+    def commit(self) -> str | None:
+        if not self.closed:
+            self.closed = True
+            self.etag = self._commit()
+        return self.etag
+
+    def abort(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self._abort()
+
+    def __enter__(self) -> "ObjectWriter":
+        return self
+
+    def __exit__(self, exc_type: Any, *_exc: Any) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+    @abc.abstractmethod
+    def _write(self, data: bytes) -> None:
+        """Accept the next chunk of the object."""
+
+    @abc.abstractmethod
+    def _commit(self) -> str | None:
+        """Publish the object under its key and return its ETag."""
+
+    @abc.abstractmethod
+    def _abort(self) -> None:
+        """Discard everything written so far."""
+
+
+class StorageBackend(abc.ABC):
+    """Interface implemented by the S3, filesystem and memory backends."""
+
+    name = "base"
+
+    @abc.abstractmethod
+    def open_read(self, bucket: str, key: str) -> ObjectReader:
+        """Open ``key`` for streaming; raise ``ObjectNotFound`` when it does not exist."""
+
+    @abc.abstractmethod
+    def head(self, bucket: str, key: str) -> ObjectInfo:
+        """Return size and ETag without reading the body; raise ``ObjectNotFound``."""
+
+    def open_read_if_changed(self, bucket: str, key: str, etag: str) -> ObjectReader | None:
+        """Conditional read: ``None`` when the object's ETag still equals ``etag``."""
+        obj = self.open_read(bucket, key)
+        if obj.etag is not None and obj.etag == etag:
+            obj.close()
+            return None
+        return obj
+
+    @abc.abstractmethod
+    def open_write(
+        self, bucket: str, key: str, content_type: str = "application/octet-stream"
+    ) -> ObjectWriter:
+        """Return a writer that streams ``key`` without buffering the whole object."""
+
+    @abc.abstractmethod
+    def write_bytes(
+        self, bucket: str, key: str, data: bytes, content_type: str = "application/octet-stream"
+    ) -> str | None:
+        """Store ``data`` and return the object's ETag when the backend reports one."""
+
+    @abc.abstractmethod
+    def write_bytes_if_match(
+        self,
+        bucket: str,
+        key: str,
+        data: bytes,
+        etag: str | None,
+        content_type: str = "application/octet-stream",
+    ) -> str | None:
+        """Compare-and-swap write: store ``data`` only while the object's ETag is ``etag``.
+
+        ``etag=None`` means the object must not exist yet. Raises
+        ``PreconditionFailed`` when another writer got there first.
+        """
+
+    def read_bytes(self, bucket: str, key: str) -> bytes:
+        with self.open_read(bucket, key) as obj:
+            return obj.stream.read()
+
+    def read_text(self, bucket: str, key: str, encoding: str = "utf-8") -> str:
+        return self.read_bytes(bucket, key).decode(encoding)
+
+
+def _md5_etag(data: bytes | memoryview) -> str:
+    return f'"{hashlib.md5(data).hexdigest()}"'
+
+
+class S3Storage(StorageBackend):
+    """Backend that talks to S3 (or LocalStack) through a lazily built client."""
+
+    name = "s3"
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Any],
+        *,
+        policy: RetryPolicy | None = None,
+        limiter: AdaptiveLimiter | None = None,
+    ) -> None:
+        self._client_factory = client_factory
+        self._client: Any = None
+        self.policy = policy or RetryPolicy.from_env()
+        self.limiter = limiter or shared_limiter()
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            self._client = self._client_factory()
+        return self._client
+
+    def call(self, method: str, **kwargs: Any) -> Any:
+        """Invoke ``client.<method>(**kwargs)`` with retries and concurrency control."""
+        operation = getattr(self.client, method)
+        return call_with_retry(lambda: operation(**kwargs), policy=self.policy, limiter=self.limiter)
+
+    def open_read(self, bucket: str, key: str) -> ObjectReader:
+        try:
+            with stage("s3_get"):
+                response = self.call("get_object", Bucket=bucket, Key=key)
+        except Exception as exc:
+            if _is_not_found(exc):
+                raise ObjectNotFound(f"s3://{bucket}/{key}") from exc
+            raise
+        return _s3_reader(response)
+
+    def open_read_if_changed(self, bucket: str, key: str, etag: str) -> ObjectReader | None:
+        try:
+            with stage("s3_get"):
+                response = self.call("get_object", Bucket=bucket, Key=key, IfNoneMatch=etag)
+        except Exception as exc:
+            if _is_not_modified(exc):
+                return None
+            if _is_not_found(exc):
+                raise ObjectNotFound(f"s3://{bucket}/{key}") from exc
+            raise
+        return _s3_reader(response)
+
+    def write_bytes(
+        self, bucket: str, key: str, data: bytes, content_type: str = "application/octet-stream"
+    ) -> str | None:
+        with stage("s3_put"):
+            response = self.call(
+                "put_object", Bucket=bucket, Key=key, Body=data, ContentType=content_type
+            )
+        return (response or {}).get("ETag")
+
+    def write_bytes_if_match(
+        self,
+        bucket: str,
+        key: str,
+        data: bytes,
+        etag: str | None,
+        content_type: str = "application/octet-stream",
+    ) -> str | None:
+        condition = {"IfMatch": etag} if etag is not None else {"IfNoneMatch": "*"}
+        try:
+            with stage("s3_put"):
+                response = self.call(
+                    "put_object",
+                    Bucket=bucket,
+                    Key=key,
+                    Body=data,
+                    ContentType=content_type,
+                    **condition,
+                )
+        except Exception as exc:
+            if _is_precondition_failed(exc):
+                raise PreconditionFailed(f"s3://{bucket}/{key}") from exc
+            raise
+        return (response or {}).get("ETag")
+
+    def head(self, bucket: str, key: str) -> ObjectInfo:
+        try:
+            with stage("s3_head"):
+                response = self.call("head_object", Bucket=bucket, Key=key)
+        except Exception as exc:
+            if _is_not_found(exc):
+                raise ObjectNotFound(f"s3://{bucket}/{key}") from exc
+            raise
+        size = response.get("ContentLength")
+        return ObjectInfo(size=int(size) if size is not None else None, etag=response.get("ETag"))
+
+    def open_write(
+        self, bucket: str, key: str, content_type: str = "application/octet-stream"
+    ) -> ObjectWriter:
+        return _S3MultipartWriter(self, bucket, key, content_type)
+
+
+class _S3MultipartWriter(ObjectWriter):
+    """Buffers one part at a time and uploads it as a multipart part.
+
+    The multipart upload is only created once the first part fills, so small
+    objects still go out as a single ``put_object``.
+    """
+
+    def __init__(
+        self,
+        backend: S3Storage,
+        bucket: str,
+        key: str,
+        content_type: str,
+        part_bytes: int | None = None,
+    ) -> None:
+        super().__init__()
+        self._backend = backend
+        self._bucket = bucket
+        self._key = key
+        self._content_type = content_type
+        self._part_bytes = part_bytes or MULTIPART_PART_BYTES
+        self._buffer = bytearray()
+        self._upload_id: str | None = None
+        self._parts: list[Dict[str, Any]] = []
+
+    def _write(self, data: bytes) -> None:
+        self._buffer += data
+        while len(self._buffer) >= self._part_bytes:
+            part = bytes(self._buffer[: self._part_bytes])
+            del self._buffer[: self._part_bytes]
+            self._upload_part(part)
+
+    def _upload_part(self, part: bytes) -> None:
+        if self._upload_id is None:
+            with stage("s3_put"):
+                response = self._backend.call(
+                    "create_multipart_upload",
+                    Bucket=self._bucket,
+                    Key=self._key,
+                    ContentType=self._content_type,
+                )
+            self._upload_id = response["UploadId"]
+        number = len(self._parts) + 1
+        with stage("s3_put"):
+            response = self._backend.call(
+                "upload_part",
+                Bucket=self._bucket,
+                Key=self._key,
+                UploadId=self._upload_id,
+                PartNumber=number,
+                Body=part,
+            )
+        self._parts.append({"PartNumber": number, "ETag": response["ETag"]})
+
+    def _commit(self) -> str | None:
+        if self._upload_id is None:
+            with stage("s3_put"):
+                response = self._backend.call(
+                    "put_object",
+                    Bucket=self._bucket,
+                    Key=self._key,
+                    Body=bytes(self._buffer),
+                    ContentType=self._content_type,
+                )
+            self._buffer.clear()
+            return (response or {}).get("ETag")
+        try:
+            if self._buffer:
+                self._upload_part(bytes(self._buffer))
+                self._buffer.clear()
+            with stage("s3_put"):
+                response = self._backend.call(
+                    "complete_multipart_upload",
+                    Bucket=self._bucket,
+                    Key=self._key,
+                    UploadId=self._upload_id,
+                    MultipartUpload={"Parts": self._parts},
+                )
+        except BaseException:
+            self._abort()
+            raise
+        return (response or {}).get("ETag")
+
+    def _abort(self) -> None:
+        self._buffer.clear()
+        if self._upload_id is not None:
+            self._backend.call(
+                "abort_multipart_upload",
+                Bucket=self._bucket,
+                Key=self._key,
+                UploadId=self._upload_id,
+            )
+            self._upload_id = None
+
+
+def _s3_reader(response: Dict[str, Any]) -> ObjectReader:
+    size = response.get("ContentLength")
+    return ObjectReader(
+        stream=response["Body"],
+        size=int(size) if size is not None else None,
+        etag=response.get("ETag"),
+    )
+
+
+def _is_not_found(exc: Exception) -> bool:
+    error = getattr(exc, "response", None) or {}
+    code = str((error.get("Error") or {}).get("Code", ""))
+    return code in {"NoSuchKey", "404", "NotFound"}
+
+
+def _is_precondition_failed(exc: Exception) -> bool:
+    # 409 ConditionalRequestConflict: a concurrent conditional write is in progress.
+    error = getattr(exc, "response", None) or {}
+    code = str((error.get("Error") or {}).get("Code", ""))
+    status = (error.get("ResponseMetadata") or {}).get("HTTPStatusCode")
+    conflict_codes = {"PreconditionFailed", "412", "ConditionalRequestConflict", "409"}
+    return code in conflict_codes or status in {409, 412}
+
+
+def _is_not_modified(exc: Exception) -> bool:
+    error = getattr(exc, "response", None) or {}
+    code = str((error.get("Error") or {}).get("Code", ""))
+    status = (error.get("ResponseMetadata") or {}).get("HTTPStatusCode")
+    return code in {"304", "NotModified"} or status == 304
+
+
+class _MmapStream(io.RawIOBase):
+    """Read-only file object over a memory map.
+
+    ``read``/``readline`` slice straight out of the mapping, so the CSV and
+    JSON parsers decode from the page cache without ``read()`` syscalls or an
+    intermediate copy of the whole file.
+    """
+
+    def __init__(self, handle: BinaryIO, mapping: mmap.mmap | None) -> None:
+        self._handle = handle
+        self._map = mapping
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._map.tell() if self._map is not None else 0
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if self._map is None:
+            return 0
+        self._map.seek(offset, whence)
+        return self._map.tell()
+
+    def read(self, size: int = -1) -> bytes:
+        if self._map is None:
+            return b""
+        return self._map.read(None if size is None or size < 0 else size)
+
+    read1 = read
+
+    def readinto(self, buffer: Any) -> int:
+        chunk = self.read(len(buffer))
+        buffer[: len(chunk)] = chunk
+        return len(chunk)
+
+    def readline(self, size: int | None = -1) -> bytes:
+        if self._map is None:
+            return b""
+        line = self._map.readline()
+        if size is not None and 0 <= size < len(line):
+            self._map.seek(size - len(line), io.SEEK_CUR)
+            return line[:size]
+        return line
+
+    def getbuffer(self) -> memoryview:
+        """Zero-copy view of the whole mapping (release it before closing)."""
+        return memoryview(self._map if self._map is not None else b"")
+
+    def close(self) -> None:
+        if not self.closed:
+            if self._map is not None:
+                self._map.close()
+            self._handle.close()
+        super().close()
+
+
+def open_mapped(path: str | os.PathLike[str], etag: str | None = None) -> ObjectReader:
+    """Open a local file as a memory-mapped :class:`ObjectReader`.
+
+    ``etag`` defaults to the file's mtime/size version tag.
+    """
+    handle = open(path, "rb")
+    try:
+        stat = os.fstat(handle.fileno())
+        # mmap refuses empty files; an empty stream behaves the same for parsers.
+        mapping = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else None
+    except BaseException:
+        handle.close()
+        raise
+    return ObjectReader(
+        stream=_MmapStream(handle, mapping),
+        size=stat.st_size,
+        etag=etag if etag is not None else _stat_etag(stat),
+    )
+
+
+def _stat_etag(stat: os.stat_result) -> str:
+    """Version tag for a local file; changes whenever the file is replaced."""
+    # The inode tells apart two same-sized replacements within one mtime tick.
+    return f'"{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+class _LocalWriter(ObjectWriter):
+    """Streams into a temp file beside the target and renames it on commit."""
+
+    def __init__(self, path: Path) -> None:
+        super().__init__()
+        import tempfile
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._path = path
+        fd, self._tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        self._handle = os.fdopen(fd, "wb")
+
+    def _write(self, data: bytes) -> None:
+        with stage("fs_put"):
+            self._handle.write(data)
+
+    def _commit(self) -> str | None:
+        with stage("fs_put"):
+            self._handle.close()
+            os.replace(self._tmp_name, self._path)
+        return _stat_etag(os.stat(self._path))
+
+    def _abort(self) -> None:
+        self._handle.close()
+        os.unlink(self._tmp_name)
+
+
+class LocalStorage(StorageBackend):
+    """Filesystem backend rooted at a directory; buckets are subdirectories."""
+
+    name = "file"
+
+    def __init__(self, root: str | os.PathLike[str]) -> None:
+        self.root = Path(root)
+
+    def path_for(self, bucket: str, key: str) -> Path:
+        return self.root / bucket / key
+
+    def open_read(self, bucket: str, key: str) -> ObjectReader:
+        path = self.path_for(bucket, key)
+        with stage("fs_get"):
+            try:
+                return open_mapped(path)
+            except FileNotFoundError as exc:
+                raise ObjectNotFound(str(path)) from exc
+
+    def head(self, bucket: str, key: str) -> ObjectInfo:
+        path = self.path_for(bucket, key)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError as exc:
+            raise ObjectNotFound(str(path)) from exc
+        return ObjectInfo(size=stat.st_size, etag=_stat_etag(stat))
+
+    def open_write(
+        self, bucket: str, key: str, content_type: str = "application/octet-stream"
+    ) -> ObjectWriter:
+        return _LocalWriter(self.path_for(bucket, key))
+
+    def read_bytes(self, bucket: str, key: str) -> bytes:
+        with self.open_read(bucket, key) as obj:
+            return obj.stream.read()
+
+    def read_text(self, bucket: str, key: str, encoding: str = "utf-8") -> str:
+        with self.open_read(bucket, key) as obj:
+            view = obj.stream.getbuffer()
+            try:
+                return str(view, encoding)
+            finally:
+                view.release()
+
+    def write_bytes(
+        self, bucket: str, key: str, data: bytes, content_type: str = "application/octet-stream"
+    ) -> str | None:
+        with self.open_write(bucket, key, content_type) as writer:
+            writer.write(data)
+        return writer.etag
+
+    def write_bytes_if_match(
+        self,
+        bucket: str,
+        key: str,
+        data: bytes,
+        etag: str | None,
+        content_type: str = "application/octet-stream",
+    ) -> str | None:
+        import fcntl
+
+        path = self.path_for(bucket, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Writers of one key serialize on a sidecar lock file, across processes too.
+        with open(path.parent / f".{path.name}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                current: str | None = _stat_etag(os.stat(path))
+            except FileNotFoundError:
+                current = None
+            if current != etag:
+                raise PreconditionFailed(str(path))
+            return self.write_bytes(bucket, key, data, content_type)
+
+
+_MEMORY_OBJECTS: Dict[Tuple[str, str], bytes] = {}
+_MEMORY_LOCK = threading.Lock()
+
+
+class MemoryStorage(StorageBackend):
+    """In-memory backend; every instance in the process shares the same objects."""
+
+    name = "memory"
+
+    def __init__(self, objects: Dict[Tuple[str, str], bytes] | None = None) -> None:
+        self._objects = _MEMORY_OBJECTS if objects is None else objects
+
+    def open_read(self, bucket: str, key: str) -> ObjectReader:
+        with _MEMORY_LOCK:
+            try:
+                data = self._objects[(bucket, key)]
+            except KeyError as exc:
+                raise ObjectNotFound(f"memory://{bucket}/{key}") from exc
+        return ObjectReader(stream=io.BytesIO(data), size=len(data), etag=_md5_etag(data))
+
+    def head(self, bucket: str, key: str) -> ObjectInfo:
+        with _MEMORY_LOCK:
+            try:
+                data = self._objects[(bucket, key)]
+            except KeyError as exc:
+                raise ObjectNotFound(f"memory://{bucket}/{key}") from exc
+        return ObjectInfo(size=len(data), etag=_md5_etag(data))
+
+    def open_write(
+        self, bucket: str, key: str, content_type: str = "application/octet-stream"
+    ) -> ObjectWriter:
+        return _MemoryWriter(self, bucket, key, content_type)
+
+    def write_bytes(
+        self, bucket: str, key: str, data: bytes, content_type: str = "application/octet-stream"
+    ) -> str | None:
+        payload = bytes(data)
+        with _MEMORY_LOCK:
+            self._objects[(bucket, key)] = payload
+        return _md5_etag(payload)
+
+    def write_bytes_if_match(
+        self,
+        bucket: str,
+        key: str,
+        data: bytes,
+        etag: str | None,
+        content_type: str = "application/octet-stream",
+    ) -> str | None:
+        payload = bytes(data)
+        with _MEMORY_LOCK:
+            current = self._objects.get((bucket, key))
+            if (None if current is None else _md5_etag(current)) != etag:
+                raise PreconditionFailed(f"memory://{bucket}/{key}")
+            self._objects[(bucket, key)] = payload
+        return _md5_etag(payload)
+
+    def clear(self) -> None:
+        with _MEMORY_LOCK:
+            self._objects.clear()
+
+
+class _MemoryWriter(ObjectWriter):
+    def __init__(self, backend: MemoryStorage, bucket: str, key: str, content_type: str) -> None:
+        super().__init__()
+        self._target = (backend, bucket, key, content_type)
+        self._buffer = io.BytesIO()
+
+    def _write(self, data: bytes) -> None:
+        self._buffer.write(data)
+
+    def _commit(self) -> str | None:
+        backend, bucket, key, content_type = self._target
+        return backend.write_bytes(bucket, key, self._buffer.getvalue(), content_type)
+
+    def _abort(self) -> None:
+        self._buffer = io.BytesIO()
+
+
+def s3_client(endpoint_url: str | None = None) -> Any:
+    """boto3 S3 client for ``endpoint_url`` (LocalStack) with credentials from the environment.
+
+    Handlers pass it to :func:`storage_from_env` behind a lambda. boto3 is
+    imported here, on first use, because importing it dominates cold start
+    and the filesystem and memory backends never need it.
+    """
+    import boto3
+
+    session = boto3.session.Session()
+    return session.client(
+        "s3",
+        endpoint_url=endpoint_url,
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID", "test"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY", "test"),
+        region_name=os.getenv("AWS_REGION", "us-east-1"),
+        config=client_config(),
+    )
+
+
+def storage_from_env(client_factory: Callable[[], Any]) -> StorageBackend:
+    """Build the backend selected by ``PIPELINE_STORAGE_URL``.
+
+    ``client_factory`` is only called (lazily) when the S3 backend is used, so
+    local backends never import or configure boto3.
+    """
+    url = os.getenv(STORAGE_URL_ENV, "").strip()
+    if not url or url == "s3" or url.startswith("s3://"):
+        return S3Storage(client_factory)
+    from urllib.parse import urlparse
+
+    parsed = urlparse(url)
+    if parsed.scheme == "file":
+        return LocalStorage(parsed.netloc + parsed.path if parsed.netloc else parsed.path)
+    if parsed.scheme == "memory":
+        return MemoryStorage()
+    raise ValueError(f"Unsupported {STORAGE_URL_ENV}: {url!r}")
+
+
+def count_read(obj: ObjectReader) -> None:
+    """Record the bytes of an object read as ``bytes_in`` when the size is known."""
+    if obj.size is not None:
+        count("bytes_in", obj.size, "Bytes")
@@ -0,0 +1,103 @@
+import hashlib
+import importlib.util
+import io
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.append(str(SRC_DIR))
+
+
+def _load_cache():
+    spec = importlib.util.spec_from_file_location("common_cache", SRC_DIR / "cache.py")
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+cache = _load_cache()
+instrumentation = sys.modules["instrumentation"]
+storage = sys.modules["storage"]
+
+
+class ConditionalClient:
+    """Minimal S3 client that honours ``IfNoneMatch`` like S3 does."""
+
+    def __init__(self):
+        self.objects = {}
+        self.calls = []
+
+    def get_object(self, *, Bucket, Key, IfNoneMatch=None):
+        data = self.objects[(Bucket, Key)]
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        self.calls.append((Key, IfNoneMatch is not None))
+        if IfNoneMatch == etag:
+            error = Exception("not modified")
+            error.response = {"Error": {"Code": "304"}, "ResponseMetadata": {"HTTPStatusCode": 304}}
+            raise error
+        return {"Body": io.BytesIO(data), "ContentLength": len(data), "ETag": etag}
+
+
+def _read(backend, disk_cache, key):
+    with cache.open_cached(backend, "bucket", key, disk_cache) as obj:
+        return obj.stream.read(), obj.stream
+
+
+def test_open_cached_validates_with_conditional_get_and_serves_mmap(monkeypatch, tmp_path):
+    monkeypatch.setenv("PIPELINE_METRICS", "0")
+    client = ConditionalClient()
+    client.objects[("bucket", "data.csv")] = b"a,b\n1,2\n"
+    backend = storage.S3Storage(lambda: client)
+    disk_cache = cache.DiskCache(tmp_path, max_bytes=1024)
+
+    @instrumentation.instrumented("unit_service")
+    def handler(_event, _context):
+        first, _ = _read(backend, disk_cache, "data.csv")
+        second, stream = _read(backend, disk_cache, "data.csv")
+        return first, second, stream, cache.cache_counters()
+
+    first, second, stream, counters = handler(None, None)
+    assert first == second == b"a,b\n1,2\n"
+    assert isinstance(stream, storage._MmapStream)
+    assert counters == {"hits": 1, "misses": 1, "bytes_saved": 8}
+    assert client.calls == [("data.csv", False), ("data.csv", True)]
+
+    client.objects[("bucket", "data.csv")] = b"a,b\n3,4\n"
+    assert _read(backend, disk_cache, "data.csv")[0] == b"a,b\n3,4\n"
+    assert not list((tmp_path / "tmp").iterdir())
+
+
+def test_disk_cache_is_content_addressed_and_evicts_lru(tmp_path):
+    client = ConditionalClient()
+    backend = storage.S3Storage(lambda: client)
+    disk_cache = cache.DiskCache(tmp_path, max_bytes=250)
+    for key, fill in (("a", b"a"), ("b", b"b"), ("a-copy", b"a")):
+        client.objects[("bucket", key)] = fill * 100
+        _read(backend, disk_cache, key)
+    assert len(list(disk_cache.objects_dir.iterdir())) == 2
+
+    # Refresh "a", then a third distinct object pushes out "b" (least recently used).
+    _read(backend, disk_cache, "a")
+    client.objects[("bucket", "c")] = b"c" * 100
+    _read(backend, disk_cache, "c")
+    assert disk_cache.lookup("bucket", "a") is not None
+    assert disk_cache.lookup("bucket", "c") is not None
+    assert disk_cache.lookup("bucket", "b") is None
+
+    client.objects[("bucket", "huge")] = b"x" * 1000
+    assert _read(backend, disk_cache, "huge")[0] == b"x" * 1000
+    assert disk_cache.lookup("bucket", "huge") is None
+
+
+def test_open_cached_bypasses_local_backends_and_disabled_cache(monkeypatch, tmp_path):
+    local = storage.MemoryStorage({})
+    local.write_bytes("bucket", "k", b"payload")
+    disk_cache = cache.DiskCache(tmp_path / "cache", max_bytes=1024)
+    assert _read(local, disk_cache, "k")[0] == b"payload"
+    assert not list(disk_cache.objects_dir.iterdir())
+
+    monkeypatch.setenv("PIPELINE_CACHE", "0")
+    assert cache.default_cache() is None
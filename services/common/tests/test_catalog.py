@@ -0,0 +1,148 @@
+import importlib.util
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.append(str(SRC_DIR))
+
+
+def _load_catalog():
+    spec = importlib.util.spec_from_file_location("common_catalog", SRC_DIR / "catalog.py")
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+catalog = _load_catalog()
+from retry import RetryPolicy  # noqa: E402
+from storage import LocalStorage, MemoryStorage, PreconditionFailed  # noqa: E402
+
+
+def _entry(key, symbols, start, end):
+    rows = [
+        {"symbol": symbol, "timestamp": timestamp, "sequence": idx}
+        for idx, (symbol, timestamp) in enumerate(zip(symbols, (start, end)))
+    ]
+    return catalog.entry_for_rows(
+        key=key, dataset="ingest", fmt="csv", rows=rows, byte_size=10, etag='"abc"'
+    )
+
+
+def test_entry_for_rows_computes_statistics():
+    entry = _entry("a.csv", ["BTC", "BTC"], "2023-01-01T00:00:00+00:00", "2023-01-01T01:00:00+00:00")
+    assert entry.symbol == "BTC"
+    assert (entry.min_sequence, entry.max_sequence) == (0, 1)
+    assert entry.min_timestamp == "2023-01-01T00:00:00+00:00"
+    assert entry.row_count == 2
+
+    mixed = _entry("m.csv", ["BTC", "ETH"], "2023-01-01T00:00:00Z", "2023-01-01T01:00:00Z")
+    assert mixed.symbol is None
+
+
+def test_resolve_prunes_by_symbol_and_time_and_round_trips():
+    storage = MemoryStorage({})
+    entries = [
+        _entry("btc-jan1.csv", ["BTC"] * 2, "2023-01-01T00:00:00Z", "2023-01-01T23:00:00Z"),
+        _entry("btc-jan2.csv", ["BTC"] * 2, "2023-01-02T00:00:00Z", "2023-01-02T23:00:00Z"),
+        _entry("eth-jan2.csv", ["ETH"] * 2, "2023-01-02T00:00:00Z", "2023-01-02T23:00:00Z"),
+        _entry("mixed.csv", ["BTC", "ETH"], "2023-01-03T00:00:00Z", "2023-01-03T01:00:00Z"),
+    ]
+    catalog.record_objects(storage, "bucket", "catalog/manifest.json", entries)
+    loaded = catalog.Catalog.load(storage, "bucket", "catalog/manifest.json")
+
+    predicates = catalog.Predicates.from_event(
+        {"symbols": "ETH", "start_time": "2023-01-02T12:00:00+00:00"}
+    )
+    assert [entry.key for entry in loaded.resolve(predicates)] == ["mixed.csv", "eth-jan2.csv"]
+
+    window = catalog.Predicates(end_time="2023-01-01T12:00:00Z")
+    assert [entry.key for entry in loaded.resolve(window)] == ["btc-jan1.csv"]
+    assert loaded.resolve(window, dataset="features") == []
+    assert not catalog.Predicates.from_event({}).active
+
+
+@pytest.mark.parametrize(
+    "event, field",
+    [
+        ({"start_time": "yesterday"}, "start_time"),
+        ({"end_time": "2023-13-01T00:00:00Z"}, "end_time"),
+        ({"start_time": 1672531200}, "start_time"),
+        ({"start_time": "2023-01-02T00:00:00Z", "end_time": "2023-01-01T00:00:00Z"}, "end_time"),
+    ],
+)
+def test_from_event_rejects_malformed_time_window(event, field):
+    with pytest.raises(catalog.InvalidPredicates, match=field):
+        catalog.Predicates.from_event(event)
+
+
+def test_load_missing_manifest_is_empty():
+    loaded = catalog.Catalog.load(MemoryStorage({}), "bucket", "catalog/manifest.json")
+    assert loaded.entries == {}
+
+
+def test_save_refuses_to_overwrite_a_manifest_changed_since_load():
+    storage = MemoryStorage({})
+    first = catalog.Catalog.load(storage, "bucket", "catalog/manifest.json")
+    second = catalog.Catalog.load(storage, "bucket", "catalog/manifest.json")
+    first.upsert(_entry("a.csv", ["BTC"] * 2, "2023-01-01T00:00:00Z", "2023-01-01T01:00:00Z"))
+    second.upsert(_entry("b.csv", ["BTC"] * 2, "2023-01-02T00:00:00Z", "2023-01-02T01:00:00Z"))
+    first.save(storage)
+
+    with pytest.raises(PreconditionFailed):
+        second.save(storage)
+
+
+def test_record_objects_retries_conflicts_on_the_fresh_manifest():
+    storage = MemoryStorage({})
+    key = "catalog/manifest.json"
+    racing = _entry("racing.csv", ["ETH"] * 2, "2023-01-01T00:00:00Z", "2023-01-01T01:00:00Z")
+    sleeps = []
+
+    def sleep(delay):
+        sleeps.append(delay)
+
+    original_load = catalog.Catalog.load
+
+    def load_then_race(cls, storage_, bucket, key_):
+        loaded = original_load(storage_, bucket, key_)
+        if not sleeps:
+            # Another writer saves between this writer's GET and its PUT.
+            other = original_load(storage_, bucket, key_)
+            other.upsert(racing)
+            other.save(storage_)
+        return loaded
+
+    entry = _entry("mine.csv", ["BTC"] * 2, "2023-01-01T00:00:00Z", "2023-01-01T01:00:00Z")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(catalog.Catalog, "load", classmethod(load_then_race))
+        catalog.record_objects(storage, "bucket", key, [entry], sleep=sleep)
+
+    assert len(sleeps) == 1
+    assert set(catalog.Catalog.load(storage, "bucket", key).entries) == {"racing.csv", "mine.csv"}
+
+
+@pytest.mark.parametrize("backend", ["memory", "file"])
+def test_concurrent_writers_never_drop_entries(backend, tmp_path):
+    storage = MemoryStorage({}) if backend == "memory" else LocalStorage(tmp_path)
+    policy = RetryPolicy(max_attempts=50, base_delay=0.001, max_delay=0.01)
+    barrier = threading.Barrier(8)
+
+    def writer(idx):
+        barrier.wait()
+        entry = _entry(f"part-{idx}.csv", ["BTC"] * 2, "2023-01-01T00:00Z", "2023-01-01T01:00Z")
+        catalog.record_objects(storage, "bucket", "catalog/manifest.json", [entry], policy=policy)
+
+    threads = [threading.Thread(target=writer, args=(idx,)) for idx in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    loaded = catalog.Catalog.load(storage, "bucket", "catalog/manifest.json")
+    assert set(loaded.entries) == {f"part-{idx}.csv" for idx in range(8)}
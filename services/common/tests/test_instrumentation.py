@@ -0,0 +1,124 @@
+import importlib.util
+import json
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+
+
+def _load_instrumentation():
+    spec = importlib.util.spec_from_file_location(
+        "common_instrumentation", SRC_DIR / "instrumentation.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+instrumentation = _load_instrumentation()
+
+
+def test_instrumented_handler_flushes_single_emf_line(capsys, monkeypatch):
+    monkeypatch.delenv("PIPELINE_METRICS", raising=False)
+
+    @instrumentation.instrumented("unit_service")
+    def handler(event, _context):
+        with instrumentation.stage("parse"):
+            pass
+        with instrumentation.stage("parse"):
+            pass
+        instrumentation.count("rows_in", 3)
+        instrumentation.count("rows_in", 2)
+        instrumentation.count("bytes_in", 128, "Bytes")
+        return {"statusCode": 200}
+
+    assert handler({}, None) == {"statusCode": 200}
+    lines = capsys.readouterr().out.strip().splitlines()
+    assert len(lines) == 1
+    document = json.loads(lines[0])
+    assert document["Service"] == "unit_service"
+    assert document["rows_in"] == 5
+    assert document["bytes_in"] == 128
+    assert document["parse_ms"] >= 0
+    directive = document["_aws"]["CloudWatchMetrics"][0]
+    assert directive["Dimensions"] == [["Service"]]
+    names = {metric["Name"]: metric["Unit"] for metric in directive["Metrics"]}
+    assert names["parse_ms"] == "Milliseconds"
+    assert names["bytes_in"] == "Bytes"
+    assert "total_ms" in names
+    assert instrumentation.current() is None
+
+
+def test_stage_and_count_are_noops_outside_invocation():
+    with instrumentation.stage("orphan"):
+        instrumentation.count("rows_in", 1)
+    assert instrumentation.current() is None
+
+
+def test_metrics_can_be_disabled(capsys, monkeypatch):
+    monkeypatch.setenv("PIPELINE_METRICS", "0")
+
+    @instrumentation.instrumented("quiet_service")
+    def handler(event, _context):
+        instrumentation.count("rows_in", 1)
+        return None
+
+    handler(None, None)
+    assert capsys.readouterr().out == ""
+
+
+def test_cprofile_dump_written_to_profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("PIPELINE_METRICS", "0")
+    monkeypatch.setenv("PIPELINE_PROFILE", "cprofile")
+    monkeypatch.setenv("PIPELINE_PROFILE_DIR", str(tmp_path))
+
+    @instrumentation.instrumented("profiled_service")
+    def handler(event, _context):
+        return sum(range(1000))
+
+    assert handler({}, None) == sum(range(1000))
+    dumps = list(tmp_path.glob("profiled_service-*.prof"))
+    assert len(dumps) == 1
+
+
+def test_profile_upload_failure_keeps_handler_result(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(SRC_DIR))
+    import storage
+
+    class BrokenClient:
+        def put_object(self, **_kwargs):
+            error = Exception("denied")
+            error.response = {"Error": {"Code": "AccessDenied"}}
+            raise error
+
+    monkeypatch.setenv("PIPELINE_METRICS", "0")
+    monkeypatch.setenv("PIPELINE_PROFILE", "cprofile")
+    monkeypatch.setenv("PIPELINE_PROFILE_DIR", str(tmp_path))
+    monkeypatch.setenv("PIPELINE_PROFILE_S3_URI", "s3://profiles/runs")
+    monkeypatch.delenv("PIPELINE_STORAGE_URL", raising=False)
+    monkeypatch.setattr(storage, "s3_client", lambda endpoint_url=None: BrokenClient())
+
+    @instrumentation.instrumented("profiled_service")
+    def handler(event, _context):
+        return "ok"
+
+    assert handler({}, None) == "ok"
+
+
+def test_profile_upload_goes_through_configured_storage(tmp_path, monkeypatch):
+    monkeypatch.setenv("PIPELINE_METRICS", "0")
+    monkeypatch.setenv("PIPELINE_PROFILE", "tracemalloc")
+    monkeypatch.setenv("PIPELINE_PROFILE_DIR", str(tmp_path / "dumps"))
+    monkeypatch.setenv("PIPELINE_PROFILE_S3_URI", "s3://profiles/runs")
+    monkeypatch.setenv("PIPELINE_STORAGE_URL", f"file://{tmp_path / 'store'}")
+    monkeypatch.syspath_prepend(str(SRC_DIR))
+
+    @instrumentation.instrumented("profiled_service")
+    def handler(event, _context):
+        return "ok"
+
+    assert handler({}, None) == "ok"
+    uploaded = list((tmp_path / "store" / "profiles" / "runs").glob("*.tracemalloc"))
+    assert len(uploaded) == 1
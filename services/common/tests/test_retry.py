@@ -0,0 +1,114 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.append(str(SRC_DIR))
+
+
+def _load_retry():
+    spec = importlib.util.spec_from_file_location("common_retry", SRC_DIR / "retry.py")
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+retry = _load_retry()
+instrumentation = sys.modules["instrumentation"]
+
+
+def _client_error(code, status=None):
+    error = Exception(code)
+    error.response = {"Error": {"Code": code}, "ResponseMetadata": {"HTTPStatusCode": status}}
+    return error
+
+
+def test_call_with_retry_backs_off_on_throttling_and_counts(monkeypatch):
+    monkeypatch.setenv("PIPELINE_METRICS", "0")
+    outcomes = [_client_error("SlowDown", 503), _client_error("InternalError", 500), "ok"]
+    sleeps = []
+    limiter = retry.AdaptiveLimiter(initial=8, maximum=8)
+
+    def flaky():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    @instrumentation.instrumented("unit_service")
+    def handler(_event, _context):
+        result = retry.call_with_retry(
+            flaky,
+            policy=retry.RetryPolicy(max_attempts=5, base_delay=0.1, max_delay=1.0),
+            limiter=limiter,
+            sleep=sleeps.append,
+        )
+        return result, retry.io_counters()
+
+    result, counters = handler(None, None)
+    assert result == "ok"
+    assert counters == {"requests": 3, "retries": 2, "throttles": 1}
+    assert 0.0 <= sleeps[0] <= 0.1 and 0.0 <= sleeps[1] <= 0.2
+    assert limiter.limit == pytest.approx(4.0 + 1.0 / 4.0)
+
+
+def test_call_with_retry_raises_permanent_errors_and_exhausted_retries():
+    calls = []
+
+    def denied():
+        calls.append(1)
+        raise _client_error("AccessDenied", 403)
+
+    with pytest.raises(Exception, match="AccessDenied"):
+        retry.call_with_retry(denied, sleep=lambda _: None)
+    assert len(calls) == 1
+
+    def throttled():
+        calls.append(1)
+        raise _client_error("SlowDown", 503)
+
+    calls.clear()
+    with pytest.raises(Exception, match="SlowDown"):
+        retry.call_with_retry(
+            throttled, policy=retry.RetryPolicy(max_attempts=3), sleep=lambda _: None
+        )
+    assert len(calls) == 3
+
+
+def test_adaptive_limiter_is_aimd_and_cuts_once_per_burst():
+    limiter = retry.AdaptiveLimiter(initial=16, minimum=1, maximum=32)
+    burst = [limiter.acquire() for _ in range(16)]
+    for started in burst:
+        limiter.release()
+        limiter.on_throttle(started)
+    assert limiter.limit == 8
+
+    for _ in range(8):
+        limiter.on_success()
+    assert limiter.limit == pytest.approx(9.0, abs=0.1)
+
+    for _ in range(10):
+        limiter.on_throttle()
+    assert limiter.limit == 1
+
+
+def test_parallel_map_keeps_order_and_invocation_context(monkeypatch):
+    monkeypatch.setenv("PIPELINE_METRICS", "0")
+
+    @instrumentation.instrumented("unit_service")
+    def handler(_event, _context):
+        def work(item):
+            instrumentation.count("s3_requests", 1)
+            return item * 2
+
+        results = list(retry.parallel_map(work, range(20), 4))
+        return results, retry.io_counters()
+
+    results, counters = handler(None, None)
+    assert results == [item * 2 for item in range(20)]
+    assert counters["requests"] == 20
@@ -0,0 +1,200 @@
+import csv
+import importlib.util
+import io
+import sys
+from pathlib import Path
+
+import pytest
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.append(str(SRC_DIR))
+
+
+def _load_storage():
+    spec = importlib.util.spec_from_file_location("common_storage", SRC_DIR / "storage.py")
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+storage = _load_storage()
+
+SAMPLE_CSV = b"a,b\n1,2\n3,4\n"
+
+
+def test_storage_from_env_selects_backend(monkeypatch, tmp_path):
+    monkeypatch.delenv(storage.STORAGE_URL_ENV, raising=False)
+    factory_calls = []
+    backend = storage.storage_from_env(lambda: factory_calls.append(1))
+    assert isinstance(backend, storage.S3Storage)
+    assert factory_calls == []
+
+    monkeypatch.setenv(storage.STORAGE_URL_ENV, f"file://{tmp_path}")
+    backend = storage.storage_from_env(lambda: None)
+    assert isinstance(backend, storage.LocalStorage)
+    assert backend.root == tmp_path
+
+    monkeypatch.setenv(storage.STORAGE_URL_ENV, "memory://")
+    assert isinstance(storage.storage_from_env(lambda: None), storage.MemoryStorage)
+
+    monkeypatch.setenv(storage.STORAGE_URL_ENV, "ftp://nope")
+    with pytest.raises(ValueError):
+        storage.storage_from_env(lambda: None)
+
+
+def test_local_storage_round_trip_uses_mmap(tmp_path):
+    backend = storage.LocalStorage(tmp_path)
+    etag = backend.write_bytes("bucket", "data/sample.csv", SAMPLE_CSV, "text/csv")
+    assert etag and etag.startswith('"')
+    assert (tmp_path / "bucket" / "data" / "sample.csv").read_bytes() == SAMPLE_CSV
+    assert not list((tmp_path / "bucket" / "data").glob(".sample.csv.*"))
+
+    with backend.open_read("bucket", "data/sample.csv") as obj:
+        assert obj.size == len(SAMPLE_CSV)
+        rows = list(csv.reader(io.TextIOWrapper(obj.stream, encoding="utf-8", newline="")))
+    assert rows == [["a", "b"], ["1", "2"], ["3", "4"]]
+    assert backend.read_text("bucket", "data/sample.csv") == SAMPLE_CSV.decode()
+    assert backend.read_bytes("bucket", "data/sample.csv") == SAMPLE_CSV
+
+
+def test_local_storage_handles_empty_objects(tmp_path):
+    backend = storage.LocalStorage(tmp_path)
+    backend.write_bytes("bucket", "empty.csv", b"")
+    assert backend.read_bytes("bucket", "empty.csv") == b""
+    assert backend.read_text("bucket", "empty.csv") == ""
+
+
+def test_missing_objects_raise_object_not_found(tmp_path):
+    class MissingClient:
+        def get_object(self, *, Bucket, Key):
+            error = Exception("missing")
+            error.response = {"Error": {"Code": "NoSuchKey"}}
+            raise error
+
+    backends = [
+        storage.LocalStorage(tmp_path),
+        storage.MemoryStorage({}),
+        storage.S3Storage(lambda: MissingClient()),
+    ]
+    for backend in backends:
+        with pytest.raises(storage.ObjectNotFound):
+            backend.open_read("bucket", "missing.csv")
+
+
+def test_memory_storage_instances_share_objects():
+    first = storage.MemoryStorage()
+    second = storage.MemoryStorage()
+    try:
+        first.write_bytes("bucket", "key", b"payload")
+        assert second.read_bytes("bucket", "key") == b"payload"
+    finally:
+        first.clear()
+
+
+def test_incomplete_backends_fail_at_construction():
+    class ReadOnly(storage.StorageBackend):
+        def open_read(self, bucket, key):
+            raise storage.ObjectNotFound(key)
+
+        def head(self, bucket, key):
+            raise storage.ObjectNotFound(key)
+
+    class NoAbort(storage.ObjectWriter):
+        def _write(self, data):
+            pass
+
+        def _commit(self):
+            return None
+
+    with pytest.raises(TypeError, match="open_write"):
+        ReadOnly()
+    with pytest.raises(TypeError, match="_abort"):
+        NoAbort()
+
+
+def test_open_write_commits_atomically_and_aborts_on_error(tmp_path):
+    for backend in (storage.LocalStorage(tmp_path), storage.MemoryStorage({})):
+        with backend.open_write("bucket", "out.csv", "text/csv") as writer:
+            writer.write(b"a,b\n")
+            writer.write(b"1,2\n")
+        assert writer.size == 8
+        assert backend.head("bucket", "out.csv").etag == writer.etag
+        assert backend.read_bytes("bucket", "out.csv") == b"a,b\n1,2\n"
+
+        with pytest.raises(RuntimeError):
+            with backend.open_write("bucket", "out.csv") as writer:
+                writer.write(b"partial")
+                raise RuntimeError("boom")
+        assert backend.read_bytes("bucket", "out.csv") == b"a,b\n1,2\n"
+        with pytest.raises(storage.ObjectNotFound):
+            backend.head("bucket", "missing.csv")
+    assert not list((tmp_path / "bucket").glob(".out.csv.*"))
+
+
+def test_s3_open_write_switches_to_multipart_once_a_part_fills(monkeypatch):
+    calls = []
+    stored = {}
+
+    class MultipartClient:
+        def put_object(self, *, Bucket, Key, Body, ContentType):
+            calls.append("put_object")
+            stored[Key] = Body
+            return {"ETag": '"single"'}
+
+        def create_multipart_upload(self, *, Bucket, Key, ContentType):
+            calls.append("create")
+            return {"UploadId": "upload-1"}
+
+        def upload_part(self, *, Bucket, Key, UploadId, PartNumber, Body):
+            calls.append(("part", PartNumber, Body))
+            return {"ETag": f'"p{PartNumber}"'}
+
+        def complete_multipart_upload(self, *, Bucket, Key, UploadId, MultipartUpload):
+            calls.append(("complete", [part["PartNumber"] for part in MultipartUpload["Parts"]]))
+            return {"ETag": '"multi-3"'}
+
+    monkeypatch.setattr(storage, "MULTIPART_PART_BYTES", 4)
+    backend = storage.S3Storage(lambda: MultipartClient())
+
+    with backend.open_write("bucket", "small.csv") as writer:
+        writer.write(b"abc")
+    assert writer.etag == '"single"' and stored["small.csv"] == b"abc"
+
+    calls.clear()
+    with backend.open_write("bucket", "large.csv") as writer:
+        writer.write(b"0123456")
+        writer.write(b"789")
+    assert calls == [
+        "create",
+        ("part", 1, b"0123"),
+        ("part", 2, b"4567"),
+        ("part", 3, b"89"),
+        ("complete", [1, 2, 3]),
+    ]
+    assert writer.etag == '"multi-3"'
+
+
+def test_s3_conditional_write_maps_conflicts_to_precondition_failed():
+    sent = []
+
+    class ConditionalClient:
+        def put_object(self, *, Bucket, Key, Body, ContentType, **condition):
+            sent.append(condition)
+            if condition.get("IfMatch") == '"stale"':
+                error = Exception("precondition failed")
+                error.response = {
+                    "Error": {"Code": "PreconditionFailed"},
+                    "ResponseMetadata": {"HTTPStatusCode": 412},
+                }
+                raise error
+            return {"ETag": '"v2"'}
+
+    backend = storage.S3Storage(lambda: ConditionalClient())
+    assert backend.write_bytes_if_match("bucket", "m.json", b"{}", None) == '"v2"'
+    assert backend.write_bytes_if_match("bucket", "m.json", b"{}", '"v1"') == '"v2"'
+    with pytest.raises(storage.PreconditionFailed):
+        backend.write_bytes_if_match("bucket", "m.json", b"{}", '"stale"')
+    assert sent == [{"IfNoneMatch": "*"}, {"IfMatch": '"v1"'}, {"IfMatch": '"stale"'}]
@@ -2,31 +2,40 @@
 
 The function fabricates a short CSV batch and ships it to S3 so LocalStack
 demonstrations have a repeatable upstream dependency.
+
+Passing a ``seed`` switches to deterministic sharded generation. Each shard
+draws from its own independent ``random.Random`` stream derived from
+``(seed, shard)``. The price random walk runs in exact integer micro-units,
+so it can be stitched together across shards. Given a seed, row count and
+shard count, the output is bit-identical however many worker processes
+produce it.
 """
 
 from __future__ import annotations
 
 import csv
+import hashlib
 import io
 import json
+import logging
 import os
 import random
 import uuid
-from datetime import datetime, timezone
-from typing import Any, Dict, List, Mapping, Sequence
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Deque, Dict, Iterator, List, Mapping, Sequence, Tuple
 
-import boto3
+from catalog import CatalogEntry, catalog_key, entry_for_rows, try_record_objects
+from instrumentation import count, instrumented, stage
+from retry import io_counters, parallel_map
+from storage import StorageBackend, s3_client, storage_from_env
 
+logger = logging.getLogger(__name__)
 
-def _s3_client(endpoint_url: str | None):
-    session = boto3.session.Session()
-    return session.client(
-        "s3",
-        endpoint_url=endpoint_url,
-        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID", "test"),
-        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY", "test"),
-        region_name=os.getenv("AWS_REGION", "us-east-1"),
-    )
+
+def _storage(endpoint_url: str | None) -> StorageBackend:
+    return storage_from_env(lambda: s3_client(endpoint_url))
 
 
 def _generate_rows(*, batch_size: int, symbol: str) -> List[Dict[str, Any]]:
@@ -51,16 +60,282 @@ def _generate_rows(*, batch_size: int, symbol: str) -> List[Dict[str, Any]]:
     return rows
 
 
+# --- seeded, sharded generation ---------------------------------------------
+
+CSV_COLUMNS = ["timestamp", "symbol", "sequence", "price", "volume", "label"]
+PRICE_SCALE = 1_000_000  # prices are walked in integer micro-units
+START_PRICE_UNITS = 20_000 * PRICE_SCALE
+FLOOR_PRICE_UNITS = 50 * PRICE_SCALE
+MAX_DRIFT_UNITS = 35 * PRICE_SCALE
+SEEDED_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _shard_rng(seed: int, shard: int) -> random.Random:
+    """Independent stream per shard: the seed material is a hash of (seed, shard)."""
+    digest = hashlib.sha256(f"data_ingest:{seed}:{shard}".encode("ascii")).digest()
+    return random.Random(int.from_bytes(digest, "big"))
+
+
+def _draw(rng: random.Random) -> Tuple[int, float]:
+    """One row's random draws; shared by both passes so they consume RNG identically."""
+    drift = rng.randrange(-MAX_DRIFT_UNITS, MAX_DRIFT_UNITS + 1)
+    volume = rng.uniform(5.0, 15.0)
+    return drift, volume
+
+
+def _shard_bounds(total_rows: int, shards: int) -> List[Tuple[int, int]]:
+    """Split ``[0, total_rows)`` into ``shards`` contiguous, near-equal ranges."""
+    base, extra = divmod(total_rows, shards)
+    bounds: List[Tuple[int, int]] = []
+    start = 0
+    for shard in range(shards):
+        stop = start + base + (1 if shard < extra else 0)
+        bounds.append((start, stop))
+        start = stop
+    return bounds
+
+
+def _walk_summary(task: Tuple[int, int, int, int]) -> Tuple[int, int | None]:
+    """Summarize a shard's floored walk as ``end = max(start + offset, floor)``.
+
+    With partial drift sums ``S_k``, ``p_n = max(p_0 + S_n, max_k(FLOOR + S_n - S_k))``.
+    Two such summaries compose, so shard start prices can be derived without
+    walking earlier shards row by row. Everything is integer, so the stitched
+    walk is exact.
+    """
+    seed, shard, start, stop = task
+    rng = _shard_rng(seed, shard)
+    total = 0
+    lowest: int | None = None
+    for _ in range(start, stop):
+        drift, _volume = _draw(rng)
+        total += drift
+        lowest = total if lowest is None or total < lowest else lowest
+    floor = None if lowest is None else FLOOR_PRICE_UNITS + total - lowest
+    return total, floor
+
+
+def _walk(seed: int, shard: int, start: int, stop: int, price: int) -> Iterator[Tuple[int, int, int, float]]:
+    """Yield ``(sequence, price_units, drift_units, volume)`` for one shard."""
+    rng = _shard_rng(seed, shard)
+    for sequence in range(start, stop):
+        drift, volume = _draw(rng)
+        price = max(FLOOR_PRICE_UNITS, price + drift)
+        yield sequence, price, drift, volume
+
+
+def _seeded_timestamp(sequence: int, interval_seconds: int) -> str:
+    return (SEEDED_EPOCH + timedelta(seconds=sequence * interval_seconds)).isoformat()
+
+
+@dataclass
+class ShardResult:
+    """One rendered shard: its CSV payload plus what the catalog needs to know."""
+
+    shard: int
+    start: int
+    stop: int
+    blob: bytes
+    digest: str
+    sample: List[Dict[str, Any]]
+
+
+def _render_shard(task: Tuple[int, int, int, int, int, str, int]) -> ShardResult:
+    seed, shard, start, stop, start_price, symbol, interval_seconds = task
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\r\n")
+    writer.writerow(CSV_COLUMNS)
+    sample: List[Dict[str, Any]] = []
+    for sequence, price, drift, volume in _walk(seed, shard, start, stop, start_price):
+        row = [
+            _seeded_timestamp(sequence, interval_seconds),
+            symbol,
+            sequence,
+            round(price / PRICE_SCALE, 2),
+            round(volume, 4),
+            "up" if drift >= 0 else "down",
+        ]
+        writer.writerow(row)
+        if len(sample) < 3:
+            sample.append(dict(zip(CSV_COLUMNS, row)))
+    blob = buffer.getvalue().encode("utf-8")
+    return ShardResult(
+        shard=shard,
+        start=start,
+        stop=stop,
+        blob=blob,
+        digest=hashlib.sha256(blob).hexdigest(),
+        sample=sample,
+    )
+
+
+def _ordered_map(func, tasks: Sequence[Any], workers: int) -> Iterator[Any]:
+    """Map ``func`` over ``tasks`` in order, in-process or on a bounded process pool.
+
+    ``workers`` comes from the event, so it is clamped to the task and CPU
+    counts. Where no process pool can be created (Lambda has no
+    ``/dev/shm`` for its semaphores) the tasks run in-process instead; the
+    output is the same either way.
+    """
+    workers = min(workers, len(tasks), os.cpu_count() or 1)
+    if workers <= 1:
+        yield from map(func, tasks)
+        return
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    try:
+        # Fork, so workers inherit this module even when it was not imported by name.
+        pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("fork")
+        )
+    except (OSError, NotImplementedError, ValueError):
+        logger.warning("No process pool available; generating shards in-process", exc_info=True)
+        yield from map(func, tasks)
+        return
+    with pool:
+        pending: Deque[Any] = deque()
+        remaining = iter(tasks)
+        # Keep at most 2x workers shards in flight so large datasets stream
+        # through the parent instead of piling up finished shards in memory.
+        for task in remaining:
+            pending.append(pool.submit(func, task))
+            if len(pending) >= workers * 2:
+                break
+        while pending:
+            yield pending.popleft().result()
+            for task in remaining:
+                pending.append(pool.submit(func, task))
+                break
+
+
+def _shard_start_prices(
+    seed: int, bounds: Sequence[Tuple[int, int]], workers: int
+) -> List[int]:
+    """First pass: summarize every shard (in parallel), then stitch start prices."""
+    tasks = [(seed, shard, start, stop) for shard, (start, stop) in enumerate(bounds)]
+    prices: List[int] = []
+    price = START_PRICE_UNITS
+    for offset, floor in _ordered_map(_walk_summary, tasks, workers):
+        prices.append(price)
+        price = price + offset if floor is None else max(price + offset, floor)
+    return prices
+
+
+def generate_dataset(
+    *,
+    seed: int,
+    total_rows: int,
+    shards: int = 1,
+    workers: int = 1,
+    symbol: str = "BTC-USD",
+    interval_seconds: int = 60,
+) -> Iterator[ShardResult]:
+    """Yield the rendered shards of a deterministic dataset, in shard order."""
+    shards = max(1, shards)
+    bounds = _shard_bounds(total_rows, shards)
+    start_prices = _shard_start_prices(seed, bounds, workers)
+    tasks = [
+        (seed, shard, start, stop, start_prices[shard], symbol, interval_seconds)
+        for shard, (start, stop) in enumerate(bounds)
+    ]
+    yield from _ordered_map(_render_shard, tasks, workers)
+
+
+def _shard_key(key: str, shard: int, shards: int) -> str:
+    if "${shard}" in key:
+        return key.replace("${shard}", f"{shard:05d}")
+    if shards == 1:
+        return key
+    stem, dot, ext = key.rpartition(".")
+    return f"{stem}-part-{shard:05d}.{ext}" if dot else f"{key}-part-{shard:05d}"
+
+
+def _ingest_seeded(
+    payload: Mapping[str, Any],
+    *,
+    bucket: str,
+    key: str,
+    total_rows: int,
+    symbol: str,
+    storage: StorageBackend,
+) -> Dict[str, Any]:
+    seed = int(payload["seed"])
+    shards = int(payload.get("shards") or os.getenv("INGEST_SHARDS", "1"))
+    workers = int(payload.get("workers") or os.getenv("INGEST_WORKERS", "1"))
+    interval_seconds = int(payload.get("interval_seconds") or 60)
+    upload_concurrency = int(
+        payload.get("upload_concurrency") or os.getenv("INGEST_UPLOAD_CONCURRENCY", "4")
+    )
+    manifest_key = catalog_key(payload)
+    keys: List[str] = []
+    entries: List[CatalogEntry] = []
+    dataset_digest = hashlib.sha256()
+    sample: List[Dict[str, Any]] = []
+
+    with stage("generate"):
+        results = generate_dataset(
+            seed=seed,
+            total_rows=total_rows,
+            shards=shards,
+            workers=workers,
+            symbol=symbol,
+            interval_seconds=interval_seconds,
+        )
+
+        def upload(result: ShardResult) -> Tuple[ShardResult, str, str | None]:
+            shard_key = _shard_key(key, result.shard, shards)
+            return result, shard_key, storage.write_bytes(bucket, shard_key, result.blob, "text/csv")
+
+        for result, shard_key, etag in parallel_map(upload, results, upload_concurrency):
+            count("bytes_out", len(result.blob), "Bytes")
+            dataset_digest.update(bytes.fromhex(result.digest))
+            keys.append(shard_key)
+            sample = sample or result.sample
+            if result.stop > result.start:
+                entries.append(
+                    CatalogEntry(
+                        key=shard_key,
+                        dataset="ingest",
+                        format="csv",
+                        symbol=symbol,
+                        min_timestamp=_seeded_timestamp(result.start, interval_seconds),
+                        max_timestamp=_seeded_timestamp(result.stop - 1, interval_seconds),
+                        min_sequence=result.start,
+                        max_sequence=result.stop - 1,
+                        row_count=result.stop - result.start,
+                        byte_size=len(result.blob),
+                        etag=etag,
+                    )
+                )
+    count("rows_out", total_rows)
+    if manifest_key and entries:
+        try_record_objects(storage, bucket, manifest_key, entries)
+
+    return {
+        "bucket": bucket,
+        "key": keys[0] if keys else key,
+        "keys": keys,
+        "records": total_rows,
+        "seed": seed,
+        "shards": shards,
+        "digest": dataset_digest.hexdigest(),
+        "catalog_key": manifest_key or None,
+        "sample": sample,
+        "io": io_counters(),
+    }
+
+
 def _rows_to_csv(rows: Sequence[Mapping[str, Any]]) -> str:
     """Serialize rows to CSV with a fixed schema."""
-    columns = ["timestamp", "symbol", "sequence", "price", "volume", "label"]
     buffer = io.StringIO()
-    writer = csv.DictWriter(buffer, fieldnames=columns)
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS)
     writer.writeheader()
     writer.writerows(rows)
     return buffer.getvalue()
 
 
+@instrumented("data_ingest_service")
 def lambda_handler(event: Mapping[str, Any] | None, _context: Any) -> Dict[str, Any]:
     """Generate a CSV batch and upload it to S3."""
     payload = event or {}
@@ -70,21 +345,45 @@ def lambda_handler(event: Mapping[str, Any] | None, _context: Any) -> Dict[str,
     symbol = payload.get("symbol") or os.getenv("INGEST_SYMBOL", "BTC-USD")
     endpoint_url = os.getenv("AWS_ENDPOINT_URL")
 
-    rows = _generate_rows(batch_size=batch_size, symbol=symbol)
-    csv_blob = _rows_to_csv(rows).encode("utf-8")
+    if payload.get("seed") is not None:
+        upload_key = key.replace("${uuid}", str(uuid.uuid4()))
+        body = _ingest_seeded(
+            payload,
+            bucket=bucket,
+            key=upload_key,
+            total_rows=batch_size,
+            symbol=symbol,
+            storage=_storage(endpoint_url),
+        )
+        return {"statusCode": 200, "body": json.dumps(body)}
+
+    with stage("generate"):
+        rows = _generate_rows(batch_size=batch_size, symbol=symbol)
+    with stage("serialize"):
+        csv_blob = _rows_to_csv(rows).encode("utf-8")
+    count("rows_out", len(rows))
+    count("bytes_out", len(csv_blob), "Bytes")
     upload_key = key.replace("${uuid}", str(uuid.uuid4()))
-    client = _s3_client(endpoint_url)
-    client.put_object(
-        Bucket=bucket,
-        Key=upload_key,
-        Body=csv_blob,
-        ContentType="text/csv",
-    )
+    storage = _storage(endpoint_url)
+    etag = storage.write_bytes(bucket, upload_key, csv_blob, "text/csv")
+    manifest_key = catalog_key(payload)
+    if manifest_key:
+        entry = entry_for_rows(
+            key=upload_key,
+            dataset="ingest",
+            fmt="csv",
+            rows=rows,
+            byte_size=len(csv_blob),
+            etag=etag,
+        )
+        try_record_objects(storage, bucket, manifest_key, [entry])
 
     body = {
         "bucket": bucket,
         "key": upload_key,
         "records": batch_size,
+        "catalog_key": manifest_key or None,
         "sample": rows[:3],
+        "io": io_counters(),
     }
     return {"statusCode": 200, "body": json.dumps(body)}
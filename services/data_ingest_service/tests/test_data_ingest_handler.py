@@ -8,6 +8,11 @@ SRC_DIR = SERVICE_DIR / "src"
 LAYER_DIR = Path(__file__).resolve().parents[2] / "model_service" / "layer" / "python"
 if LAYER_DIR.exists() and str(LAYER_DIR) not in sys.path:
     sys.path.append(str(LAYER_DIR))
+COMMON_DIR = Path(__file__).resolve().parents[2] / "common" / "src"
+if str(COMMON_DIR) not in sys.path:
+    sys.path.append(str(COMMON_DIR))
+
+from storage import PreconditionFailed  # noqa: E402
 
 
 def _load_handler():
@@ -35,25 +40,33 @@ def test_lambda_handler_uploads_csv(monkeypatch):
     uploads = []
 
     class FakeClient:
-        def put_object(self, *, Bucket, Key, Body, ContentType):
-            uploads.append({"Bucket": Bucket, "Key": Key, "Body": Body, "ContentType": ContentType})
+        def get_object(self, *, Bucket, Key):
+            error = Exception("missing")
+            error.response = {"Error": {"Code": "NoSuchKey"}}
+            raise error
+
+        def put_object(self, *, Bucket, Key, Body, ContentType, **conditions):
+            upload = {"Bucket": Bucket, "Key": Key, "Body": Body, "ContentType": ContentType}
+            uploads.append({**upload, **conditions})
 
     class FakeUUID:
         def __str__(self) -> str:
             return "fixed-id"
 
-    monkeypatch.setattr(handler, "_s3_client", lambda endpoint_url=None: FakeClient())
+    monkeypatch.setattr(handler, "s3_client", lambda endpoint_url=None: FakeClient())
     monkeypatch.setattr(handler.uuid, "uuid4", lambda: FakeUUID())
-    response = handler.lambda_handler(
-        {"bucket": "demo", "key": "data/batch-${uuid}.csv", "batch_size": 2, "symbol": "BTC"}, None
-    )
+    event = {"bucket": "demo", "key": "data/batch-${uuid}.csv", "batch_size": 2, "symbol": "BTC"}
+    response = handler.lambda_handler({**event, "catalog_key": "catalog/manifest.json"}, None)
 
     assert response["statusCode"] == 200
     payload = json.loads(response["body"])
     assert payload["bucket"] == "demo"
     assert payload["records"] == 2
 
-    assert len(uploads) == 1
+    assert [upload["Key"] for upload in uploads] == [
+        "data/batch-fixed-id.csv",
+        "catalog/manifest.json",
+    ]
     upload = uploads[0]
     assert upload["Bucket"] == "demo"
     assert upload["Key"] == "data/batch-fixed-id.csv"
@@ -61,3 +74,124 @@ def test_lambda_handler_uploads_csv(monkeypatch):
     header, *rows = body_text.strip().splitlines()
     assert header == "timestamp,symbol,sequence,price,volume,label"
     assert len(rows) == 2
+
+    assert "IfNoneMatch" not in upload
+    # New manifest: only created if no concurrent writer created it first.
+    assert uploads[1]["IfNoneMatch"] == "*"
+    manifest = json.loads(uploads[1]["Body"].decode("utf-8"))
+    entry = manifest["entries"]["data/batch-fixed-id.csv"]
+    assert entry["symbol"] == "BTC"
+    assert entry["row_count"] == 2
+    assert entry["min_sequence"] == 0 and entry["max_sequence"] == 1
+    assert entry["byte_size"] == len(upload["Body"])
+    assert entry["format"] == "csv"
+
+
+def test_lambda_handler_skips_catalog_unless_configured(monkeypatch, tmp_path):
+    monkeypatch.setenv("PIPELINE_STORAGE_URL", f"file://{tmp_path}")
+    monkeypatch.setenv("PIPELINE_METRICS", "0")
+    monkeypatch.delenv("PIPELINE_CATALOG_KEY", raising=False)
+
+    payload = json.loads(handler.lambda_handler({"bucket": "demo"}, None)["body"])
+
+    assert payload["catalog_key"] is None
+    assert not (tmp_path / "demo" / "catalog").exists()
+
+
+def test_lambda_handler_succeeds_when_catalog_update_fails(monkeypatch, tmp_path, caplog):
+    monkeypatch.setenv("PIPELINE_STORAGE_URL", f"file://{tmp_path}")
+    monkeypatch.setenv("PIPELINE_METRICS", "0")
+    monkeypatch.setenv("PIPELINE_CATALOG_MAX_ATTEMPTS", "1")
+    storage_type = type(handler._storage(None))
+
+    def conflict(self, bucket, key, data, etag, content_type=None):
+        raise PreconditionFailed(f"{bucket}/{key}")
+
+    monkeypatch.setattr(storage_type, "write_bytes_if_match", conflict)
+    event = {"bucket": "demo", "key": "data/batch.csv", "catalog_key": "catalog/manifest.json"}
+
+    response = handler.lambda_handler(event, None)
+
+    assert response["statusCode"] == 200
+    assert (tmp_path / "demo" / "data" / "batch.csv").exists()
+    assert "Could not update catalog demo/catalog/manifest.json" in caplog.text
+
+
+def test_seeded_dataset_is_identical_regardless_of_worker_count(monkeypatch):
+    # Pretend there are enough CPUs that the process pool really runs.
+    monkeypatch.setattr(handler.os, "cpu_count", lambda: 4)
+
+    def render(workers):
+        return [
+            (result.shard, result.blob, result.digest)
+            for result in handler.generate_dataset(
+                seed=7, total_rows=1_003, shards=4, workers=workers, symbol="UNIT"
+            )
+        ]
+
+    in_process = render(1)
+    assert render(3) == in_process
+    assert [shard for shard, _, _ in in_process] == [0, 1, 2, 3]
+    assert render(1) != [
+        (result.shard, result.blob, result.digest)
+        for result in handler.generate_dataset(seed=8, total_rows=1_003, shards=4, symbol="UNIT")
+    ]
+    rows = [
+        line.split(",")
+        for _, blob, _ in in_process
+        for line in blob.decode("utf-8").splitlines()[1:]
+    ]
+    assert [int(row[2]) for row in rows] == list(range(1_003))
+
+
+def test_ordered_map_runs_in_process_without_a_process_pool(monkeypatch, caplog):
+    import concurrent.futures
+
+    def unavailable(*_args, **_kwargs):
+        raise OSError(38, "Function not implemented")
+
+    monkeypatch.setattr(handler.os, "cpu_count", lambda: 4)
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", unavailable)
+    tasks = [(5, shard, shard * 100, (shard + 1) * 100) for shard in range(3)]
+
+    assert list(handler._ordered_map(handler._walk_summary, tasks, 64)) == [
+        handler._walk_summary(task) for task in tasks
+    ]
+    assert "No process pool available" in caplog.text
+
+
+def test_seeded_walk_is_continuous_across_shards():
+    bounds = handler._shard_bounds(900, 3)
+    starts = handler._shard_start_prices(11, bounds, workers=1)
+    for shard, (start, stop) in enumerate(bounds[:-1]):
+        *_, (_, end_price, _, _) = handler._walk(11, shard, start, stop, starts[shard])
+        assert starts[shard + 1] == end_price
+
+
+def test_walk_summary_composes_with_price_floor():
+    offset, floor = handler._walk_summary((3, 0, 0, 500))
+    for start_price in (
+        handler.FLOOR_PRICE_UNITS,
+        handler.FLOOR_PRICE_UNITS + 10 * handler.PRICE_SCALE,
+        handler.START_PRICE_UNITS,
+    ):
+        *_, (_, end_price, _, _) = handler._walk(3, 0, 0, 500, start_price)
+        assert end_price == max(start_price + offset, floor)
+
+
+def test_lambda_handler_seeded_mode_writes_shards_and_catalog(monkeypatch, tmp_path):
+    monkeypatch.setenv("PIPELINE_STORAGE_URL", f"file://{tmp_path}")
+    monkeypatch.setenv("PIPELINE_METRICS", "0")
+    monkeypatch.setenv("PIPELINE_CATALOG_KEY", "catalog/manifest.json")
+    event = {"bucket": "demo", "key": "data/seeded.csv", "batch_size": 10, "seed": 42, "shards": 3}
+
+    first = json.loads(handler.lambda_handler(event, None)["body"])
+    second = json.loads(handler.lambda_handler({**event, "workers": 2}, None)["body"])
+
+    assert first["digest"] == second["digest"]
+    assert first["keys"] == [f"data/seeded-part-0000{idx}.csv" for idx in range(3)]
+    manifest = json.loads((tmp_path / "demo" / "catalog" / "manifest.json").read_text())
+    entries = [manifest["entries"][key] for key in first["keys"]]
+    assert [entry["row_count"] for entry in entries] == [4, 3, 3]
+    assert entries[1]["min_sequence"] == 4
+    assert entries[1]["min_timestamp"] == "2024-01-01T00:04:00+00:00"
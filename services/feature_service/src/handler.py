@@ -8,41 +8,52 @@ import json
 import os
 import uuid
 from statistics import fmean
-from typing import Any, Dict, Iterable, List, Mapping
+from typing import Any, Callable, Dict, Iterable, List, Mapping
 
-import boto3
+from cache import cache_counters, open_cached
+from catalog import Catalog, Predicates, catalog_key, entry_for_rows, try_record_objects
+from instrumentation import count, instrumented, stage
+from retry import io_counters, parallel_map
+from storage import StorageBackend, count_read, s3_client, storage_from_env
 
 
-def _s3_client(endpoint_url: str | None):
-    session = boto3.session.Session()
-    return session.client(
-        "s3",
-        endpoint_url=endpoint_url,
-        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID", "test"),
-        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY", "test"),
-        region_name=os.getenv("AWS_REGION", "us-east-1"),
-    )
+def _storage(endpoint_url: str | None) -> StorageBackend:
+    return storage_from_env(lambda: s3_client(endpoint_url))
 
 
-def _read_csv(client, bucket: str, key: str) -> List[Dict[str, Any]]:
-    response = client.get_object(Bucket=bucket, Key=key)
-    body = response["Body"].read().decode("utf-8")
-    reader = csv.DictReader(io.StringIO(body))
-    rows: List[Dict[str, Any]] = []
-    for record in reader:
-        try:
-            rows.append(
-                {
-                    "timestamp": record.get("timestamp") or "",
-                    "symbol": record.get("symbol") or "",
-                    "sequence": int(record.get("sequence") or 0),
-                    "price": float(record.get("price") or 0),
-                    "volume": float(record.get("volume") or 0),
-                    "label": record.get("label") or "",
-                }
-            )
-        except ValueError:
-            continue
+def _read_csv(
+    storage: StorageBackend,
+    bucket: str,
+    key: str,
+    keep: Callable[[str | None, str | None], bool] | None = None,
+) -> List[Dict[str, Any]]:
+    """Parse an ingest CSV; ``keep`` drops rows outside the requested predicates."""
+    dropped = 0
+    with open_cached(storage, bucket, key) as obj:
+        count_read(obj)
+        with stage("parse"):
+            reader = csv.DictReader(io.TextIOWrapper(obj.stream, encoding="utf-8", newline=""))
+            rows: List[Dict[str, Any]] = []
+            for record in reader:
+                if keep is not None and not keep(record.get("symbol"), record.get("timestamp")):
+                    dropped += 1
+                    continue
+                try:
+                    rows.append(
+                        {
+                            "timestamp": record.get("timestamp") or "",
+                            "symbol": record.get("symbol") or "",
+                            "sequence": int(record.get("sequence") or 0),
+                            "price": float(record.get("price") or 0),
+                            "volume": float(record.get("volume") or 0),
+                            "label": record.get("label") or "",
+                        }
+                    )
+                except ValueError:
+                    continue
+    count("rows_in", len(rows))
+    if dropped:
+        count("rows_filtered", dropped)
     return rows
 
 
@@ -74,6 +85,32 @@ def _engineer_features(rows: Iterable[Mapping[str, Any]]) -> List[Dict[str, Any]
     return feats
 
 
+def _resolve_sources(
+    storage: StorageBackend,
+    bucket: str,
+    default_key: str,
+    manifest_key: str,
+    predicates: Predicates,
+) -> List[List[str]]:
+    """Return the source keys to read, grouped per symbol.
+
+    Without predicates this is just the configured ``source_key``. With
+    predicates the ingest entries of the catalog are pruned and only matching
+    objects are returned, so features are engineered per symbol series. Rows
+    of those objects are filtered again by :meth:`Predicates.row_filter`.
+    """
+    if not predicates.active:
+        return [[default_key]]
+    if not manifest_key:
+        raise ValueError("symbol/time predicates require a catalog_key")
+    entries = Catalog.load(storage, bucket, manifest_key).resolve(predicates, dataset="ingest")
+    groups: Dict[str | None, List[str]] = {}
+    for entry in entries:
+        groups.setdefault(entry.symbol, []).append(entry.key)
+    return list(groups.values())
+
+
+@instrumented("feature_service")
 def lambda_handler(event: Mapping[str, Any] | None, _context: Any) -> Dict[str, Any]:
     payload = event or {}
     source_bucket = payload.get("source_bucket") or os.getenv(
@@ -89,19 +126,41 @@ def lambda_handler(event: Mapping[str, Any] | None, _context: Any) -> Dict[str,
         "FEATURE_KEY", "features/ingest_batch.jsonl"
     )
     endpoint_url = os.getenv("AWS_ENDPOINT_URL")
-    client = _s3_client(endpoint_url)
-    rows = _read_csv(client, source_bucket, source_key)
-    features = _engineer_features(rows)
+    storage = _storage(endpoint_url)
+    manifest_key = catalog_key(payload)
+    predicates = Predicates.from_event(payload)
+    source_keys = _resolve_sources(storage, source_bucket, source_key, manifest_key, predicates)
+    read_concurrency = int(
+        payload.get("read_concurrency") or os.getenv("FEATURE_READ_CONCURRENCY", "4")
+    )
+    keep = predicates.row_filter()
+    features: List[Dict[str, Any]] = []
+    for keys in source_keys:
+        rows: List[Dict[str, Any]] = []
+        for part in parallel_map(
+            lambda key: _read_csv(storage, source_bucket, key, keep), keys, read_concurrency
+        ):
+            rows.extend(part)
+        with stage("compute"):
+            features.extend(_engineer_features(rows))
 
     token = payload.get("uuid") or os.getenv("FEATURE_RUN_ID") or str(uuid.uuid4())
     rendered_key = feature_key.replace("${uuid}", token).replace("//", "/")
-    body = "\n".join(json.dumps(row) for row in features).encode("utf-8")
-    client.put_object(
-        Bucket=feature_bucket,
-        Key=rendered_key,
-        Body=body,
-        ContentType="application/json",
-    )
+    with stage("serialize"):
+        body = "\n".join(json.dumps(row) for row in features).encode("utf-8")
+    count("rows_out", len(features))
+    count("bytes_out", len(body), "Bytes")
+    etag = storage.write_bytes(feature_bucket, rendered_key, body, "application/json")
+    if manifest_key:
+        entry = entry_for_rows(
+            key=rendered_key,
+            dataset="features",
+            fmt="jsonl",
+            rows=features,
+            byte_size=len(body),
+            etag=etag,
+        )
+        try_record_objects(storage, feature_bucket, manifest_key, [entry])
 
     preview = features[:3]
     return {
@@ -113,7 +172,12 @@ def lambda_handler(event: Mapping[str, Any] | None, _context: Any) -> Dict[str,
                 "feature_bucket": feature_bucket,
                 "feature_key": rendered_key,
                 "feature_count": len(features),
+                "source_keys": [key for keys in source_keys for key in keys],
+                "predicates": predicates.to_dict() if predicates.active else None,
+                "catalog_key": manifest_key or None,
                 "preview": preview,
+                "io": io_counters(),
+                "cache": cache_counters(),
             }
         ),
     }
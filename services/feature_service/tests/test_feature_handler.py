@@ -4,11 +4,18 @@ import json
 import sys
 from pathlib import Path
 
+import pytest
+
 SERVICE_DIR = Path(__file__).resolve().parents[1]
 SRC_DIR = SERVICE_DIR / "src"
 LAYER_DIR = Path(__file__).resolve().parents[2] / "model_service" / "layer" / "python"
 if LAYER_DIR.exists() and str(LAYER_DIR) not in sys.path:
     sys.path.append(str(LAYER_DIR))
+COMMON_DIR = Path(__file__).resolve().parents[2] / "common" / "src"
+if str(COMMON_DIR) not in sys.path:
+    sys.path.append(str(COMMON_DIR))
+
+from catalog import record_objects  # noqa: E402
 
 
 def _load_handler():
@@ -54,12 +61,17 @@ def test_lambda_handler_transforms_and_uploads(monkeypatch):
 
     class FakeClient:
         def get_object(self, *, Bucket, Key):
+            if Key == "catalog/manifest.json":
+                error = Exception("missing")
+                error.response = {"Error": {"Code": "NoSuchKey"}}
+                raise error
             return {"Body": io.BytesIO(SAMPLE_CSV.encode("utf-8"))}
 
-        def put_object(self, *, Bucket, Key, Body, ContentType):
-            stored.update({"Bucket": Bucket, "Key": Key, "Body": Body, "ContentType": ContentType})
+        def put_object(self, *, Bucket, Key, Body, ContentType, **_conditions):
+            if Key != "catalog/manifest.json":
+                stored.update({"Bucket": Bucket, "Key": Key, "Body": Body, "ContentType": ContentType})
 
-    monkeypatch.setattr(handler, "_s3_client", lambda endpoint_url=None: FakeClient())
+    monkeypatch.setattr(handler, "s3_client", lambda endpoint_url=None: FakeClient())
     response = handler.lambda_handler(
         {
             "source_bucket": "input-bucket",
@@ -82,3 +94,186 @@ def test_lambda_handler_transforms_and_uploads(monkeypatch):
     stored_rows = [json.loads(line) for line in stored["Body"].decode("utf-8").splitlines()]
     assert stored_rows[0]["price"] == 100.0
     assert "normalized_volume" in stored_rows[0]
+
+
+def test_lambda_handler_emits_stage_metrics(monkeypatch, capsys):
+    class FakeClient:
+        def get_object(self, *, Bucket, Key):
+            body = SAMPLE_CSV.encode("utf-8")
+            return {"Body": io.BytesIO(body), "ContentLength": len(body)}
+
+        def put_object(self, *, Bucket, Key, Body, ContentType):
+            pass
+
+    monkeypatch.delenv("PIPELINE_METRICS", raising=False)
+    monkeypatch.setenv("PIPELINE_CATALOG_KEY", "")
+    monkeypatch.setattr(handler, "s3_client", lambda endpoint_url=None: FakeClient())
+    handler.lambda_handler({"uuid": "metrics"}, None)
+
+    emf = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert emf["Service"] == "feature_service"
+    assert emf["rows_in"] == 2
+    assert emf["bytes_in"] == len(SAMPLE_CSV)
+    for stage_name in ("s3_get", "parse", "compute", "serialize", "s3_put"):
+        assert f"{stage_name}_ms" in emf
+
+
+def test_lambda_handler_runs_on_local_filesystem_backend(monkeypatch, tmp_path):
+    monkeypatch.setenv("PIPELINE_STORAGE_URL", f"file://{tmp_path}")
+    monkeypatch.setenv("PIPELINE_METRICS", "0")
+    source = tmp_path / "input-bucket" / "data" / "raw.csv"
+    source.parent.mkdir(parents=True)
+    source.write_text(SAMPLE_CSV)
+
+    def no_s3(endpoint_url=None):
+        raise AssertionError("S3 must not be used with a file:// backend")
+
+    monkeypatch.setattr(handler, "s3_client", no_s3)
+    response = handler.lambda_handler(
+        {
+            "source_bucket": "input-bucket",
+            "source_key": "data/raw.csv",
+            "feature_bucket": "feature-bucket",
+            "feature_key": "features/out.jsonl",
+        },
+        None,
+    )
+
+    assert json.loads(response["body"])["feature_count"] == 2
+    written = (tmp_path / "feature-bucket" / "features" / "out.jsonl").read_text()
+    assert len(written.splitlines()) == 2
+
+
+def test_lambda_handler_prunes_sources_with_catalog(monkeypatch, tmp_path):
+    monkeypatch.setenv("PIPELINE_STORAGE_URL", f"file://{tmp_path}")
+    monkeypatch.setenv("PIPELINE_METRICS", "0")
+    storage = handler._storage(None)
+    entries = []
+    for key, symbol, start in (
+        ("data/btc-0.csv", "BTC", "2023-01-01T00:00:00Z"),
+        ("data/btc-1.csv", "BTC", "2023-01-02T00:00:00Z"),
+        ("data/eth-0.csv", "ETH", "2023-01-01T00:00:00Z"),
+    ):
+        body = SAMPLE_CSV.replace("BTC", symbol).replace("2023-01-01", start[:10])
+        storage.write_bytes("raw", key, body.encode("utf-8"))
+        entries.append(
+            handler.entry_for_rows(
+                key=key,
+                dataset="ingest",
+                fmt="csv",
+                rows=[
+                    {"symbol": symbol, "timestamp": start, "sequence": 0},
+                    {"symbol": symbol, "timestamp": start.replace("00:00:00", "00:01:00"), "sequence": 1},
+                ],
+                byte_size=len(body),
+                etag=None,
+            )
+        )
+    record_objects(storage, "raw", "catalog/manifest.json", entries)
+    (tmp_path / "raw" / "data" / "eth-0.csv").unlink()
+
+    response = handler.lambda_handler(
+        {
+            "source_bucket": "raw",
+            "feature_bucket": "feat",
+            "feature_key": "features/btc.jsonl",
+            "catalog_key": "catalog/manifest.json",
+            "symbols": "BTC",
+            "start_time": "2023-01-02T00:00:00Z",
+        },
+        None,
+    )
+
+    payload = json.loads(response["body"])
+    assert payload["source_keys"] == ["data/btc-1.csv"]
+    assert payload["feature_count"] == 2
+    manifest = json.loads((tmp_path / "feat" / "catalog" / "manifest.json").read_text())
+    feature_entry = manifest["entries"]["features/btc.jsonl"]
+    assert feature_entry["dataset"] == "features"
+    assert feature_entry["symbol"] == "BTC"
+    assert feature_entry["min_timestamp"] == "2023-01-02T00:00:00Z"
+
+
+def test_lambda_handler_filters_rows_of_objects_straddling_the_window(monkeypatch, tmp_path):
+    monkeypatch.setenv("PIPELINE_STORAGE_URL", f"file://{tmp_path}")
+    monkeypatch.setenv("PIPELINE_METRICS", "0")
+    storage = handler._storage(None)
+    rows = [
+        {"timestamp": f"2023-01-01T{hour:02d}:00:00Z", "symbol": symbol, "sequence": hour}
+        for hour in range(4)
+        for symbol in ("BTC", "ETH")
+    ]
+    body = "timestamp,symbol,sequence,price,volume,label\n" + "".join(
+        f"{row['timestamp']},{row['symbol']},{row['sequence']},100,10,up\n" for row in rows
+    )
+    storage.write_bytes("raw", "data/mixed.csv", body.encode("utf-8"))
+    entry = handler.entry_for_rows(
+        key="data/mixed.csv", dataset="ingest", fmt="csv", rows=rows, byte_size=len(body), etag=None
+    )
+    record_objects(storage, "raw", "catalog/manifest.json", [entry])
+
+    response = handler.lambda_handler(
+        {
+            "source_bucket": "raw",
+            "feature_bucket": "feat",
+            "feature_key": "features/btc-window.jsonl",
+            "catalog_key": "catalog/manifest.json",
+            "symbols": "BTC",
+            "start_time": "2023-01-01T01:00:00Z",
+            "end_time": "2023-01-01T02:00:00Z",
+        },
+        None,
+    )
+
+    payload = json.loads(response["body"])
+    assert payload["source_keys"] == ["data/mixed.csv"]
+    written = (tmp_path / "feat" / "features" / "btc-window.jsonl").read_text().splitlines()
+    features = [json.loads(line) for line in written]
+    assert [(row["symbol"], row["sequence"]) for row in features] == [("BTC", 1), ("BTC", 2)]
+    assert payload["feature_count"] == 2
+
+
+def test_lambda_handler_rejects_malformed_window_before_reading(monkeypatch):
+    class FakeClient:
+        def get_object(self, **_kwargs):
+            raise AssertionError("nothing should be read")
+
+    monkeypatch.setattr(handler, "s3_client", lambda endpoint_url=None: FakeClient())
+    event = {"catalog_key": "catalog/manifest.json", "symbols": "BTC", "start_time": "soon"}
+
+    with pytest.raises(ValueError, match="start_time must be an ISO-8601 timestamp"):
+        handler.lambda_handler(event, None)
+
+
+def test_lambda_handler_reuses_cached_source_on_warm_invocation(monkeypatch, tmp_path):
+    gets = []
+
+    class FakeClient:
+        def get_object(self, *, Bucket, Key, IfNoneMatch=None):
+            if Key == "catalog/manifest.json":
+                error = Exception("missing")
+                error.response = {"Error": {"Code": "NoSuchKey"}}
+                raise error
+            gets.append(IfNoneMatch)
+            if IfNoneMatch == '"v1"':
+                error = Exception("not modified")
+                error.response = {"Error": {"Code": "304"}}
+                raise error
+            body = SAMPLE_CSV.encode("utf-8")
+            return {"Body": io.BytesIO(body), "ContentLength": len(body), "ETag": '"v1"'}
+
+        def put_object(self, *, Bucket, Key, Body, ContentType):
+            return {"ETag": '"out"'}
+
+    monkeypatch.setenv("PIPELINE_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("PIPELINE_CATALOG_KEY", "")
+    monkeypatch.setattr(handler, "s3_client", lambda endpoint_url=None: FakeClient())
+    event = {"source_bucket": "input-bucket", "source_key": "data/raw.csv", "uuid": "run"}
+
+    cold = json.loads(handler.lambda_handler(event, None)["body"])
+    warm = json.loads(handler.lambda_handler(event, None)["body"])
+
+    assert gets == [None, '"v1"']
+    assert cold["cache"] == {"hits": 0, "misses": 1, "bytes_saved": 0}
+    assert warm["cache"] == {"hits": 1, "misses": 0, "bytes_saved": len(SAMPLE_CSV)}
+    assert warm["feature_count"] == cold["feature_count"] == 2
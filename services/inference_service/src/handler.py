@@ -6,31 +6,38 @@ import json
 import os
 from typing import Any, Dict, Iterable, List, Mapping
 
-import boto3
-from botocore.exceptions import ClientError
-
-
-def _s3_client(endpoint_url: str | None):
-    session = boto3.session.Session()
-    return session.client(
-        "s3",
-        endpoint_url=endpoint_url,
-        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID", "test"),
-        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY", "test"),
-        region_name=os.getenv("AWS_REGION", "us-east-1"),
-    )
+from instrumentation import count, instrumented, stage
+from retry import io_counters
+from storage import ObjectNotFound, StorageBackend, s3_client, storage_from_env
+
+
+def _storage(endpoint_url: str | None) -> StorageBackend:
+    return storage_from_env(lambda: s3_client(endpoint_url))
+
 
+def _load_artifact(storage: StorageBackend, bucket: str, key: str) -> Dict[str, Any]:
+    """Load the training artifact, falling back to a neutral one only if it does not exist.
 
-def _load_artifact(client, bucket: str, key: str) -> Dict[str, Any]:
+    Throttling and transient errors are retried by the storage layer; anything
+    that still fails (access denied, exhausted retries, ...) propagates instead
+    of silently scoring against the fallback.
+    """
     try:
-        response = client.get_object(Bucket=bucket, Key=key)
-        payload = response["Body"].read().decode("utf-8")
+        payload = storage.read_text(bucket, key)
+    except ObjectNotFound:
+        count("artifact_missing", 1)
+        return {"generated_at": None, "metrics": {"row_count": 1.0}}
+    count("bytes_in", len(payload), "Bytes")
+    with stage("parse"):
         return json.loads(payload)
-    except client.exceptions.NoSuchKey:
-        pass
-    except ClientError:
-        pass
-    return {"generated_at": None, "metrics": {"row_count": 1.0}}
+
+
+def _decision_boundary(artifact: Mapping[str, Any], override: float = 0.0) -> float:
+    """Use the explicit boundary if given, otherwise derive it from the artifact."""
+    if override:
+        return override
+    metrics = artifact.get("metrics") or {}
+    return float(metrics.get("row_count") or 1.0)
 
 
 def _score(record: Mapping[str, Any]) -> float:
@@ -58,6 +65,7 @@ def _predict(records: Iterable[Mapping[str, Any]], boundary: float) -> List[Dict
     return preds
 
 
+@instrumented("inference_service")
 def lambda_handler(event: Mapping[str, Any] | None, _context: Any) -> Dict[str, Any]:
     payload = event or {}
     artifact_bucket = payload.get("artifact_bucket") or os.getenv(
@@ -69,15 +77,16 @@ def lambda_handler(event: Mapping[str, Any] | None, _context: Any) -> Dict[str,
     decision_boundary = float(payload.get("decision_boundary") or 0)
     endpoint_url = os.getenv("AWS_ENDPOINT_URL")
 
-    client = _s3_client(endpoint_url)
-    artifact = _load_artifact(client, artifact_bucket, artifact_key)
-    metrics = artifact.get("metrics") or {}
-    if decision_boundary == 0:
-        decision_boundary = float(metrics.get("row_count") or 1.0)
+    storage = _storage(endpoint_url)
+    artifact = _load_artifact(storage, artifact_bucket, artifact_key)
+    decision_boundary = _decision_boundary(artifact, decision_boundary)
     inputs = payload.get("inputs") or payload.get("records") or []
     if not isinstance(inputs, list):
         inputs = []
-    predictions = _predict(inputs, decision_boundary)
+    with stage("compute"):
+        predictions = _predict(inputs, decision_boundary)
+    count("rows_in", len(inputs))
+    count("rows_out", len(predictions))
     body = {
         "model_version": artifact.get("generated_at"),
         "artifact_bucket": artifact_bucket,
@@ -85,5 +94,9 @@ def lambda_handler(event: Mapping[str, Any] | None, _context: Any) -> Dict[str,
         "decision_boundary": decision_boundary,
         "prediction_count": len(predictions),
         "predictions": predictions,
+        "io": io_counters(),
     }
-    return {"statusCode": 200, "body": json.dumps(body)}
+    with stage("serialize"):
+        serialized = json.dumps(body)
+    count("bytes_out", len(serialized), "Bytes")
+    return {"statusCode": 200, "body": serialized}
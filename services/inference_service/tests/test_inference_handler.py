@@ -3,11 +3,16 @@ import json
 import sys
 from pathlib import Path
 
+import pytest
+
 SERVICE_DIR = Path(__file__).resolve().parents[1]
 SRC_DIR = SERVICE_DIR / "src"
 LAYER_DIR = Path(__file__).resolve().parents[2] / "model_service" / "layer" / "python"
 if LAYER_DIR.exists() and str(LAYER_DIR) not in sys.path:
     sys.path.append(str(LAYER_DIR))
+COMMON_DIR = Path(__file__).resolve().parents[2] / "common" / "src"
+if str(COMMON_DIR) not in sys.path:
+    sys.path.append(str(COMMON_DIR))
 
 
 def _load_handler():
@@ -30,7 +35,7 @@ def test_lambda_handler_returns_predictions(monkeypatch):
     class FakeClient:
         pass
 
-    monkeypatch.setattr(handler, "_s3_client", lambda endpoint_url=None: FakeClient())
+    monkeypatch.setattr(handler, "s3_client", lambda endpoint_url=None: FakeClient())
     monkeypatch.setattr(handler, "_load_artifact", lambda *_: artifact)
     response = handler.lambda_handler(
         {
@@ -53,8 +58,31 @@ def test_lambda_handler_returns_predictions(monkeypatch):
 
 def test_lambda_handler_handles_non_list_inputs(monkeypatch):
     artifact = {"generated_at": None, "metrics": {"row_count": 1}}
-    monkeypatch.setattr(handler, "_s3_client", lambda endpoint_url=None: object())
+    monkeypatch.setattr(handler, "s3_client", lambda endpoint_url=None: object())
     monkeypatch.setattr(handler, "_load_artifact", lambda *_: artifact)
     response = handler.lambda_handler({"inputs": "invalid"}, None)
     body = json.loads(response["body"])
     assert body["prediction_count"] == 0
+
+
+def test_load_artifact_only_falls_back_when_missing():
+    storage = sys.modules["storage"]
+
+    class MissingClient:
+        def get_object(self, *, Bucket, Key):
+            error = Exception("missing")
+            error.response = {"Error": {"Code": "NoSuchKey"}}
+            raise error
+
+    class DeniedClient:
+        def get_object(self, *, Bucket, Key):
+            error = Exception("denied")
+            error.response = {"Error": {"Code": "AccessDenied"}}
+            raise error
+
+    missing = storage.S3Storage(lambda: MissingClient())
+    assert handler._load_artifact(missing, "artifacts", "models/run.json")["generated_at"] is None
+
+    denied = storage.S3Storage(lambda: DeniedClient())
+    with pytest.raises(Exception, match="denied"):
+        handler._load_artifact(denied, "artifacts", "models/run.json")
@@ -6,6 +6,10 @@ import json
 import os
 from typing import Any, Mapping
 
+from cache import cache_counters
+from catalog import Predicates, catalog_key
+from instrumentation import instrumented
+from retry import io_counters
 from train import run_training
 
 
@@ -17,6 +21,7 @@ def _get_value(event: Mapping[str, Any] | None, key: str, default: str) -> str:
     return os.getenv(key, default)
 
 
+@instrumented("model_service")
 def lambda_handler(event: Mapping[str, Any] | None, _context: Any) -> dict[str, Any]:
     """Lambda handler that triggers the training job."""
     bucket_default = os.getenv("TRAINING_DATA_BUCKET") or "ml-data-demo"
@@ -32,6 +37,7 @@ def lambda_handler(event: Mapping[str, Any] | None, _context: Any) -> dict[str,
     key = _get_value(event_payload, "key", key_default)
     artifact_bucket = _get_value(event_payload, "artifact_bucket", artifact_bucket_default)
     artifact_key = _get_value(event_payload, "artifact_key", artifact_key_default)
+    split_prefix = _get_value(event_payload, "split_prefix", os.getenv("TRAIN_SPLIT_PREFIX", ""))
 
     result = run_training(
         bucket=bucket,
@@ -41,6 +47,9 @@ def lambda_handler(event: Mapping[str, Any] | None, _context: Any) -> dict[str,
         artifact_key=artifact_key,
         test_size=test_size,
         random_state=random_state,
+        predicates=Predicates.from_event(event_payload),
+        catalog_key=catalog_key(event_payload),
+        split_prefix=split_prefix or None,
     )
     return {
         "statusCode": 200,
@@ -51,6 +60,9 @@ def lambda_handler(event: Mapping[str, Any] | None, _context: Any) -> dict[str,
                 "preview_rows": result.preview_rows,
                 "artifact_bucket": result.artifact_bucket,
                 "artifact_key": result.artifact_key,
+                "split": result.split,
+                "io": io_counters(),
+                "cache": cache_counters(),
             }
         ),
     }
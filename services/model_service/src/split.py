@@ -0,0 +1,271 @@
+"""Streaming, hash-based train/test split.
+
+Every row is assigned to ``train`` or ``test`` on its own, from a seeded
+hash of ``random_state`` and a stable row key. Ingest rows use
+``(symbol, sequence)``; rows without those columns fall back to their full
+contents. The assignment therefore never depends on file order, chunking or
+how many objects the dataset spans, and one pass holds a single row in
+memory at a time.
+
+The hash runs once per row on the hot path, so it is CRC-32 (C speed,
+seeded with ``random_state``) followed by a 64-bit Fibonacci multiply that
+spreads it over the unit interval. It is not cryptographic; it only has to
+be stable and evenly spread. CRC-32 can be continued from a previous value,
+so the ``symbol + separator`` prefix is hashed once per symbol and each row
+only hashes its sequence cell.
+
+When given writers, :func:`split_csv` streams both partitions back out as CSV.
+``run_training`` uses that to persist a split once and to reuse it on later
+runs. See :func:`split_location`.
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import io
+import json
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Callable, Dict, List, Mapping, Sequence
+
+_HASH_SPACE = 1 << 64
+_HASH_MASK = _HASH_SPACE - 1
+_FIBONACCI = 0x9E3779B97F4A7C15
+_KEY_SEPARATOR = "\x1f"
+SPLIT_MARKER = "_SPLIT.json"
+# Bumped whenever row assignment changes, so older persisted splits are not reused.
+SPLIT_SCHEME = 2
+
+
+def _seed(random_state: int) -> int:
+    digest = hashlib.sha256(f"train_test_split:{random_state}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big")
+
+
+def _threshold(test_size: float) -> int:
+    return int(test_size * _HASH_SPACE)
+
+
+def is_test_row(row_key: str, *, test_size: float, random_state: int) -> bool:
+    """Return ``True`` when ``row_key`` falls in the test partition."""
+    crc = zlib.crc32(row_key.encode("utf-8"), _seed(random_state))
+    return (crc * _FIBONACCI) & _HASH_MASK < _threshold(test_size)
+
+
+class RowSplitter:
+    """Assigns rows of one CSV layout to train (``False``) or test (``True``)."""
+
+    def __init__(self, columns: Sequence[str], *, test_size: float, random_state: int) -> None:
+        if not 0.0 <= test_size < 1.0:
+            raise ValueError(f"test_size must be in [0, 1), got {test_size}")
+        self.test_size = test_size
+        self._seed = _seed(random_state)
+        self._threshold = _threshold(test_size)
+        # CRC-32 of "<symbol>\x1f" per raw symbol cell; rows continue from it.
+        self._prefixes: Dict[str, int] = {}
+        columns = list(columns)
+        if "symbol" in columns and "sequence" in columns:
+            self._key_columns: tuple[int, int] | None = (
+                columns.index("symbol"),
+                columns.index("sequence"),
+            )
+        else:
+            self._key_columns = None
+
+    def row_key(self, row: Sequence[str]) -> str:
+        if self._key_columns is None:
+            return _KEY_SEPARATOR.join(cell.strip() for cell in row)
+        return _KEY_SEPARATOR.join(
+            row[idx].strip() if idx < len(row) else "" for idx in self._key_columns
+        )
+
+    def __call__(self, row: Sequence[str]) -> bool:
+        if self._threshold <= 0:
+            return False
+        if self._key_columns is None:
+            crc = zlib.crc32(self.row_key(row).encode("utf-8"), self._seed)
+        else:
+            symbol_idx, sequence_idx = self._key_columns
+            if sequence_idx >= len(row) or symbol_idx >= len(row):
+                crc = zlib.crc32(self.row_key(row).encode("utf-8"), self._seed)
+            else:
+                symbol = row[symbol_idx]
+                prefix = self._prefixes.get(symbol)
+                if prefix is None:
+                    prefix = zlib.crc32(
+                        (symbol.strip() + _KEY_SEPARATOR).encode("utf-8"), self._seed
+                    )
+                    self._prefixes[symbol] = prefix
+                crc = zlib.crc32(row[sequence_idx].strip().encode("utf-8"), prefix)
+        return (crc * _FIBONACCI) & _HASH_MASK < self._threshold
+
+
+@dataclass
+class SplitStats:
+    """Per-partition row counts plus the train preview used for the artifact."""
+
+    columns: List[str] = field(default_factory=list)
+    train_rows: int = 0
+    test_rows: int = 0
+    preview_rows: List[Dict[str, str]] = field(default_factory=list)
+    filtered_rows: int = 0
+
+    @property
+    def row_count(self) -> int:
+        return self.train_rows + self.test_rows
+
+    def merge(self, other: "SplitStats") -> None:
+        self.columns = self.columns or other.columns
+        self.train_rows += other.train_rows
+        self.test_rows += other.test_rows
+        self.filtered_rows += other.filtered_rows
+        self.preview_rows.extend(other.preview_rows[: 5 - len(self.preview_rows)])
+
+
+def _column_index(columns: Sequence[str], name: str) -> int | None:
+    return columns.index(name) if name in columns else None
+
+
+def _cell(row: Sequence[str], idx: int | None) -> str | None:
+    return row[idx].strip() if idx is not None and idx < len(row) else None
+
+
+class _CsvSink:
+    """Encodes CSV rows into a binary writer without materializing the partition."""
+
+    def __init__(self, writer: Any) -> None:
+        self._writer = writer
+        self._text = io.StringIO()
+        self._csv = csv.writer(self._text, lineterminator="\n")
+
+    def write_row(self, row: Sequence[str]) -> None:
+        self._csv.writerow(row)
+        if self._text.tell() >= 64 * 1024:
+            self.flush()
+
+    def flush(self) -> None:
+        chunk = self._text.getvalue()
+        if chunk:
+            self._writer.write(chunk.encode("utf-8"))
+            self._text.seek(0)
+            self._text.truncate()
+
+
+def split_csv(
+    stream: BinaryIO,
+    *,
+    test_size: float,
+    random_state: int,
+    train_writer: Any = None,
+    test_writer: Any = None,
+    write_header: bool = True,
+    keep: Callable[[str | None, str | None], bool] | None = None,
+) -> SplitStats:
+    """Split one CSV stream in a single pass.
+
+    ``train_writer``/``test_writer`` are optional binary writers (for example
+    :class:`storage.ObjectWriter`). Each receives the header, when
+    ``write_header`` is set, and its partition's rows. Blank rows are skipped,
+    the same way ``_summarize_csv`` skips them. ``keep`` is called with each
+    row's ``symbol`` and ``timestamp`` (see ``Predicates.row_filter``); rows
+    it rejects are left out of both partitions and counted in
+    ``filtered_rows``.
+    """
+    reader = csv.reader(io.TextIOWrapper(stream, encoding="utf-8", newline=""))
+    header = next(reader, [])
+    stats = SplitStats(columns=[col.strip() or f"column_{idx+1}" for idx, col in enumerate(header)])
+    assign = RowSplitter(stats.columns, test_size=test_size, random_state=random_state)
+    sinks = [_CsvSink(w) if w is not None else None for w in (train_writer, test_writer)]
+    if write_header and header:
+        for sink in sinks:
+            if sink is not None:
+                sink.write_row(header)
+    symbol_idx = _column_index(stats.columns, "symbol")
+    timestamp_idx = _column_index(stats.columns, "timestamp")
+    for row in reader:
+        # Same test as any(cell.strip() for cell in row), without a generator per row.
+        if not "".join(row).strip():
+            continue
+        if keep is not None and not keep(_cell(row, symbol_idx), _cell(row, timestamp_idx)):
+            stats.filtered_rows += 1
+            continue
+        is_test = assign(row)
+        if is_test:
+            stats.test_rows += 1
+        else:
+            stats.train_rows += 1
+            if len(stats.preview_rows) < 5 and stats.columns:
+                stats.preview_rows.append(
+                    {
+                        column: row[idx].strip() if idx < len(row) else ""
+                        for idx, column in enumerate(stats.columns)
+                    }
+                )
+        sink = sinks[1] if is_test else sinks[0]
+        if sink is not None:
+            sink.write_row(row)
+    for sink in sinks:
+        if sink is not None:
+            sink.flush()
+    return stats
+
+
+def split_location(
+    prefix: str,
+    *,
+    bucket: str,
+    sources: Sequence[tuple[str, str | None]],
+    test_size: float,
+    random_state: int,
+    predicates: Mapping[str, Any] | None = None,
+) -> str:
+    """Return the key prefix a persisted split of ``sources`` lives under.
+
+    ``sources`` holds ``(key, etag)`` pairs, so replacing an input object or
+    changing the split parameters gives a new location rather than stale data.
+    ``predicates`` (the row filter applied, if any) is part of the
+    fingerprint too, since two windows over the same objects hold different
+    rows.
+    """
+    identity: Dict[str, Any] = {
+        "scheme": SPLIT_SCHEME,
+        "bucket": bucket,
+        "sources": [list(source) for source in sources],
+        "test_size": test_size,
+        "random_state": random_state,
+    }
+    if predicates:
+        identity["predicates"] = dict(predicates)
+    fingerprint = hashlib.sha256(json.dumps(identity, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"{prefix.rstrip('/')}/{fingerprint[:16]}"
+
+
+def marker_document(
+    stats: SplitStats,
+    *,
+    sources: Sequence[tuple[str, str | None]],
+    test_size: float,
+    random_state: int,
+    predicates: Mapping[str, Any] | None = None,
+) -> Dict[str, Any]:
+    return {
+        "scheme": SPLIT_SCHEME,
+        "sources": [{"key": key, "etag": etag} for key, etag in sources],
+        "test_size": test_size,
+        "random_state": random_state,
+        "predicates": dict(predicates) if predicates else None,
+        "columns": stats.columns,
+        "train_rows": stats.train_rows,
+        "test_rows": stats.test_rows,
+        "filtered_rows": stats.filtered_rows,
+    }
+
+
+def stats_from_marker(marker: Mapping[str, Any]) -> SplitStats:
+    return SplitStats(
+        columns=list(marker.get("columns") or []),
+        train_rows=int(marker.get("train_rows", 0)),
+        test_rows=int(marker.get("test_rows", 0)),
+        filtered_rows=int(marker.get("filtered_rows", 0)),
+    )
@@ -11,13 +11,23 @@ import csv
 import io
 import json
 import logging
-import os
-from contextlib import closing
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Dict, Sequence
+from typing import Any, Callable, Dict, Iterable, Mapping, Sequence
 
-import boto3
+from cache import open_cached
+from catalog import Catalog, Predicates
+from instrumentation import count, stage
+from split import (
+    SPLIT_MARKER,
+    RowSplitter,
+    SplitStats,
+    marker_document,
+    split_csv,
+    split_location,
+    stats_from_marker,
+)
+from storage import ObjectNotFound, StorageBackend, s3_client, storage_from_env
 
 logger = logging.getLogger(__name__)
 
@@ -31,17 +41,11 @@ class TrainingResult:
     preview_rows: Sequence[Dict[str, str]]
     artifact_bucket: str | None = None
     artifact_key: str | None = None
+    split: Dict[str, Any] = field(default_factory=dict)
 
 
-def _s3_client(endpoint_url: str | None):
-    session = boto3.session.Session()
-    return session.client(
-        "s3",
-        endpoint_url=endpoint_url,
-        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID", "test"),
-        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY", "test"),
-        region_name=os.getenv("AWS_REGION", "us-east-1"),
-    )
+def _storage(endpoint_url: str | None) -> StorageBackend:
+    return storage_from_env(lambda: s3_client(endpoint_url))
 
 
 def _summarize_csv(stream: io.BufferedReader) -> tuple[list[str], int, list[Dict[str, str]]]:
@@ -66,6 +70,59 @@ def _summarize_csv(stream: io.BufferedReader) -> tuple[list[str], int, list[Dict
     return columns, row_count, preview_rows
 
 
+def _summarize_records(
+    records: Iterable[Mapping[str, Any]],
+    columns: Sequence[str],
+    *,
+    test_size: float,
+    random_state: int,
+) -> SplitStats:
+    """In-memory counterpart of :func:`split_csv` for already parsed rows."""
+    assign = RowSplitter(columns, test_size=test_size, random_state=random_state)
+    stats = SplitStats(columns=list(columns))
+    for record in records:
+        row = [str(record.get(column, "")) for column in columns]
+        if assign(row):
+            stats.test_rows += 1
+            continue
+        stats.train_rows += 1
+        if len(stats.preview_rows) < 5 and columns:
+            stats.preview_rows.append(dict(zip(columns, row)))
+    return stats
+
+
+def summarize_records(
+    records: Sequence[Mapping[str, Any]],
+    *,
+    columns: Sequence[str],
+    source: str,
+    test_size: float = 0.2,
+    random_state: int = 137,
+) -> TrainingResult:
+    """Summarize rows handed over in memory, skipping the S3 download entirely.
+
+    Rows are assigned to train/test exactly as :func:`run_training` would
+    assign the same rows read from CSV.
+    """
+    with stage("compute"):
+        stats = _summarize_records(records, columns, test_size=test_size, random_state=random_state)
+    count("rows_in", stats.row_count)
+    metrics: Dict[str, float] = {
+        "row_count": float(stats.row_count),
+        "column_count": float(len(stats.columns)),
+        "byte_size": 0.0,
+        "train_rows": float(stats.train_rows),
+        "test_rows": float(stats.test_rows),
+    }
+    logger.info("In-memory dataset metrics for %s: %s", source, json.dumps(metrics))
+    return TrainingResult(
+        metrics=metrics,
+        columns=stats.columns,
+        preview_rows=stats.preview_rows,
+        split={"test_size": test_size, "random_state": random_state},
+    )
+
+
 def run_training(
     *,
     bucket: str,
@@ -75,23 +132,76 @@ def run_training(
     artifact_key: str | None = None,
     test_size: float = 0.2,
     random_state: int = 137,
+    predicates: Predicates | None = None,
+    catalog_key: str | None = None,
+    split_prefix: str | None = None,
 ) -> TrainingResult:
-    """Summarize a CSV in S3 and push a JSON artifact with basic metrics."""
-    del test_size, random_state  # kept for compatibility with existing callers
-    client = _s3_client(endpoint_url)
-    logger.info("Loading dataset from s3://%s/%s", bucket, key)
-    response = client.get_object(Bucket=bucket, Key=key)
-    byte_size = int(response.get("ContentLength") or 0)
-    with closing(response["Body"]) as body:
-        columns, row_count, preview_rows = _summarize_csv(body)
+    """Summarize a CSV in S3 and push a JSON artifact with basic metrics.
+
+    When ``predicates`` are active the training set is every ingest object in
+    the ``catalog_key`` manifest of ``bucket`` that matches them, instead of
+    the single ``key``. Rows of those objects that fall outside the
+    predicates are dropped before the split (``filtered_rows``).
+
+    Rows are split into train and test by a seeded hash of their row key (see
+    :mod:`split`). The metrics describe both partitions and the preview only
+    shows train rows. With ``split_prefix`` the partitions are also written to
+    ``bucket`` under that prefix, and a later run over the same unchanged
+    inputs reads the persisted train partition instead of splitting again.
+    """
+    storage = _storage(endpoint_url)
+    source_keys = [key]
+    keep = None
+    filters: Dict[str, Any] | None = None
+    if predicates is not None and predicates.active:
+        if not catalog_key:
+            raise ValueError("symbol/time predicates require a catalog_key")
+        entries = Catalog.load(storage, bucket, catalog_key).resolve(predicates, dataset="ingest")
+        source_keys = [entry.key for entry in entries]
+        keep = predicates.row_filter()
+        filters = predicates.to_dict()
+
+    split_info: Dict[str, Any] = {"test_size": test_size, "random_state": random_state}
+    if split_prefix:
+        stats, byte_size, split_info = _split_persisted(
+            storage,
+            bucket=bucket,
+            source_keys=source_keys,
+            prefix=split_prefix,
+            test_size=test_size,
+            random_state=random_state,
+            keep=keep,
+            filters=filters,
+        )
+    else:
+        stats = SplitStats()
+        byte_size = 0
+        for source_key in source_keys:
+            logger.info("Loading dataset from %s://%s/%s", storage.name, bucket, source_key)
+            with open_cached(storage, bucket, source_key) as obj, stage("parse"):
+                byte_size += int(obj.size or 0)
+                stats.merge(
+                    split_csv(obj.stream, test_size=test_size, random_state=random_state, keep=keep)
+                )
+    count("bytes_in", byte_size, "Bytes")
+    count("rows_in", stats.row_count)
+    columns, preview_rows = stats.columns, stats.preview_rows
 
     metrics: Dict[str, float] = {
-        "row_count": float(row_count),
+        "row_count": float(stats.row_count),
         "column_count": float(len(columns)),
         "byte_size": float(byte_size),
+        "train_rows": float(stats.train_rows),
+        "test_rows": float(stats.test_rows),
     }
+    if len(source_keys) != 1 or source_keys[0] != key:
+        metrics["object_count"] = float(len(source_keys))
+    if keep is not None:
+        metrics["filtered_rows"] = float(stats.filtered_rows)
     logger.info("Dataset metrics: %s", json.dumps(metrics))
-    result = TrainingResult(metrics=metrics, columns=columns, preview_rows=preview_rows)
+    result = TrainingResult(
+        metrics=metrics, columns=columns, preview_rows=preview_rows, split=split_info
+    )
 
     if artifact_bucket and artifact_key:
         _persist_artifact(
@@ -103,6 +213,8 @@ def run_training(
             endpoint_url=endpoint_url,
             source_bucket=bucket,
             source_key=key,
+            source_keys=source_keys,
+            split=split_info,
         )
         result.artifact_bucket = artifact_bucket
         result.artifact_key = artifact_key
@@ -110,6 +222,120 @@ def run_training(
     return result
 
 
+def _split_persisted(
+    storage: StorageBackend,
+    *,
+    bucket: str,
+    source_keys: Sequence[str],
+    prefix: str,
+    test_size: float,
+    random_state: int,
+    keep: Callable[[str | None, str | None], bool] | None = None,
+    filters: Mapping[str, Any] | None = None,
+) -> tuple[SplitStats, int, Dict[str, Any]]:
+    """Reuse the persisted split of ``source_keys`` or stream a new one to storage.
+
+    Returns the split stats, the bytes read and the ``split`` description.
+    The marker object is written last, so an interrupted run never looks
+    complete to the next one.
+    """
+    with stage("split_lookup"):
+        sources = [(source_key, storage.head(bucket, source_key).etag) for source_key in source_keys]
+    base = split_location(
+        prefix,
+        bucket=bucket,
+        sources=sources,
+        test_size=test_size,
+        random_state=random_state,
+        predicates=filters,
+    )
+    train_key, test_key, marker_key = (
+        f"{base}/train.csv",
+        f"{base}/test.csv",
+        f"{base}/{SPLIT_MARKER}",
+    )
+    info: Dict[str, Any] = {
+        "test_size": test_size,
+        "random_state": random_state,
+        "bucket": bucket,
+        "train_key": train_key,
+        "test_key": test_key,
+    }
+    try:
+        marker = json.loads(storage.read_text(bucket, marker_key))
+    except ObjectNotFound:
+        marker = None
+
+    if marker is not None:
+        logger.info("Reusing split %s://%s/%s", storage.name, bucket, base)
+        stats = stats_from_marker(marker)
+        with open_cached(storage, bucket, train_key) as obj, stage("parse"):
+            byte_size = int(obj.size or 0)
+            _, _, stats.preview_rows = _summarize_csv(obj.stream)
+        count("split_reused", 1)
+        return stats, byte_size, {**info, "reused": True}
+
+    logger.info("Writing split to %s://%s/%s", storage.name, bucket, base)
+    stats = SplitStats()
+    byte_size = 0
+    with (
+        storage.open_write(bucket, train_key, "text/csv") as train_writer,
+        storage.open_write(bucket, test_key, "text/csv") as test_writer,
+    ):
+        for index, source_key in enumerate(source_keys):
+            with open_cached(storage, bucket, source_key) as obj, stage("split"):
+                byte_size += int(obj.size or 0)
+                stats.merge(
+                    split_csv(
+                        obj.stream,
+                        test_size=test_size,
+                        random_state=random_state,
+                        train_writer=train_writer,
+                        test_writer=test_writer,
+                        write_header=index == 0,
+                        keep=keep,
+                    )
+                )
+    count("bytes_out", train_writer.size + test_writer.size, "Bytes")
+    payload = json.dumps(
+        marker_document(
+            stats,
+            sources=sources,
+            test_size=test_size,
+            random_state=random_state,
+            predicates=filters,
+        )
+    ).encode("utf-8")
+    storage.write_bytes(bucket, marker_key, payload, "application/json")
+    return stats, byte_size, {**info, "reused": False}
+
+
+def build_artifact(
+    *,
+    metrics: Dict[str, float],
+    columns: Sequence[str],
+    preview_rows: Sequence[Dict[str, str]],
+    source_bucket: str | None,
+    source_key: str | None,
+    source_keys: Sequence[str] | None = None,
+    split: Mapping[str, Any] | None = None,
+) -> Dict[str, Any]:
+    """Return the artifact document that inference consumes."""
+    source: Dict[str, Any] = {"bucket": source_bucket, "key": source_key}
+    if source_keys is not None and list(source_keys) != [source_key]:
+        source["keys"] = list(source_keys)
+    artifact: Dict[str, Any] = {
+        "generated_at": datetime.now(tz=timezone.utc).isoformat(),
+        "source": source,
+        "metrics": metrics,
+        "columns": list(columns),
+        "preview_rows": list(preview_rows),
+    }
+    if split:
+        artifact["split"] = dict(split)
+    return artifact
+
+
 def _persist_artifact(
     *,
     metrics: Dict[str, float],
@@ -120,17 +346,23 @@ def _persist_artifact(
     endpoint_url: str | None,
     source_bucket: str,
     source_key: str,
+    source_keys: Sequence[str] | None = None,
+    split: Mapping[str, Any] | None = None,
 ) -> None:
     """Store a small JSON summary of the dataset back in S3."""
-    payload = json.dumps(
-        {
-            "generated_at": datetime.now(tz=timezone.utc).isoformat(),
-            "source": {"bucket": source_bucket, "key": source_key},
-            "metrics": metrics,
-            "columns": list(columns),
-            "preview_rows": list(preview_rows),
-        }
-    ).encode("utf-8")
-    logger.info("Uploading summary artifact to s3://%s/%s", bucket, key)
-    client = _s3_client(endpoint_url)
-    client.put_object(Bucket=bucket, Key=key, Body=payload, ContentType="application/json")
+    with stage("serialize"):
+        payload = json.dumps(
+            build_artifact(
+                metrics=metrics,
+                columns=columns,
+                preview_rows=preview_rows,
+                source_bucket=source_bucket,
+                source_key=source_key,
+                source_keys=source_keys,
+                split=split,
+            )
+        ).encode("utf-8")
+    count("bytes_out", len(payload), "Bytes")
+    storage = _storage(endpoint_url)
+    logger.info("Uploading summary artifact to %s://%s/%s", storage.name, bucket, key)
+    storage.write_bytes(bucket, key, payload, "application/json")
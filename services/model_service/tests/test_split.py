@@ -0,0 +1,178 @@
+import importlib.util
+import io
+import json
+import sys
+from pathlib import Path
+
+SERVICE_DIR = Path(__file__).resolve().parents[1]
+SRC_DIR = SERVICE_DIR / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.append(str(SRC_DIR))
+COMMON_DIR = SERVICE_DIR.parent / "common" / "src"
+if str(COMMON_DIR) not in sys.path:
+    sys.path.append(str(COMMON_DIR))
+
+
+def _load(name, filename):
+    spec = importlib.util.spec_from_file_location(name, SRC_DIR / filename)
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+split = _load("model_service_split", "split.py")
+train = _load("model_service_train_split", "train.py")
+from catalog import Predicates, entry_for_rows, record_objects  # noqa: E402
+
+HEADER = "timestamp,symbol,sequence,price,volume,label"
+
+
+def _rows(symbol, sequences):
+    return [f"2024-01-01T00:00:00Z,{symbol},{seq},100.0,1.0,{seq % 2}" for seq in sequences]
+
+
+def _csv(rows):
+    return ("\n".join([HEADER, *rows]) + "\n").encode("utf-8")
+
+
+def _assignments(data, **kwargs):
+    train_sink, test_sink = io.BytesIO(), io.BytesIO()
+    stats = split.split_csv(
+        io.BytesIO(data), train_writer=train_sink, test_writer=test_sink, **kwargs
+    )
+    train_rows = set(train_sink.getvalue().decode().splitlines()[1:])
+    test_rows = set(test_sink.getvalue().decode().splitlines()[1:])
+    return stats, train_rows, test_rows
+
+
+def test_split_is_independent_of_order_and_chunking():
+    rows = _rows("BTCUSDT", range(2000)) + _rows("ETHUSDT", range(500))
+    stats, train_rows, test_rows = _assignments(_csv(rows), test_size=0.25, random_state=7)
+    assert stats.row_count == 2500
+    assert train_rows.isdisjoint(test_rows) and len(train_rows | test_rows) == 2500
+    assert 0.2 < stats.test_rows / stats.row_count < 0.3
+
+    _, reversed_train, reversed_test = _assignments(
+        _csv(list(reversed(rows))), test_size=0.25, random_state=7
+    )
+    assert (reversed_train, reversed_test) == (train_rows, test_rows)
+
+    chunked_test = set()
+    for start in range(0, len(rows), 300):
+        chunked_test |= _assignments(_csv(rows[start : start + 300]), test_size=0.25, random_state=7)[2]
+    assert chunked_test == test_rows
+
+    _, _, other_seed_test = _assignments(_csv(rows), test_size=0.25, random_state=8)
+    assert other_seed_test != test_rows
+
+
+def test_split_keys_on_symbol_and_sequence_only():
+    splitter = split.RowSplitter(HEADER.split(","), test_size=0.5, random_state=1)
+    first = ["2024-01-01T00:00:00Z", "BTCUSDT", "42", "100.0", "1.0", "1"]
+    repriced = ["2024-02-01T00:00:00Z", "BTCUSDT", "42", "250.5", "9.0", "0"]
+    assert splitter(first) == splitter(repriced)
+    assert splitter(first) == split.is_test_row("BTCUSDT\x1f42", test_size=0.5, random_state=1)
+    # The per-symbol CRC prefix must give the same answer as hashing the whole key.
+    padded = [["ts", " ETH ", f" {seq}", "1", "1", "up"] for seq in range(200)]
+    assert [splitter(row) for row in padded] == [
+        split.is_test_row(f"ETH\x1f{seq}", test_size=0.5, random_state=1) for seq in range(200)
+    ]
+
+
+def test_split_spreads_sequential_keys_evenly():
+    splitter = split.RowSplitter(HEADER.split(","), test_size=0.2, random_state=137)
+    flags = [splitter(["ts", "BTCUSDT", str(seq), "1", "1", "up"]) for seq in range(20_000)]
+    blocks = [sum(flags[start : start + 1000]) / 1000 for start in range(0, len(flags), 1000)]
+    assert 0.19 < sum(flags) / len(flags) < 0.21
+    assert all(0.15 < fraction < 0.25 for fraction in blocks)
+
+
+def test_run_training_persists_and_reuses_split(monkeypatch):
+    monkeypatch.setenv("PIPELINE_STORAGE_URL", "memory://")
+    backend = train.storage_from_env(lambda: None)
+    backend.clear()
+    try:
+        backend.write_bytes("data", "ingest/btc.csv", _csv(_rows("BTCUSDT", range(400))))
+        kwargs = dict(
+            bucket="data",
+            key="ingest/btc.csv",
+            endpoint_url=None,
+            test_size=0.3,
+            random_state=11,
+            split_prefix="splits/",
+        )
+        first = train.run_training(**kwargs)
+        assert first.split["reused"] is False
+        assert first.metrics["row_count"] == 400
+        assert first.metrics["train_rows"] + first.metrics["test_rows"] == 400
+
+        train_csv = backend.read_text("data", first.split["train_key"]).splitlines()
+        test_csv = backend.read_text("data", first.split["test_key"]).splitlines()
+        assert train_csv[0] == test_csv[0] == HEADER
+        assert len(train_csv) - 1 == first.metrics["train_rows"]
+        assert len(test_csv) - 1 == first.metrics["test_rows"]
+
+        second = train.run_training(**kwargs)
+        assert second.split["reused"] is True
+        assert second.metrics == {**first.metrics, "byte_size": second.metrics["byte_size"]}
+        assert second.preview_rows == first.preview_rows
+
+        backend.write_bytes("data", "ingest/btc.csv", _csv(_rows("BTCUSDT", range(10))))
+        third = train.run_training(**kwargs)
+        assert third.split["reused"] is False
+        assert third.split["train_key"] != first.split["train_key"]
+        assert third.metrics["row_count"] == 10
+        marker_key = third.split["train_key"].rsplit("/", 1)[0] + "/" + split.SPLIT_MARKER
+        assert json.loads(backend.read_text("data", marker_key))["test_rows"] == third.metrics["test_rows"]
+    finally:
+        backend.clear()
+
+
+def test_run_training_filters_rows_of_objects_straddling_the_window(monkeypatch):
+    monkeypatch.setenv("PIPELINE_STORAGE_URL", "memory://")
+    backend = train.storage_from_env(lambda: None)
+    backend.clear()
+    hourly = [f"2024-01-01T{hour:02d}:00:00Z,BTCUSDT,{hour},100.0,1.0,up" for hour in range(24)]
+    try:
+        backend.write_bytes("data", "ingest/btc.csv", _csv(hourly))
+        entry = entry_for_rows(
+            key="ingest/btc.csv",
+            dataset="ingest",
+            fmt="csv",
+            rows=[
+                {"symbol": "BTCUSDT", "timestamp": "2024-01-01T00:00:00Z", "sequence": 0},
+                {"symbol": "BTCUSDT", "timestamp": "2024-01-01T23:00:00Z", "sequence": 23},
+            ],
+            byte_size=0,
+            etag=None,
+        )
+        record_objects(backend, "data", "catalog/manifest.json", [entry])
+
+        def run(start, end, **extra):
+            return train.run_training(
+                bucket="data",
+                key="unused.csv",
+                endpoint_url=None,
+                predicates=Predicates(start_time=start, end_time=end),
+                catalog_key="catalog/manifest.json",
+                **extra,
+            )
+
+        morning = run("2024-01-01T06:00:00Z", "2024-01-01T11:00:00Z")
+        assert morning.metrics["row_count"] == 6
+        assert morning.metrics["filtered_rows"] == 18
+        assert {row["sequence"] for row in morning.preview_rows} <= {str(h) for h in range(6, 12)}
+
+        persisted = run("2024-01-01T06:00:00Z", "2024-01-01T11:00:00Z", split_prefix="splits/")
+        rows = backend.read_text("data", persisted.split["train_key"]).splitlines()[1:]
+        rows += backend.read_text("data", persisted.split["test_key"]).splitlines()[1:]
+        assert sorted(int(row.split(",")[2]) for row in rows) == list(range(6, 12))
+
+        evening = run("2024-01-01T18:00:00Z", None, split_prefix="splits/")
+        assert evening.split["reused"] is False
+        assert evening.split["train_key"] != persisted.split["train_key"]
+        assert evening.metrics["row_count"] == 6
+    finally:
+        backend.clear()
@@ -6,9 +6,14 @@ from pathlib import Path
 
 SERVICE_DIR = Path(__file__).resolve().parents[1]
 SRC_DIR = SERVICE_DIR / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.append(str(SRC_DIR))
 LAYER_DIR = SERVICE_DIR / "layer" / "python"
 if LAYER_DIR.exists() and str(LAYER_DIR) not in sys.path:
     sys.path.append(str(LAYER_DIR))
+COMMON_DIR = SERVICE_DIR.parent / "common" / "src"
+if str(COMMON_DIR) not in sys.path:
+    sys.path.append(str(COMMON_DIR))
 
 
 def _load_train():
@@ -36,7 +41,7 @@ def test_run_training_summarizes_and_uploads(monkeypatch):
         def put_object(self, *, Bucket, Key, Body, ContentType):
             saved_payload.update({"Bucket": Bucket, "Key": Key, "Body": Body, "ContentType": ContentType})
 
-    monkeypatch.setattr(train, "_s3_client", lambda endpoint_url=None: FakeClient())
+    monkeypatch.setattr(train, "s3_client", lambda endpoint_url=None: FakeClient())
     result = train.run_training(
         bucket="input-bucket",
         key="sample.csv",
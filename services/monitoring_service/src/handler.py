@@ -1,4 +1,10 @@
-"""Monitoring Lambda that computes toy accuracy/drift metrics."""
+"""Monitoring Lambda that computes toy accuracy/drift metrics.
+
+With a catalog configured it also reports coverage of the feature store. The
+manifest alone gives object/row/byte counts. When symbol/time predicates are
+given, the matching feature objects, and only those, are read as well, so the
+label distribution of the requested window can be reported.
+"""
 
 from __future__ import annotations
 
@@ -7,6 +13,15 @@ import os
 from collections import Counter
 from typing import Any, Dict, Iterable, List, Mapping, Sequence
 
+from catalog import Catalog, Predicates, catalog_key
+from instrumentation import count, instrumented, stage
+from retry import io_counters, parallel_map
+from storage import StorageBackend, count_read, s3_client, storage_from_env
+
+
+def _storage(endpoint_url: str | None) -> StorageBackend:
+    return storage_from_env(lambda: s3_client(endpoint_url))
+
 
 def _normalize_label(value: Any) -> str:
     if isinstance(value, str):
@@ -50,6 +65,96 @@ def _accuracy(predictions: Sequence[str], actuals: Sequence[str]) -> float | Non
     return round(matches / len(actuals), 4) if actuals else None
 
 
+def _summarize(
+    predictions: Iterable[Mapping[str, Any]], actuals: Iterable[Any], dataset_tag: str
+) -> Dict[str, Any]:
+    """Aggregate prediction/actual label counts into the monitoring summary."""
+    pred_labels = _extract_prediction_labels(predictions)
+    actual_labels = [_normalize_label(value) for value in actuals]
+
+    pred_counter = Counter(pred_labels)
+    actual_counter = Counter(actual_labels)
+
+    return {
+        "dataset_tag": dataset_tag,
+        "prediction_count": len(pred_labels),
+        "label_distribution": dict(pred_counter),
+        "actual_distribution": dict(actual_counter),
+        "accuracy": _accuracy(pred_labels, actual_labels),
+        "drift_score": _total_variation(pred_counter, actual_counter),
+    }
+
+
+def _window_labels(
+    storage: StorageBackend, bucket: str, key: str, predicates: Predicates
+) -> Counter[str]:
+    """Count the labels of the rows of one feature object inside ``predicates``."""
+    keep = predicates.row_filter()
+    labels: Counter[str] = Counter()
+    with storage.open_read(bucket, key) as obj:
+        count_read(obj)
+        with stage("parse"):
+            for line in obj.stream:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                if keep is None or keep(row.get("symbol"), row.get("timestamp")):
+                    labels[_normalize_label(row.get("label"))] += 1
+    return labels
+
+
+def _catalog_coverage(
+    storage: StorageBackend,
+    bucket: str,
+    manifest_key: str,
+    predicates: Predicates,
+    read_concurrency: int = 4,
+) -> Dict[str, Any]:
+    """Summarize matching partitions from the manifest.
+
+    Without predicates nothing but the manifest is read. With predicates the
+    matching feature objects are read too, and the labels of their rows
+    inside the window are counted.
+    """
+    entries = Catalog.load(storage, bucket, manifest_key).resolve(predicates)
+    symbols: Dict[str, Dict[str, Any]] = {}
+    datasets: Counter[str] = Counter()
+    for entry in entries:
+        datasets[entry.dataset] += 1
+        stats = symbols.setdefault(
+            entry.symbol or "*", {"objects": 0, "rows": 0, "max_timestamp": None}
+        )
+        stats["objects"] += 1
+        stats["rows"] += entry.row_count
+        if entry.max_timestamp and (
+            stats["max_timestamp"] is None or entry.max_timestamp > stats["max_timestamp"]
+        ):
+            stats["max_timestamp"] = entry.max_timestamp
+    coverage = {
+        "bucket": bucket,
+        "catalog_key": manifest_key,
+        "predicates": predicates.to_dict(),
+        "object_count": len(entries),
+        "row_count": sum(entry.row_count for entry in entries),
+        "byte_size": sum(entry.byte_size for entry in entries),
+        "datasets": dict(datasets),
+        "symbols": symbols,
+    }
+    if predicates.active:
+        feature_keys = [entry.key for entry in entries if entry.dataset == "features"]
+        labels: Counter[str] = Counter()
+        for part in parallel_map(
+            lambda key: _window_labels(storage, bucket, key, predicates),
+            feature_keys,
+            read_concurrency,
+        ):
+            labels.update(part)
+        coverage["window_row_count"] = sum(labels.values())
+        coverage["label_distribution"] = dict(labels)
+    return coverage
+
+
+@instrumented("monitoring_service")
 def lambda_handler(event: Mapping[str, Any] | None, _context: Any) -> Dict[str, Any]:
     payload = event or {}
     predictions = payload.get("predictions") or []
@@ -61,31 +166,31 @@ def lambda_handler(event: Mapping[str, Any] | None, _context: Any) -> Dict[str,
     if not isinstance(actuals, list):
         actuals = []
 
-    pred_labels = _extract_prediction_labels(predictions)
-    actual_labels = [_normalize_label(value) for value in actuals]
-
-    pred_counter = Counter(pred_labels)
-    actual_counter = Counter(actual_labels)
-
-    accuracy = _accuracy(pred_labels, actual_labels)
-    drift_score = _total_variation(pred_counter, actual_counter)
+    with stage("compute"):
+        summary = _summarize(predictions, actuals, dataset_tag)
+    count("rows_in", summary["prediction_count"])
 
-    summary = {
-        "dataset_tag": dataset_tag,
-        "prediction_count": len(pred_labels),
-        "label_distribution": dict(pred_counter),
-        "actual_distribution": dict(actual_counter),
-        "accuracy": accuracy,
-        "drift_score": drift_score,
-    }
+    catalog_bucket = payload.get("catalog_bucket") or os.getenv("MONITOR_CATALOG_BUCKET")
+    manifest_key = catalog_key(payload)
+    if catalog_bucket and manifest_key:
+        predicates = Predicates.from_event(payload)
+        read_concurrency = int(
+            payload.get("read_concurrency") or os.getenv("MONITOR_READ_CONCURRENCY", "4")
+        )
+        storage = _storage(os.getenv("AWS_ENDPOINT_URL"))
+        summary["catalog"] = _catalog_coverage(
+            storage, catalog_bucket, manifest_key, predicates, read_concurrency
+        )
 
     print(json.dumps(summary))
-    body = json.dumps(
-        {
-            **summary,
-            "sample_predictions": predictions[:3],
-            "sample_actuals": actuals[:3],
-        },
-        default=str,
-    )
+    with stage("serialize"):
+        body = json.dumps(
+            {
+                **summary,
+                "sample_predictions": predictions[:3],
+                "sample_actuals": actuals[:3],
+                "io": io_counters(),
+            },
+            default=str,
+        )
     return {"statusCode": 200, "body": body}
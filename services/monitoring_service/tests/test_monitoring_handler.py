@@ -8,6 +8,9 @@ SRC_DIR = SERVICE_DIR / "src"
 LAYER_DIR = Path(__file__).resolve().parents[2] / "model_service" / "layer" / "python"
 if LAYER_DIR.exists() and str(LAYER_DIR) not in sys.path:
     sys.path.append(str(LAYER_DIR))
+COMMON_DIR = Path(__file__).resolve().parents[2] / "common" / "src"
+if str(COMMON_DIR) not in sys.path:
+    sys.path.append(str(COMMON_DIR))
 
 
 def _load_handler():
@@ -42,3 +45,58 @@ def test_lambda_handler_reports_accuracy_and_drift():
     assert payload["accuracy"] == round(2 / 3, 4)
     assert payload["drift_score"] >= 0.0
     assert payload["label_distribution"]["buy"] == 2
+
+
+def test_lambda_handler_reports_catalog_coverage(monkeypatch, tmp_path):
+    monkeypatch.setenv("PIPELINE_STORAGE_URL", f"file://{tmp_path}")
+    monkeypatch.setenv("PIPELINE_METRICS", "0")
+    storage = handler._storage(None)
+    manifest = {
+        "version": 1,
+        "entries": {
+            key: {
+                "key": key,
+                "dataset": "features",
+                "format": "jsonl",
+                "symbol": symbol,
+                "min_timestamp": start,
+                "max_timestamp": end,
+                "min_sequence": 0,
+                "max_sequence": 9,
+                "row_count": 10,
+                "byte_size": 100,
+                "etag": None,
+            }
+            for key, symbol, start, end in (
+                ("features/btc-0.jsonl", "BTC", "2023-01-01T00:00:00Z", "2023-01-01T23:59:00Z"),
+                ("features/btc-1.jsonl", "BTC", "2023-01-02T00:00:00Z", "2023-01-02T23:59:00Z"),
+                ("features/eth-0.jsonl", "ETH", "2023-01-01T00:00:00Z", "2023-01-01T23:59:00Z"),
+            )
+        },
+    }
+    storage.write_bytes("feat", "catalog/manifest.json", json.dumps(manifest).encode("utf-8"))
+    rows = [
+        {"timestamp": f"2023-01-01T{hour:02d}:00:00Z", "symbol": "BTC", "label": label}
+        for hour, label in ((0, "up"), (6, "down"), (12, "up"), (18, "up"))
+    ]
+    body = "\n".join(json.dumps(row) for row in rows).encode("utf-8")
+    storage.write_bytes("feat", "features/btc-0.jsonl", body)
+
+    response = handler.lambda_handler(
+        {
+            "predictions": [{"prediction": "buy"}],
+            "catalog_bucket": "feat",
+            "catalog_key": "catalog/manifest.json",
+            "symbols": ["BTC"],
+            "end_time": "2023-01-01T12:00:00Z",
+        },
+        None,
+    )
+
+    coverage = json.loads(response["body"])["catalog"]
+    assert coverage["object_count"] == 1
+    assert coverage["row_count"] == 10
+    assert coverage["symbols"]["BTC"]["max_timestamp"] == "2023-01-01T23:59:00Z"
+    # Only the matching object is read, and only its rows up to end_time count.
+    assert coverage["window_row_count"] == 3
+    assert coverage["label_distribution"] == {"up": 2, "down": 1}
@@ -0,0 +1,311 @@
+"""In-process end-to-end pipeline runner.
+
+Composes the ingest → feature → model → inference → monitoring stages inside a
+single Python process. Stages hand their row batches to the next stage
+directly in memory instead of serializing them to S3 and re-parsing them, and
+independent symbols (partitions) run in parallel worker processes. Intermediate results can
+still be persisted for inspection or downstream consumers, to S3 or to
+whichever ``PIPELINE_STORAGE_URL`` backend is configured.
+
+Intended for local development and batch backfills; the deployed Lambdas keep
+using S3 between stages.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Dict, Iterator, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+SERVICES_DIR = Path(__file__).resolve().parents[2]
+INGEST_COLUMNS = ("timestamp", "symbol", "sequence", "price", "volume", "label")
+# Ingest labels in the inference vocabulary, so monitoring can score predictions.
+LABEL_TO_PREDICTION = {"up": "buy", "down": "hold"}
+
+
+def _load_module(name: str, path: Path) -> ModuleType:
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@dataclass
+class _Services:
+    """The five service modules, loaded side by side in one interpreter."""
+
+    ingest: ModuleType
+    feature: ModuleType
+    train: ModuleType
+    inference: ModuleType
+    monitoring: ModuleType
+
+    @classmethod
+    def load(cls) -> "_Services":
+        for extra in (SERVICES_DIR / "common" / "src", SERVICES_DIR / "model_service" / "src"):
+            if str(extra) not in sys.path:
+                sys.path.append(str(extra))
+        return cls(
+            ingest=_load_module(
+                "pipeline_data_ingest_handler",
+                SERVICES_DIR / "data_ingest_service" / "src" / "handler.py",
+            ),
+            feature=_load_module(
+                "pipeline_feature_handler", SERVICES_DIR / "feature_service" / "src" / "handler.py"
+            ),
+            train=_load_module(
+                "pipeline_model_train", SERVICES_DIR / "model_service" / "src" / "train.py"
+            ),
+            inference=_load_module(
+                "pipeline_inference_handler",
+                SERVICES_DIR / "inference_service" / "src" / "handler.py",
+            ),
+            monitoring=_load_module(
+                "pipeline_monitoring_handler",
+                SERVICES_DIR / "monitoring_service" / "src" / "handler.py",
+            ),
+        )
+
+
+@dataclass
+class StageTiming:
+    """Wall time of one stage for one partition."""
+
+    partition: str
+    stage: str
+    wall_ms: float
+
+
+@dataclass
+class PipelineResult:
+    """Per-partition outputs plus the stage timings collected while running."""
+
+    run_id: str
+    partitions: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    timings: List[StageTiming] = field(default_factory=list)
+    wall_ms: float = 0.0
+
+    def stage_report(self) -> Dict[str, Dict[str, float]]:
+        """Aggregate wall time per stage across partitions."""
+        report: Dict[str, Dict[str, float]] = {}
+        for timing in self.timings:
+            entry = report.setdefault(timing.stage, {"total_ms": 0.0, "max_ms": 0.0, "calls": 0.0})
+            entry["total_ms"] = round(entry["total_ms"] + timing.wall_ms, 3)
+            entry["max_ms"] = round(max(entry["max_ms"], timing.wall_ms), 3)
+            entry["calls"] += 1
+        return report
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "wall_ms": round(self.wall_ms, 3),
+            "stages": self.stage_report(),
+            "partitions": self.partitions,
+        }
+
+
+class _Timer:
+    def __init__(self, partition: str) -> None:
+        self.partition = partition
+        self.timings: List[StageTiming] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000.0
+            self.timings.append(StageTiming(self.partition, name, elapsed))
+
+
+def _run_partition(
+    services: _Services,
+    *,
+    symbol: str,
+    batch_size: int,
+    run_id: str,
+    persist_bucket: str | None,
+    storage: Any,
+) -> tuple[Dict[str, Any], List[StageTiming]]:
+    timer = _Timer(symbol)
+    persisted: Dict[str, str] = {}
+
+    def persist(stage_name: str, key: str, body: bytes, content_type: str) -> None:
+        if not persist_bucket:
+            return
+        with timer.stage(f"{stage_name}_persist"):
+            storage.write_bytes(persist_bucket, key, body, content_type)
+        persisted[stage_name] = f"{storage.name}://{persist_bucket}/{key}"
+
+    ingest_key = f"data/{symbol}/{run_id}.csv" if persist_bucket else None
+    with timer.stage("ingest"):
+        rows = services.ingest._generate_rows(batch_size=batch_size, symbol=symbol)
+    if ingest_key:
+        persist(
+            "ingest",
+            ingest_key,
+            services.ingest._rows_to_csv(rows).encode("utf-8"),
+            "text/csv",
+        )
+
+    with timer.stage("feature"):
+        features = services.feature._engineer_features(rows)
+    if persist_bucket:
+        persist(
+            "feature",
+            f"features/{symbol}/{run_id}.jsonl",
+            "\n".join(json.dumps(row) for row in features).encode("utf-8"),
+            "application/json",
+        )
+
+    with timer.stage("model"):
+        training = services.train.summarize_records(
+            rows, columns=INGEST_COLUMNS, source=f"memory://{symbol}"
+        )
+        artifact = services.train.build_artifact(
+            metrics=training.metrics,
+            columns=training.columns,
+            preview_rows=training.preview_rows,
+            source_bucket=persist_bucket,
+            source_key=ingest_key,
+            split=training.split,
+        )
+    if persist_bucket:
+        persist(
+            "model",
+            f"models/{symbol}/{run_id}.json",
+            json.dumps(artifact).encode("utf-8"),
+            "application/json",
+        )
+
+    with timer.stage("inference"):
+        boundary = services.inference._decision_boundary(artifact)
+        predictions = services.inference._predict(features, boundary)
+
+    with timer.stage("monitoring"):
+        actuals = [LABEL_TO_PREDICTION.get(row["label"], row["label"]) for row in rows]
+        monitoring = services.monitoring._summarize(predictions, actuals, f"{symbol}:{run_id}")
+
+    summary = {
+        "rows": len(rows),
+        "features": len(features),
+        "decision_boundary": boundary,
+        "prediction_count": len(predictions),
+        "label_distribution": monitoring.get("label_distribution"),
+        "accuracy": monitoring.get("accuracy"),
+        "drift_score": monitoring.get("drift_score"),
+        "persisted": persisted,
+    }
+    return summary, timer.timings
+
+
+# Set by run_pipeline before forking, so pool workers reuse the loaded modules.
+_worker_services: _Services | None = None
+
+
+def _partition_task(task: Dict[str, Any]) -> tuple[Dict[str, Any], List[StageTiming]]:
+    """Process-pool entry point; each worker builds its own (not fork-safe) storage client."""
+    global _worker_services
+    if _worker_services is None:
+        _worker_services = _Services.load()
+    endpoint_url = task.pop("endpoint_url")
+    storage = _worker_services.ingest._storage(endpoint_url) if task["persist_bucket"] else None
+    return _run_partition(_worker_services, storage=storage, **task)
+
+
+def run_pipeline(
+    *,
+    symbols: Sequence[str],
+    batch_size: int = 32,
+    max_workers: int | None = None,
+    persist_bucket: str | None = None,
+    endpoint_url: str | None = None,
+    run_id: str | None = None,
+) -> PipelineResult:
+    """Run every stage for each symbol, handing batches over in memory.
+
+    Symbols are independent partitions. The stages are pure-Python CPU work,
+    so partitions run on a process pool; the in-memory storage backend only
+    exists inside one process, so persisting to ``memory://`` uses threads
+    instead. When ``persist_bucket`` is set, the ingest CSV, feature JSONL and
+    model artifact of each partition are also written under
+    ``<stage>/<symbol>/<run_id>``.
+    """
+    global _worker_services
+    services = _Services.load()
+    result = PipelineResult(run_id=run_id or str(uuid.uuid4()))
+    storage = services.ingest._storage(endpoint_url) if persist_bucket else None
+    workers = max_workers or min(len(symbols), os.cpu_count() or 1) or 1
+    tasks = [
+        {
+            "symbol": symbol,
+            "batch_size": batch_size,
+            "run_id": result.run_id,
+            "persist_bucket": persist_bucket,
+        }
+        for symbol in symbols
+    ]
+    use_processes = workers > 1 and len(tasks) > 1 and getattr(storage, "name", None) != "memory"
+
+    started = time.perf_counter()
+    if use_processes:
+        _worker_services = services
+        # Workers inherit the loaded services by forking: the service modules are
+        # loaded from file paths, so a spawned worker could not import them by name.
+        context = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            jobs = [{**task, "endpoint_url": endpoint_url} for task in tasks]
+            outcomes = list(pool.map(_partition_task, jobs))
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            outcomes = list(
+                pool.map(lambda task: _run_partition(services, storage=storage, **task), tasks)
+            )
+    for symbol, (summary, timings) in zip(symbols, outcomes):
+        result.partitions[symbol] = summary
+        result.timings.extend(timings)
+    result.wall_ms = (time.perf_counter() - started) * 1000.0
+    logger.info("Pipeline run %s finished in %.1f ms", result.run_id, result.wall_ms)
+    return result
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--symbols", nargs="+", default=["BTC-USD"])
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--persist-bucket", default=None, help="Also write intermediate results to this bucket."
+    )
+    args = parser.parse_args(argv)
+    os.environ.setdefault("PIPELINE_METRICS", "0")
+    result = run_pipeline(
+        symbols=args.symbols,
+        batch_size=args.batch_size,
+        max_workers=args.workers,
+        persist_bucket=args.persist_bucket,
+        endpoint_url=os.getenv("AWS_ENDPOINT_URL"),
+    )
+    print(json.dumps(result.to_dict(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,102 @@
+import importlib.util
+import json
+import sys
+from pathlib import Path
+
+SERVICE_DIR = Path(__file__).resolve().parents[1]
+SRC_DIR = SERVICE_DIR / "src"
+
+
+def _load_runner():
+    spec = importlib.util.spec_from_file_location("pipeline_runner", SRC_DIR / "runner.py")
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+runner = _load_runner()
+
+
+def test_run_pipeline_hands_batches_over_in_memory(monkeypatch):
+    monkeypatch.setenv("PIPELINE_METRICS", "0")
+    result = runner.run_pipeline(symbols=["BTC", "ETH"], batch_size=5, max_workers=2, run_id="r1")
+
+    assert set(result.partitions) == {"BTC", "ETH"}
+    for summary in result.partitions.values():
+        assert summary["rows"] == 5
+        assert summary["features"] == 5
+        assert summary["prediction_count"] == 5
+        assert summary["decision_boundary"] == 5.0
+        assert summary["persisted"] == {}
+
+    report = result.stage_report()
+    assert set(report) == {"ingest", "feature", "model", "inference", "monitoring"}
+    assert all(entry["calls"] == 2 for entry in report.values())
+    assert result.to_dict()["run_id"] == "r1"
+
+
+def test_run_pipeline_optionally_persists_intermediates(monkeypatch):
+    monkeypatch.setenv("PIPELINE_METRICS", "0")
+    uploads = {}
+
+    class FakeClient:
+        def put_object(self, *, Bucket, Key, Body, ContentType):
+            uploads[(Bucket, Key)] = Body
+
+    services = runner._Services.load()
+    monkeypatch.setattr(runner._Services, "load", classmethod(lambda cls: services))
+    monkeypatch.setattr(services.ingest, "s3_client", lambda endpoint_url=None: FakeClient())
+    result = runner.run_pipeline(symbols=["BTC"], batch_size=3, persist_bucket="demo", run_id="r2")
+
+    assert set(uploads) == {
+        ("demo", "data/BTC/r2.csv"),
+        ("demo", "features/BTC/r2.jsonl"),
+        ("demo", "models/BTC/r2.json"),
+    }
+    assert result.partitions["BTC"]["persisted"]["ingest"] == "s3://demo/data/BTC/r2.csv"
+    artifact = json.loads(uploads[("demo", "models/BTC/r2.json")])
+    assert artifact["source"] == {"bucket": "demo", "key": "data/BTC/r2.csv"}
+    assert "ingest_persist" in result.stage_report()
+
+
+def test_run_pipeline_persists_to_memory_backend_from_threads(monkeypatch):
+    monkeypatch.setenv("PIPELINE_METRICS", "0")
+    monkeypatch.setenv("PIPELINE_STORAGE_URL", "memory://")
+    result = runner.run_pipeline(
+        symbols=["BTC", "ETH"], batch_size=4, max_workers=2, persist_bucket="demo", run_id="r3"
+    )
+
+    storage = runner._Services.load().ingest._storage(None)
+    for symbol in ("BTC", "ETH"):
+        persisted = result.partitions[symbol]["persisted"]
+        assert persisted["model"] == f"memory://demo/models/{symbol}/r3.json"
+        artifact = json.loads(storage.read_bytes("demo", f"models/{symbol}/r3.json"))
+        assert artifact["source"]["key"] == f"data/{symbol}/r3.csv"
+
+
+def test_monitoring_scores_predictions_against_ingest_labels(monkeypatch):
+    monkeypatch.setenv("PIPELINE_METRICS", "0")
+    services = runner._Services.load()
+    monkeypatch.setattr(runner._Services, "load", classmethod(lambda cls: services))
+    labels = ["up", "up", "up", "down"]
+    rows = [
+        {
+            "timestamp": f"2024-01-01T00:0{idx}:00+00:00",
+            "symbol": "BTC",
+            "sequence": idx,
+            "price": 20000.0,
+            "volume": 10.0,
+            "label": label,
+        }
+        for idx, label in enumerate(labels)
+    ]
+    monkeypatch.setattr(services.ingest, "_generate_rows", lambda **_kwargs: rows)
+
+    summary = runner.run_pipeline(symbols=["BTC"], batch_size=4, run_id="r4").partitions["BTC"]
+
+    # Every score is far above the 4-row boundary, so all four predictions are "buy".
+    assert summary["label_distribution"] == {"buy": 4}
+    assert summary["accuracy"] == 0.75
+    assert summary["drift_score"] == 0.25